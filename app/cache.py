@@ -0,0 +1,233 @@
+"""
+Read-through cache of single-entity responses.
+
+Entries hold the serialized response of a single-entity GET together with
+its validators, so a hit answers both full and conditional requests without
+touching the database. Lookups go to a bounded in-process LRU first and then,
+when CACHE_REDIS_URL is set, to a shared Redis store that all server
+processes fill and invalidate together.
+
+Writes invalidate the entities whose representation they change: a
+relationship write invalidates its source and target, a bulk import
+invalidates everything. Invalidations from other processes only reach the
+shared store, so with several processes the local tier keeps entries for
+CACHE_LOCAL_TTL_SECONDS at most.
+"""
+import fnmatch
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry and expires entries after a TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+class InMemoryRedis:
+    """
+    Stand-in for the subset of the redis.asyncio client used by EntityCache.
+
+    Shares its data between every EntityCache given the same instance, which
+    lets tests exercise cross-process invalidation without a Redis server.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: Any, ex: Optional[float] = None) -> None:
+        if isinstance(value, str):
+            value = value.encode()
+        self._data[key] = (time.monotonic() + ex if ex else None, value)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def scan_iter(self, match: str = "*"):
+        for key in list(self._data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def aclose(self) -> None:
+        pass
+
+class EntityCache:
+    """Two-tier cache of single-entity responses keyed by (entity type, id)."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 60, shared=None,
+                 local_ttl: Optional[float] = None, prefix: str = "thingdata:entity"):
+        """
+        Args:
+            max_entries: Entries kept in the in-process LRU
+            ttl: Seconds an entry is kept
+            shared: Optional redis.asyncio client (or InMemoryRedis) shared between processes
+            local_ttl: Seconds the in-process tier keeps entries when a shared store is used
+            prefix: Key prefix in the shared store
+        """
+        local_ttl = ttl if shared is None or local_ttl is None else min(ttl, local_ttl)
+        self.local = LRUCache(max_entries, local_ttl)
+        self.shared = shared
+        self.ttl = ttl
+        self.prefix = prefix
+        # Invalidation sequence number and, for the most recently invalidated keys, the
+        # number of their last invalidation, so a read that raced a write does not cache
+        # stale data. Keys beyond max_entries are forgotten; tokens taken before the last
+        # forgotten invalidation no longer cache.
+        self._sequence = 0
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._max_invalidated = max_entries
+        self._forgotten = 0
+        self._epoch = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def _key(self, entity_type: str, entity_id: str) -> str:
+        return f"{self.prefix}:{entity_type}:{entity_id}"
+
+    def generation(self, entity_type: str, entity_id: str) -> Tuple[int, int]:
+        """Return a token to pass to set, taken before reading the entity from the database."""
+        return self._epoch, self._sequence
+
+    async def get(self, entity_type: str, entity_id: str) -> Optional[Dict[str, Any]]:
+        key = self._key(entity_type, entity_id)
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            try:
+                raw = await self.shared.get(key)
+            except Exception as e:
+                logger.warning("Shared cache read failed: %s", e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                self.hits += 1
+                self.shared_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, entity_type: str, entity_id: str, value: Dict[str, Any], token: Tuple[int, int]) -> None:
+        """Cache a JSON-serializable value unless the entity was invalidated since token was taken."""
+        epoch, sequence = token
+        key = self._key(entity_type, entity_id)
+        if epoch != self._epoch or sequence < self._forgotten or self._invalidated.get(key, 0) > sequence:
+            return
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, json.dumps(value), ex=self.ttl)
+            except Exception as e:
+                logger.warning("Shared cache write failed: %s", e)
+
+    async def invalidate(self, entities: Iterable[Tuple[str, str]]) -> None:
+        """Drop the cached responses of (entity type, id) pairs."""
+        keys = list({self._key(entity_type, entity_id) for entity_type, entity_id in entities})
+        self._sequence += 1
+        tracked = len(keys) < self._max_invalidated
+        if not tracked:
+            # Too many to track: reads started before now are not cached
+            self._invalidated.clear()
+            self._forgotten = self._sequence
+        for key in keys:
+            if tracked:
+                self._invalidated[key] = self._sequence
+                self._invalidated.move_to_end(key)
+            self.local.delete(key)
+        while len(self._invalidated) > self._max_invalidated:
+            _, self._forgotten = self._invalidated.popitem(last=False)
+        if self.shared is not None and keys:
+            try:
+                await self.shared.delete(*keys)
+            except Exception as e:
+                logger.warning("Shared cache invalidation failed: %s", e)
+
+    async def clear(self) -> None:
+        """Drop every cached response."""
+        self._epoch += 1
+        self._invalidated.clear()
+        self.local.clear()
+        if self.shared is not None:
+            try:
+                keys = [key async for key in self.shared.scan_iter(match=f"{self.prefix}:*")]
+                if keys:
+                    await self.shared.delete(*keys)
+            except Exception as e:
+                logger.warning("Shared cache clear failed: %s", e)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters since startup."""
+        return {
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "entries": len(self.local),
+        }
+
+    async def close(self) -> None:
+        if self.shared is not None:
+            await self.shared.aclose()
+
+def create_entity_cache(settings) -> Optional[EntityCache]:
+    """Build the entity cache from settings, or return None when it is disabled."""
+    if not settings.CACHE_ENABLED:
+        return None
+    shared = None
+    if settings.CACHE_REDIS_URL:
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_REDIS_URL is set but the redis package is not installed")
+        shared = redis.from_url(settings.CACHE_REDIS_URL)
+    return EntityCache(
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        ttl=settings.CACHE_TTL_SECONDS,
+        shared=shared,
+        local_ttl=settings.CACHE_LOCAL_TTL_SECONDS
+    )
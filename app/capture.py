@@ -0,0 +1,170 @@
+"""
+Sampled capture of API traffic for load-test replay.
+
+With CAPTURE_SAMPLE_RATE above 0, that fraction of /api/ requests is written
+as NDJSON records to CAPTURE_FILE (logs/captured_requests.ndjson by default):
+time, method, path, query string, status, duration and the shape of the JSON
+body. The shape keeps the structure, the numbers, and the values of the
+fields that select types and reference entities; other strings are replaced
+by a marker of their length, so no free text reaches the capture. Query
+parameters are redacted the same way: names are kept, and values are kept
+only when they are integers or belong to one of those fields.
+benchmarks/replay.py replays the records.
+
+Records go through a queue to a writer thread, like the application log.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+
+# String fields copied verbatim: allow-listed types, languages, directions and entity ids
+KEPT_FIELDS = frozenset({
+    "type", "types", "primary", "secondary", "lang", "direction", "relationship_type",
+    "source_type", "target_type", "thing_id", "source_id", "target_id", "id",
+})
+# Bodies larger than this are recorded without a shape
+MAX_CAPTURED_BODY = 1_000_000
+_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+$")
+
+def body_shape(value: Any, key: Optional[str] = None) -> Any:
+    """JSON value with free-text strings replaced by "<str:N>" (or "<email>") markers."""
+    if isinstance(value, dict):
+        return {name: body_shape(item, name) for name, item in value.items()}
+    if isinstance(value, list):
+        return [body_shape(item, key) for item in value]
+    if isinstance(value, str) and key not in KEPT_FIELDS:
+        return "<email>" if _EMAIL.match(value) else f"<str:{len(value)}>"
+    return value
+
+def query_shape(query: str) -> str:
+    """Query string with free-text values replaced by the markers body_shape uses."""
+    pairs = parse_qsl(query, keep_blank_values=True)
+    return urlencode(
+        [(name, value if value.isdigit() else body_shape(value, name)) for name, value in pairs],
+        safe="<>:,"
+    )
+
+_capture_logger: Optional[logging.Logger] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+def write_record(record: Dict[str, Any]) -> None:
+    """Queue a capture record for the writer thread, starting it on first use."""
+    global _capture_logger, _listener
+    if _capture_logger is None:
+        with _setup_lock:
+            if _capture_logger is None:
+                settings = get_settings()
+                handler = RotatingFileHandler(
+                    settings.CAPTURE_FILE or settings.LOG_DIR / "captured_requests.ndjson",
+                    maxBytes=settings.LOG_FILE_MAX_BYTES,
+                    backupCount=settings.LOG_FILE_BACKUPS,
+                    encoding="utf-8"
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                records: queue.SimpleQueue = queue.SimpleQueue()
+                _listener = QueueListener(records, handler)
+                _listener.start()
+                atexit.register(stop_capture)
+                capture_logger = logging.getLogger("thingdata.capture")
+                capture_logger.setLevel(logging.INFO)
+                capture_logger.propagate = False
+                capture_logger.addHandler(QueueHandler(records))
+                _capture_logger = capture_logger
+    _capture_logger.info(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+def stop_capture() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestCaptureMiddleware:
+    """
+    Pure ASGI middleware recording a sample of /api/ requests.
+
+    Args:
+        app: The wrapped application
+        sample_rate: Fraction of requests recorded (default: CAPTURE_SAMPLE_RATE)
+        sink: Callable receiving each record (default: write_record)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: Optional[float] = None,
+        sink: Callable[[Dict[str, Any]], None] = write_record
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.sink = sink
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        sample_rate = self.sample_rate if self.sample_rate is not None else get_settings().CAPTURE_SAMPLE_RATE
+        if (
+            scope["type"] != "http"
+            or not scope["path"].startswith("/api/")
+            or sample_rate <= 0
+            or random.random() >= sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        body = bytearray()
+        body_too_large = False
+        status = 500
+
+        async def recording_receive() -> Message:
+            nonlocal body_too_large
+            message = await receive()
+            if message["type"] == "http.request" and not body_too_large:
+                body.extend(message.get("body", b""))
+                if len(body) > MAX_CAPTURED_BODY:
+                    body_too_large = True
+                    body.clear()
+            return message
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            shape = None
+            if body and content_type.startswith("application/json"):
+                try:
+                    shape = body_shape(json.loads(body))
+                except ValueError:
+                    pass
+            self.sink({
+                "time": started_at.isoformat(timespec="milliseconds"),
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": query_shape(scope["query_string"].decode("latin-1")),
+                "content_type": content_type or None,
+                "body_bytes": len(body) if not body_too_large else None,
+                "body": shape,
+                "status": status,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
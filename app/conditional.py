@@ -0,0 +1,105 @@
+"""
+Conditional GETs for single-entity endpoints.
+
+The validators of a representation are computed from columns that change
+whenever it does: the entity's id and timestamps and, for entities that
+embed their relationships, a digest of the ids and timestamps of those
+relationships. The version query never reads the JSONB payload columns, so
+a revalidation that ends in 304 Not Modified costs one narrow query served
+by the primary key and the relationship source/target indexes. Responses
+read the embedded relationships from the database as well, never from the
+graph index, so the validators and the body always describe the same rows.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import Select, Text, cast, extract, func, literal_column, null, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Relationship
+from app.version import VERSION
+
+def _changed_at(model):
+    return func.coalesce(model.updated_at, model.created_at)
+
+class EntityVersion:
+    """Validators of the current representation of an entity."""
+
+    def __init__(self, etag: str, last_modified: datetime):
+        self.etag = etag
+        self.last_modified = last_modified.astimezone(timezone.utc).replace(microsecond=0)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"ETag": self.etag, "Last-Modified": format_datetime(self.last_modified, usegmt=True)}
+
+    def matches(self, request: Request) -> bool:
+        """
+        Return whether the client's cached copy is current.
+
+        If-None-Match takes precedence; If-Modified-Since is only evaluated
+        when it is absent, as RFC 9110 requires.
+        """
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if not if_modified_since:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return self.last_modified <= since
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+def version_query(model, entity_id: str, with_relationships: bool = True) -> Select:
+    """Select the timestamps of an entity and, optionally, a digest of its relationships."""
+    if not with_relationships:
+        return select(_changed_at(model), null(), null()).where(model.id == entity_id)
+
+    changed_at = _changed_at(Relationship)
+    state = cast(Relationship.id, Text) + ":" + cast(extract("epoch", changed_at), Text)
+    relationships = model.relationships_query([entity_id]).with_only_columns(
+        func.max(changed_at).label("changed_at"),
+        func.md5(func.string_agg(state, aggregate_order_by(literal_column("','"), Relationship.id))).label("digest")
+    ).subquery()
+    return (
+        select(_changed_at(model), relationships.c.changed_at, relationships.c.digest)
+        .select_from(model)
+        .join(relationships, true())
+        .where(model.id == entity_id)
+    )
+
+async def entity_version(
+    db: AsyncSession, model, entity_id: str, with_relationships: bool = True
+) -> Optional[EntityVersion]:
+    """
+    Return the validators of an entity's representation, or None if it does not exist.
+
+    Args:
+        db: Database session
+        model: Entity model
+        entity_id: Entity id
+        with_relationships: Whether the representation embeds the entity's relationships
+    """
+    row = (await db.execute(version_query(model, entity_id, with_relationships))).first()
+    if row is None:
+        return None
+    changed_at, relationships_changed_at, digest = row
+
+    # The API version is part of the tag, so a release that changes serialization invalidates caches
+    version = f"{VERSION}|{model.__tablename__}|{entity_id}|{changed_at.isoformat()}|{digest or ''}"
+    etag = f'"{hashlib.blake2b(version.encode(), digest_size=16).hexdigest()}"'
+    last_modified = max(filter(None, (changed_at, relationships_changed_at)))
+    return EntityVersion(etag, last_modified)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     # Database
@@ -9,7 +10,54 @@ class Settings(BaseSettings):
     # Environment
     ENVIRONMENT: str = "production"
     LOG_LEVEL: str = "INFO"
+    # Log records as JSON, or as plain text lines
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    # The log file is rotated at this size, keeping this many old files
+    LOG_FILE_MAX_BYTES: int = 10_000_000
+    LOG_FILE_BACKUPS: int = 5
+
+    # Admin API (disabled unless a token is configured)
+    ADMIN_TOKEN: Optional[str] = None
+
+    # Encode entity responses with orjson, skipping response model validation
+    FAST_SERIALIZATION: bool = False
+
+    # In-memory relationship graph index
+    GRAPH_INDEX_ENABLED: bool = False
+    GRAPH_INDEX_REFRESH_SECONDS: float = 30
+
+    # Seconds between background health samples read by /health and the probes
+    HEALTH_SAMPLE_SECONDS: float = 15
+
+    # Single-entity response cache
+    CACHE_ENABLED: bool = False
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_TTL_SECONDS: float = 60
+    # Shared Redis store (requires the redis package); the local tier then keeps entries briefly
+    CACHE_REDIS_URL: Optional[str] = None
+    CACHE_LOCAL_TTL_SECONDS: float = 5
     
+    # Log queries slower than this many seconds, without their parameters (0 disables)
+    SLOW_QUERY_SECONDS: float = 0.5
+    # Requests running one statement more than REPEATED_QUERY_THRESHOLD times: ignore, log or fail them
+    REPEATED_QUERY_MODE: Literal["off", "warn", "raise"] = "off"
+    REPEATED_QUERY_THRESHOLD: int = 10
+
+    # Federation HTTP client: concurrent connections per peer, idle keep-alive, DNS cache and timeouts
+    FEDERATION_CONNECTIONS_PER_PEER: int = 10
+    FEDERATION_KEEPALIVE_SECONDS: float = 30
+    FEDERATION_DNS_CACHE_SECONDS: int = 300
+    FEDERATION_CONNECT_TIMEOUT: float = 5
+    FEDERATION_READ_TIMEOUT: float = 30
+    # Federation batches: most entities and JSON bytes per request, and how long to wait for more events
+    FEDERATION_BATCH_SIZE: int = 500
+    FEDERATION_BATCH_BYTES: int = 1_000_000
+    FEDERATION_BATCH_LINGER_SECONDS: float = 0.05
+
+    # Fraction of /api/ requests recorded for replay (0 disables), and where (default: LOG_DIR)
+    CAPTURE_SAMPLE_RATE: float = 0
+    CAPTURE_FILE: Optional[Path] = None
+
     # Paths
     BASE_DIR: Path = Path(__file__).parent.parent
     LOG_DIR: Path = BASE_DIR / "logs"
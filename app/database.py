@@ -1,26 +1,73 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+import time
 from app.config import get_settings
+from app.instrumentation import instrument_engine
+from app.metrics import observe_pool_checkout
 
 settings = get_settings()
 
+def get_async_database_url(url: str) -> str:
+    """Return the asyncpg flavour of a PostgreSQL database URL."""
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+class _TimedCheckout:
+    """
+    Records how long each pool checkout waits for a connection.
+
+    Times the public Pool.connect(), which engines call for every connection
+    they check out, so the wait includes opening a new connection and the
+    pre-ping.
+    """
+    metrics_label: str
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            observe_pool_checkout(self.metrics_label, time.perf_counter() - start)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+# Synchronous engine, used by scripts and maintenance tasks
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,  # Added connection health check
     pool_size=5,         # Connection pool settings
     max_overflow=10
 )
 
+# Asynchronous engine, used by request handlers so queries never block the event loop
+async_engine = create_async_engine(
+    get_async_database_url(settings.DATABASE_URL),
+    poolclass=TimedAsyncQueuePool,
+    pool_pre_ping=True,
+    pool_size=5,
+    max_overflow=10
+)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
-
-def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
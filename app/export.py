@@ -0,0 +1,57 @@
+"""
+Streaming NDJSON export of whole entity tables.
+
+Rows are read through a server-side cursor in fixed-size partitions and
+written out as they arrive, so memory use stays constant regardless of the
+size of the table being exported.
+"""
+import json
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal
+from app.models import Thing, Story, Guide, Relationship
+from app.schemas import ExportCollection
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_MODELS = {
+    ExportCollection.THINGS: Thing,
+    ExportCollection.STORIES: Story,
+    ExportCollection.GUIDES: Guide,
+    ExportCollection.RELATIONSHIPS: Relationship,
+}
+
+def to_utc(value: datetime) -> datetime:
+    """Convert a timestamp to aware UTC, taking naive timestamps to be UTC already."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+async def stream_ndjson(
+    collection: ExportCollection,
+    updated_since: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """
+    Yield every row of a collection as newline-delimited JSON.
+
+    Args:
+        collection: Collection to export
+        updated_since: Only export rows created or updated at or after this time
+    """
+    model = EXPORT_MODELS[collection]
+    query = select(model).order_by(model.created_at, model.id)
+    if updated_since is not None:
+        query = query.where(
+            func.coalesce(model.updated_at, model.created_at) >= to_utc(updated_since)
+        )
+
+    # The session is owned by the generator rather than the request, because
+    # request dependencies are torn down before a streaming body is sent.
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.scalars().partitions():
+            yield "".join(json.dumps(row.to_dict()) + "\n" for row in rows).encode()
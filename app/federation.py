@@ -2,32 +2,116 @@ import aiohttp
 import asyncio
 import jwt
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 
-from app.models import Instance, Thing, Story, Relationship
+from app.config import get_settings
+from app.models import Thing, Story, Relationship
+try:
+    from app.models import Instance
+except ImportError:  # pragma: no cover - depends on the schema
+    # Peers are not stored yet; the delivery and client code works with any object
+    # carrying uri and endpoints
+    Instance = None
 from app.schemas import ComponentStatus
 from app.logger import setup_logger
+from app.metrics import register_collector, sample_lines, unregister_collector
 
 logger = setup_logger(__name__)
 
+# Bytes of the {"events":[...]} wrapper around a batch
+BATCH_ENVELOPE_BYTES = len(b'{"events":[]}')
+
+def encode_event(event: dict) -> bytes:
+    """An event as compact UTF-8 JSON, as it is sent in a batch."""
+    return json.dumps(event, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
 class FederationManager:
     def __init__(self):
         self.instance_key = None
-        self.known_instances: Dict[str, Instance] = {}
+        self.known_instances: Dict[str, "Instance"] = {}
         self.sync_queues: Dict[str, asyncio.Queue] = {}
         self.active_syncs: Dict[str, asyncio.Task] = {}
         self.retry_delays = [5, 15, 30, 60, 120]  # seconds
+        # One pooled client for all peers, created on first use
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Connections opened and reused, by peer host and outcome
+        self.connections: Dict[Tuple[str, str], int] = {}
+        # Events delivered and folded into a later event for the same entity, by peer and outcome
+        self.event_counts: Dict[Tuple[str, str], int] = {}
+        # Event that did not fit in a peer's last batch and starts its next one
+        self.held_events: Dict[str, dict] = {}
 
     async def initialize(self):
         """Initialize federation system."""
         logger.info("Initializing federation system")
         self.instance_key = await self._generate_instance_key()
+        self._client()
         await self._start_sync_workers()
         await self._restore_pending_syncs()
+        register_collector(self._queue_metrics)
+        register_collector(self._connection_metrics)
+
+    def _client(self) -> aiohttp.ClientSession:
+        """
+        The shared HTTP client, created when first needed.
+
+        Connections to each peer are kept alive and reused up to
+        FEDERATION_CONNECTIONS_PER_PEER at a time, and DNS lookups are cached.
+        """
+        if self.session is None or self.session.closed:
+            settings = get_settings()
+            tracing = aiohttp.TraceConfig()
+            tracing.on_request_start.append(self._on_request_start)
+            tracing.on_connection_create_end.append(self._on_connection_created)
+            tracing.on_connection_reuseconn.append(self._on_connection_reused)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=settings.FEDERATION_CONNECTIONS_PER_PEER,
+                    keepalive_timeout=settings.FEDERATION_KEEPALIVE_SECONDS,
+                    ttl_dns_cache=settings.FEDERATION_DNS_CACHE_SECONDS
+                ),
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    connect=settings.FEDERATION_CONNECT_TIMEOUT,
+                    sock_read=settings.FEDERATION_READ_TIMEOUT
+                ),
+                trace_configs=[tracing]
+            )
+        return self.session
+
+    async def _on_request_start(self, session, context, params: aiohttp.TraceRequestStartParams):
+        context.peer = params.url.host or ""
+
+    def _count_connection(self, context, outcome: str) -> None:
+        key = (getattr(context, "peer", ""), outcome)
+        self.connections[key] = self.connections.get(key, 0) + 1
+
+    async def _on_connection_created(self, session, context, params):
+        self._count_connection(context, "created")
+
+    async def _on_connection_reused(self, session, context, params):
+        self._count_connection(context, "reused")
+
+    def _connection_metrics(self) -> List[str]:
+        """Peer connections opened and reused by the shared client, for /metrics."""
+        return sample_lines(
+            "thingdata_federation_connections_total", "Federation HTTP requests by whether they opened a connection",
+            "counter", ("peer", "outcome"), dict(self.connections)
+        )
+
+    def _queue_metrics(self) -> List[str]:
+        """Events waiting to be sent to, and delivered to, each peer, for /metrics."""
+        return sample_lines(
+            "thingdata_federation_queue_depth", "Federation events waiting to be sent", "gauge",
+            ("peer",), {(uri,): queue.qsize() for uri, queue in self.sync_queues.items()}
+        ) + sample_lines(
+            "thingdata_federation_events_total", "Federation events sent to peers or replaced by a later event",
+            "counter", ("peer", "outcome"), dict(self.event_counts)
+        )
 
     async def _generate_instance_key(self) -> rsa.RSAPrivateKey:
         """Generate RSA key pair for instance authentication."""
@@ -45,40 +129,133 @@ class FederationManager:
             )
 
     async def _sync_worker(self, instance_uri: str):
-        """Background worker for handling federation events."""
+        """Background worker sending a peer's federation events in batches."""
         queue = self.sync_queues[instance_uri]
         while True:
             try:
-                event = await queue.get()
+                # _send_batch drops delivered events, so retries only send the rest
+                events = await self._next_batch(instance_uri, queue)
                 for attempt, delay in enumerate(self.retry_delays):
                     try:
-                        await self._process_federation_event(event)
+                        await self._send_batch(instance_uri, events)
                         break
                     except Exception as e:
-                        logger.error(f"Sync error for {instance_uri}: {str(e)}")
+                        logger.error("Sync error for %s (%s events): %s", instance_uri, len(events), e)
                         if attempt < len(self.retry_delays) - 1:
                             await asyncio.sleep(delay)
                         else:
-                            await self._handle_sync_failure(event)
+                            for event in events:
+                                await self._handle_sync_failure(event)
             except Exception as e:
-                logger.error(f"Sync worker error: {str(e)}")
+                logger.error("Sync worker error: %s", e)
                 await asyncio.sleep(5)
 
+    @staticmethod
+    def _coalesce_key(event: dict) -> Optional[Tuple[str, str]]:
+        """Entity an event is about; later events for the same entity replace earlier ones."""
+        if event.get("uri") is None:
+            return None
+        return event.get("type"), event["uri"]
+
+    async def _next_batch(self, instance_uri: str, queue: asyncio.Queue) -> List[dict]:
+        """
+        Wait for an event, then keep draining the queue into a batch.
+
+        The batch is closed when it holds FEDERATION_BATCH_SIZE entities, or
+        FEDERATION_BATCH_LINGER_SECONDS have passed since its first event. Its
+        encoded request body stays within FEDERATION_BATCH_BYTES: an event that
+        would take it over is held back to start the next batch, unless it is
+        the only one. Events for an entity already in the batch replace the
+        earlier one and move to its end, so only the latest state is sent.
+        """
+        settings = get_settings()
+        loop = asyncio.get_running_loop()
+        batch: Dict[object, dict] = {}
+        sizes: Dict[object, int] = {}
+        # Body bytes: the envelope, the events and a comma between each two
+        total_size = BATCH_ENVELOPE_BYTES - 1
+
+        event = self.held_events.pop(instance_uri, None)
+        if event is None:
+            event = await queue.get()
+        deadline = loop.time() + settings.FEDERATION_BATCH_LINGER_SECONDS
+        while True:
+            key = self._coalesce_key(event) or id(event)
+            size = len(encode_event(event)) + 1
+            replaced = sizes.get(key, 0)
+            if batch and total_size - replaced + size > settings.FEDERATION_BATCH_BYTES:
+                self.held_events[instance_uri] = event
+                break
+            if key in batch:
+                del batch[key]
+                self._count_events(instance_uri, "coalesced")
+            batch[key] = event
+            sizes[key] = size
+            total_size += size - replaced
+            if len(batch) >= settings.FEDERATION_BATCH_SIZE:
+                break
+            try:
+                event = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return list(batch.values())
+
+    async def _send_batch(self, instance_uri: str, events: List[dict]):
+        """
+        Deliver events to a peer in one request, or one by one to peers without a batch endpoint.
+
+        Delivered events are removed from ``events``, so after a failure it holds
+        only those the peer has not received yet.
+        """
+        instance = self.known_instances[instance_uri]
+        if "batch" not in instance.endpoints:
+            delivered = 0
+            try:
+                for event in events:
+                    await self._process_federation_event(event)
+                    delivered += 1
+            finally:
+                del events[:delivered]
+                self._count_events(instance_uri, "sent", delivered)
+            return
+
+        headers = {**await self._prepare_auth_headers(instance), "Content-Type": "application/json"}
+        endpoint = instance.endpoints["batch"]
+        # Encoded like _next_batch measured it, so the body stays within FEDERATION_BATCH_BYTES
+        body = b'{"events":[' + b",".join(encode_event(event) for event in events) + b"]}"
+
+        async with self._client().post(endpoint, headers=headers, data=body) as response:
+            if response.status not in (200, 201):
+                raise Exception(f"Federation batch request failed: {response.status}")
+
+            self._count_events(instance_uri, "sent", len(events))
+            events.clear()
+            return await response.json()
+
+    def _count_events(self, instance_uri: str, outcome: str, count: int = 1) -> None:
+        key = (instance_uri, outcome)
+        self.event_counts[key] = self.event_counts.get(key, 0) + count
+
     async def _process_federation_event(self, event: dict):
         """Process a federation event."""
         instance = self.known_instances[event["target_instance"]]
         
-        async with aiohttp.ClientSession() as session:
-            headers = await self._prepare_auth_headers(instance)
-            endpoint = instance.endpoints[event["event_type"]]
-            
-            async with session.post(endpoint, headers=headers, json=event) as response:
-                if response.status not in (200, 201):
-                    raise Exception(f"Federation request failed: {response.status}")
-                
-                return await response.json()
+        headers = await self._prepare_auth_headers(instance)
+        endpoint = instance.endpoints[event["event_type"]]
+
+        async with self._client().post(endpoint, headers=headers, json=event) as response:
+            if response.status not in (200, 201):
+                raise Exception(f"Federation request failed: {response.status}")
 
-    async def _prepare_auth_headers(self, instance: Instance) -> Dict[str, str]:
+            return await response.json()
+
+    async def _prepare_auth_headers(self, instance: "Instance") -> Dict[str, str]:
         """Prepare authentication headers for federation requests."""
         now = datetime.utcnow()
         payload = {
@@ -95,8 +272,10 @@ class FederationManager:
             'X-Federation-Instance': self.instance_uri
         }
 
-    async def connect_instance(self, instance_data: dict, db: Session) -> Instance:
+    async def connect_instance(self, instance_data: dict, db: AsyncSession) -> "Instance":
         """Connect to another ThingData instance."""
+        if Instance is None:
+            raise RuntimeError("Connecting peers needs an Instance model, which app.models does not define")
         try:
             # Verify instance authenticity
             await self._verify_instance(instance_data)
@@ -121,7 +300,7 @@ class FederationManager:
             
             if db:
                 db.add(instance)
-                db.commit()
+                await db.commit()
 
             # Initialize sync queue
             self.sync_queues[instance.uri] = asyncio.Queue()
@@ -134,9 +313,9 @@ class FederationManager:
             
             return instance
         except Exception as e:
-            logger.error(f"Failed to connect instance: {str(e)}")
+            logger.error("Failed to connect instance: %s", e)
             if db:
-                db.rollback()
+                await db.rollback()
             raise
 
     async def check_health(self) -> ComponentStatus:
@@ -147,11 +326,10 @@ class FederationManager:
             
             for instance in self.known_instances.values():
                 try:
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(f"{instance.endpoints['health']}") as response:
-                            if response.status == 200:
-                                active_instances += 1
-                except:
+                    async with self._client().get(f"{instance.endpoints['health']}") as response:
+                        if response.status == 200:
+                            active_instances += 1
+                except (aiohttp.ClientError, asyncio.TimeoutError):
                     continue
             
             if active_instances == total_instances:
@@ -162,7 +340,7 @@ class FederationManager:
                 return ComponentStatus.UNHEALTHY
                 
         except Exception as e:
-            logger.error(f"Federation health check failed: {str(e)}")
+            logger.error("Federation health check failed: %s", e)
             return ComponentStatus.UNHEALTHY
 
     async def handle_webfinger(self):
@@ -186,6 +364,8 @@ class FederationManager:
     async def shutdown(self):
         """Gracefully shutdown federation system."""
         logger.info("Shutting down federation system")
+        unregister_collector(self._queue_metrics)
+        unregister_collector(self._connection_metrics)
         
         # Cancel all active sync tasks
         for task in self.active_syncs.values():
@@ -194,6 +374,11 @@ class FederationManager:
         # Wait for tasks to complete
         await asyncio.gather(*self.active_syncs.values(), return_exceptions=True)
 
+        # Close pooled connections once no worker can use them
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
     async def _restore_pending_syncs(self):
         """Restore any pending sync operations from database."""
         # Implementation here
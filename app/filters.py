@@ -0,0 +1,63 @@
+"""
+Query builders for the filters supported by the list endpoints.
+
+Every condition built here is served by an index declared in app/models.py
+and created by the migrations; tests/test_query_plans.py fails if a
+filter's page is not planned on the index expected for it. JSONB fields are compared through json_text,
+whose expression matches the expression indexes exactly.
+"""
+from typing import List, Optional
+
+from sqlalchemy.sql import ColumnElement
+
+from app.models import Thing, Story, Guide, Relationship, json_text
+
+def thing_filters(type: Optional[str] = None) -> List[ColumnElement]:
+    """Conditions for listing things."""
+    conditions = []
+    if type:
+        conditions.append(Thing.type == type)
+    return conditions
+
+def story_filters(thing_id: Optional[str] = None, category: Optional[str] = None) -> List[ColumnElement]:
+    """Conditions for listing stories."""
+    conditions = []
+    if thing_id:
+        conditions.append(Story.thing_id == thing_id)
+    if category:
+        conditions.append(json_text(Story.thing_category, 'category') == category)
+    return conditions
+
+def guide_filters(
+    thing_id: Optional[str] = None, category: Optional[str] = None, type: Optional[str] = None
+) -> List[ColumnElement]:
+    """Conditions for listing guides."""
+    conditions = []
+    if thing_id:
+        conditions.append(Guide.thing_id == thing_id)
+    if category:
+        conditions.append(json_text(Guide.thing_category, 'category') == category)
+    if type:
+        conditions.append(json_text(Guide.type, 'primary') == type)
+    return conditions
+
+def relationship_filters(
+    source_type: Optional[str] = None,
+    source_id: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    relationship_type: Optional[str] = None
+) -> List[ColumnElement]:
+    """Conditions for listing relationships."""
+    conditions = []
+    if source_type:
+        conditions.append(Relationship.source_type == source_type)
+    if source_id:
+        conditions.append(Relationship.source_id == source_id)
+    if target_type:
+        conditions.append(Relationship.target_type == target_type)
+    if target_id:
+        conditions.append(Relationship.target_id == target_id)
+    if relationship_type:
+        conditions.append(Relationship.relationship_type == relationship_type)
+    return conditions
@@ -0,0 +1,180 @@
+"""
+Server-side traversal of the relationship graph.
+
+The walk is a single recursive CTE over the relationships table. Every step
+follows at most GRAPH_MAX_FAN_OUT edges per node, never returns to a node
+already on its own path (edges closing a cycle are reported but not
+followed), and the outer LIMIT stops the recursion once GRAPH_MAX_ROWS steps
+have been produced. PostgreSQL evaluates the CTE breadth-first, so the
+nearest nodes are always the ones kept. Node payloads are then loaded with
+one query per entity type.
+
+When the in-memory graph index is built, the same walk runs over it instead
+of the CTE and only the relationship rows and payloads are read.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.types import Text
+
+from app.graph_index import graph_index
+from app.models import Thing, Story, Guide, Relationship
+from app.schemas import EntityType, GraphNode, GraphResponse, TraversalDirection
+
+GRAPH_MODELS = {
+    EntityType.THING: Thing,
+    EntityType.STORY: Story,
+    EntityType.GUIDE: Guide,
+}
+
+MAX_GRAPH_DEPTH = 5
+MAX_GRAPH_NODES = 1000
+# Edges followed from any single node
+GRAPH_MAX_FAN_OUT = 100
+# Traversal steps produced before the walk is cut short
+GRAPH_MAX_ROWS = 10000
+
+# Edges that can be followed from a node in each direction; bidirectional
+# relationships are followed both ways whatever their source and target
+_STEPS = {
+    TraversalDirection.OUTGOING: [
+        ("source", "target", ""),
+        ("target", "source", "AND r.direction = 'bidirectional'"),
+    ],
+    TraversalDirection.INCOMING: [
+        ("target", "source", ""),
+        ("source", "target", "AND r.direction = 'bidirectional'"),
+    ],
+    TraversalDirection.BOTH: [
+        ("source", "target", ""),
+        ("target", "source", ""),
+    ],
+}
+
+def _walk_query(direction: TraversalDirection, types: Optional[Sequence[str]]):
+    type_filter = "AND r.relationship_type = ANY(:types)" if types else ""
+    steps = "\nUNION ALL\n".join(
+        f"""
+            SELECT r.id AS edge_id, r.{to}_type AS node_type, r.{to}_id AS node_id
+            FROM relationships r
+            WHERE r.{at}_id = w.node_id AND r.{at}_type = w.node_type
+              AND r.id IS DISTINCT FROM w.edge_id {condition} {type_filter}"""
+        for at, to, condition in _STEPS[direction]
+    )
+    query = text(f"""
+        WITH RECURSIVE walk (node_type, node_id, edge_id, depth, path, is_cycle) AS (
+            SELECT CAST(:root_type AS text), CAST(:root_id AS text), CAST(NULL AS text), 0,
+                   ARRAY[CAST(:root_type AS text) || ':' || CAST(:root_id AS text)], false
+            UNION ALL
+            SELECT step.node_type, step.node_id, step.edge_id, w.depth + 1,
+                   w.path || (step.node_type || ':' || step.node_id),
+                   (step.node_type || ':' || step.node_id) = ANY(w.path)
+            FROM walk w
+            CROSS JOIN LATERAL ({steps}
+                LIMIT :fan_out
+            ) step
+            WHERE w.depth < :depth AND NOT w.is_cycle
+        )
+        SELECT node_type, node_id, edge_id, depth FROM walk LIMIT :max_rows
+    """)
+    if types:
+        query = query.bindparams(bindparam("types", type_=ARRAY(Text)))
+    return query
+
+async def _walk(
+    db: AsyncSession,
+    entity_type: EntityType,
+    entity_id: str,
+    depth: int,
+    types: Optional[Sequence[str]],
+    direction: TraversalDirection,
+    max_nodes: int
+) -> Tuple[Dict[Tuple[str, str], int], Set[str], bool]:
+    """Walk the graph in the database, returning node depths, edge ids and truncation."""
+    params = {
+        "root_type": entity_type.value,
+        "root_id": entity_id,
+        "depth": depth,
+        "fan_out": GRAPH_MAX_FAN_OUT,
+        "max_rows": GRAPH_MAX_ROWS,
+    }
+    if types:
+        params["types"] = list(types)
+    rows = (await db.execute(_walk_query(direction, types), params)).all()
+
+    # Rows arrive breadth-first, so the first sighting of a node is its shortest distance
+    depths: Dict[Tuple[str, str], int] = {}
+    edge_ids: Set[str] = set()
+    truncated = len(rows) >= GRAPH_MAX_ROWS
+    for node_type, node_id, edge_id, node_depth in rows:
+        key = (node_type, node_id)
+        if key not in depths:
+            if len(depths) >= max_nodes:
+                truncated = True
+                continue
+            depths[key] = node_depth
+        if edge_id is not None:
+            edge_ids.add(edge_id)
+    return depths, edge_ids, truncated
+
+async def traverse(
+    db: AsyncSession,
+    entity_type: EntityType,
+    entity_id: str,
+    depth: int = 2,
+    types: Optional[Sequence[str]] = None,
+    direction: TraversalDirection = TraversalDirection.BOTH,
+    max_nodes: int = 100
+) -> GraphResponse:
+    """
+    Return the subgraph reachable from an entity.
+
+    Args:
+        db: Database session
+        entity_type: Type of the root entity
+        entity_id: Id of the root entity
+        depth: Maximum number of edges between the root and a returned node
+        types: Relationship types to follow, all when empty
+        direction: Direction in which edges are followed
+        max_nodes: Maximum number of nodes, including the root
+    """
+    index = graph_index.get()
+    if index is not None:
+        depths, edge_ids, truncated = index.traverse(
+            entity_type.value, entity_id, depth, direction.value, types,
+            max_nodes=max_nodes, fan_out=GRAPH_MAX_FAN_OUT, max_steps=GRAPH_MAX_ROWS
+        )
+    else:
+        depths, edge_ids, truncated = await _walk(db, entity_type, entity_id, depth, types, direction, max_nodes)
+
+    edges: List[Relationship] = []
+    if edge_ids:
+        result = await db.execute(select(Relationship).where(Relationship.id.in_(edge_ids)))
+        edges = [
+            edge for edge in result.scalars()
+            if (edge.source_type, edge.source_id) in depths and (edge.target_type, edge.target_id) in depths
+        ]
+
+    ids_by_type: Dict[str, List[str]] = defaultdict(list)
+    for node_type, node_id in depths:
+        ids_by_type[node_type].append(node_id)
+    payloads: Dict[Tuple[str, str], dict] = {}
+    for node_type, ids in ids_by_type.items():
+        model = GRAPH_MODELS[EntityType(node_type)]
+        for entity in (await db.execute(select(model).where(model.id.in_(ids)))).scalars():
+            payloads[(node_type, entity.id)] = entity.to_dict()
+
+    nodes = [
+        GraphNode(entity_type=node_type, id=node_id, depth=node_depth, entity=payloads.get((node_type, node_id)))
+        for (node_type, node_id), node_depth in depths.items()
+    ]
+    edges.sort(key=lambda edge: (edge.created_at, edge.id))
+    return GraphResponse(
+        root=nodes[0],
+        nodes=nodes,
+        edges=[edge.to_dict() for edge in edges],
+        truncated=truncated
+    )
@@ -0,0 +1,662 @@
+"""
+In-process adjacency index of the relationship graph.
+
+The index keeps only the topology of the relationships table, in compressed
+sparse row (CSR) form: edges are sorted by source node into flat numpy
+arrays, with per-node offsets for the outgoing and incoming direction. Nodes
+are numbered by their position in a sorted array of 17-byte keys (type code
+and UUID, or a 16-byte hash of ids that are not UUIDs) and found by binary
+search. An edge costs 26 bytes (16-byte id, 4-byte target, 2-byte type,
+4-byte incoming position) and a node 25 bytes (key and two 4-byte offsets);
+ids that are not UUIDs also keep their string. Neighbour lookups are plain
+array reads with no database round trip.
+
+The arrays are immutable and built with numpy bulk operations in a worker
+thread, so the event loop keeps running while they are sorted. Relationships
+created after the build go to an overlay, where an edge and each new node
+cost about 100 bytes of Python objects until the overlay grows large enough
+to be folded into fresh arrays. Writes made by this process are visible
+immediately, also while a rebuild runs; writes from other processes are
+picked up by a periodic incremental refresh of recently created
+relationships. Bulk imports, which may carry old creation times, trigger a
+full rebuild. The API has no relationship delete path: rows deleted
+directly in the database stay in the index until the next rebuild.
+
+The index is optional (GRAPH_INDEX_ENABLED) and callers fall back to the
+database while it is disabled or still being built.
+"""
+import asyncio
+import hashlib
+from array import array
+from bisect import bisect_right
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+from sqlalchemy import text
+
+from app.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ENTITY_TYPES = ("thing", "story", "guide")
+_TYPE_CODES = {entity_type: code for code, entity_type in enumerate(ENTITY_TYPES)}
+# Node key flag for entity ids that are not canonical UUIDs and are stored as a hash
+_RAW_ID = 0x80
+# Relationship type flag for bidirectional relationships
+_BIDIRECTIONAL = 0x8000
+# Node keys: type code and 16 id bytes
+_KEY_SIZE = 17
+_KEY_DTYPE = np.dtype(f"S{_KEY_SIZE}")
+
+# Fold the overlay into the arrays once it holds this many edges, or this
+# fraction of the indexed edges if that is more
+COMPACT_MIN_OVERLAY = 100000
+COMPACT_RATIO = 0.1
+# Relationships re-read by each refresh, to catch transactions that committed
+# after relationships with later creation times
+REFRESH_OVERLAP = timedelta(minutes=5)
+LOAD_BATCH_SIZE = 10000
+
+# (relationship id, source type, source id, target type, target id, relationship type, direction)
+EdgeRow = Tuple[str, str, str, str, str, str, str]
+
+def edge_row(values: Mapping[str, Any]) -> EdgeRow:
+    """Return the edge row of a relationship from its column values or to_dict()."""
+    return (
+        values["id"], values["source_type"], values["source_id"], values["target_type"],
+        values["target_id"], values["relationship_type"], values["direction"]
+    )
+
+def _pack_id(value: str) -> Optional[bytes]:
+    """Return the 16 bytes of a canonical (lowercase, hyphenated) UUID string, or None for any other id."""
+    if len(value) != 36 or value[8] != "-" or value[13] != "-" or value[18] != "-" or value[23] != "-":
+        return None
+    digits = value.replace("-", "")
+    try:
+        packed = bytes.fromhex(digits)
+    except ValueError:
+        return None
+    # fromhex also accepts uppercase digits and whitespace, which would not round-trip
+    return packed if len(packed) == 16 and packed.hex() == digits else None
+
+def _unpack_id(packed: Union[bytes, bytearray]) -> str:
+    digits = packed.hex()
+    return f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+
+def _hash_id(value: str) -> bytes:
+    """16-byte stand-in for an id that is not a UUID."""
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+def _node_key(entity_type: str, entity_id: str) -> bytes:
+    code = _TYPE_CODES[entity_type]
+    packed = _pack_id(entity_id)
+    if packed is None:
+        return bytes((code | _RAW_ID,)) + _hash_id(entity_id)
+    return bytes((code,)) + packed
+
+def _offsets(node_count: int, nodes: np.ndarray) -> np.ndarray:
+    """CSR offsets of edges sorted by node: the edges of node n are offsets[n]:offsets[n + 1]."""
+    offsets = np.zeros(node_count + 1, dtype=np.uint32)
+    offsets[1:] = np.cumsum(np.bincount(nodes, minlength=node_count))
+    return offsets
+
+class _EdgeColumns:
+    """Append-only columnar edge list between numbered nodes."""
+
+    def __init__(self):
+        self.sources = array("I")
+        self.targets = array("I")
+        self.types = array("H")
+        self.ids = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def append(self, source: int, target: int, type_code: int, packed_id: bytes) -> None:
+        self.sources.append(source)
+        self.targets.append(target)
+        self.types.append(type_code)
+        self.ids += packed_id
+
+    def packed_id(self, position: int) -> bytes:
+        return bytes(self.ids[16 * position:16 * position + 16])
+
+    def columns(self, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Copies of the first count edges as (sources, targets, types, ids) arrays."""
+        return (
+            np.array(self.sources[:count], dtype=np.uint32),
+            np.array(self.targets[:count], dtype=np.uint32),
+            np.array(self.types[:count], dtype=np.uint16),
+            np.frombuffer(bytes(self.ids[:16 * count]), dtype=np.uint8),
+        )
+
+class _EdgeKeys:
+    """Append-only edge list between node keys, filled while loading and numbered by finish_load."""
+
+    def __init__(self):
+        self.sources = bytearray()
+        self.targets = bytearray()
+        self.types = array("H")
+        self.ids = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def append(self, source: bytes, target: bytes, type_code: int, packed_id: bytes) -> None:
+        self.sources += source
+        self.targets += target
+        self.types.append(type_code)
+        self.ids += packed_id
+
+class _Csr:
+    """Immutable CSR arrays of the indexed edges."""
+
+    __slots__ = (
+        "node_count", "out_offsets", "out_targets", "out_types", "out_ids", "in_offsets", "in_positions",
+        "_out_offsets", "_out_targets", "_out_types", "_out_ids", "_in_offsets", "_in_positions"
+    )
+
+    def __init__(
+        self, node_count: int, sources: np.ndarray, targets: np.ndarray, types: np.ndarray, ids: np.ndarray
+    ):
+        self.node_count = node_count
+        # A stable sort keeps the edges of each node in creation order
+        order = np.argsort(sources, kind="stable")
+        self.out_offsets = _offsets(node_count, sources)
+        self.out_targets = targets[order]
+        self.out_types = types[order]
+        self.out_ids = ids.reshape(-1, 16)[order].reshape(-1)
+        self.in_offsets = _offsets(node_count, self.out_targets)
+        self.in_positions = np.argsort(self.out_targets, kind="stable").astype(np.uint32)
+        # Memoryviews index a single element as an int, without creating numpy scalars
+        self._out_offsets = memoryview(self.out_offsets)
+        self._out_targets = memoryview(self.out_targets)
+        self._out_types = memoryview(self.out_types)
+        self._out_ids = memoryview(self.out_ids)
+        self._in_offsets = memoryview(self.in_offsets)
+        self._in_positions = memoryview(self.in_positions)
+
+    @classmethod
+    def empty(cls) -> "_Csr":
+        no_nodes = np.zeros(0, dtype=np.uint32)
+        return cls(0, no_nodes, no_nodes, np.zeros(0, dtype=np.uint16), np.zeros(0, dtype=np.uint8))
+
+    def __len__(self) -> int:
+        return len(self.out_targets)
+
+    def packed_id(self, position: int) -> bytes:
+        return bytes(self._out_ids[16 * position:16 * position + 16])
+
+    def target(self, position: int) -> int:
+        return self._out_targets[position]
+
+    def type_code(self, position: int) -> int:
+        return self._out_types[position]
+
+    def source(self, position: int) -> int:
+        return bisect_right(self._out_offsets, position) - 1
+
+    def out_positions(self, node: int) -> Sequence[int]:
+        if node >= self.node_count:
+            return range(0)
+        return range(self._out_offsets[node], self._out_offsets[node + 1])
+
+    def in_positions_of(self, node: int) -> Sequence[int]:
+        if node >= self.node_count:
+            return range(0)
+        return self._in_positions[self._in_offsets[node]:self._in_offsets[node + 1]]
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The indexed edges as (sources, targets, types, ids) arrays."""
+        sources = np.repeat(np.arange(self.node_count, dtype=np.uint32), np.diff(self.out_offsets))
+        return sources, self.out_targets, self.out_types, self.out_ids
+
+    def nbytes(self) -> int:
+        return sum(
+            values.nbytes
+            for values in (
+                self.out_offsets, self.out_targets, self.out_types, self.out_ids, self.in_offsets, self.in_positions
+            )
+        )
+
+class GraphIndex:
+    """Adjacency index of relationships between things, stories and guides."""
+
+    def __init__(self):
+        # Keys of the nodes numbered when the arrays were built, sorted: node n has the n-th key
+        self._set_keys(np.zeros(0, dtype=_KEY_DTYPE))
+        # Nodes first seen since, numbered after them
+        self._extra_nodes: Dict[bytes, int] = {}
+        self._extra_keys: List[bytes] = []
+        # Ids that are not UUIDs, by their key or hash
+        self._raw_node_ids: Dict[bytes, str] = {}
+        self._raw_edge_ids: Dict[bytes, str] = {}
+        self._type_codes: Dict[str, int] = {}
+        self._type_names: List[str] = []
+        self._csr = _Csr.empty()
+        # Edges added since the arrays were built, with per-node positions into the list
+        self._overlay = _EdgeColumns()
+        self._overlay_out: Dict[int, List[int]] = defaultdict(list)
+        self._overlay_in: Dict[int, List[int]] = defaultdict(list)
+        # Ids of relationships created within REFRESH_OVERLAP of the newest one
+        self._recent: Dict[str, datetime] = {}
+        self._recent_order: deque = deque()
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._csr) + len(self._overlay)
+
+    @property
+    def node_count(self) -> int:
+        return len(self._keys) + len(self._extra_keys)
+
+    def nbytes(self) -> int:
+        """Size of the edge arrays and sorted node keys in bytes, excluding the overlay."""
+        return self._csr.nbytes() + self._keys.nbytes
+
+    def _set_keys(self, keys: np.ndarray) -> None:
+        self._keys = keys
+        self._key_bytes = memoryview(keys.view(np.uint8))
+
+    def _key(self, entity_type: str, entity_id: str) -> bytes:
+        key = _node_key(entity_type, entity_id)
+        if key[0] & _RAW_ID:
+            self._raw_node_ids[key] = entity_id
+        return key
+
+    def _node_of(self, key: bytes) -> Optional[int]:
+        keys = self._keys
+        if len(keys):
+            node = int(np.searchsorted(keys, key))
+            if node < len(keys) and self._key_bytes[_KEY_SIZE * node:_KEY_SIZE * (node + 1)] == key:
+                return node
+        return self._extra_nodes.get(key)
+
+    def _intern_node(self, key: bytes) -> int:
+        node = self._node_of(key)
+        if node is None:
+            node = self._extra_nodes[key] = self.node_count
+            self._extra_keys.append(key)
+        return node
+
+    def _find_node(self, entity_type: str, entity_id: str) -> Optional[int]:
+        if entity_type not in _TYPE_CODES:
+            return None
+        return self._node_of(_node_key(entity_type, entity_id))
+
+    def _entity(self, node: int) -> Tuple[str, str]:
+        """(entity type, id) of a node."""
+        if node < len(self._keys):
+            key = bytes(self._key_bytes[_KEY_SIZE * node:_KEY_SIZE * (node + 1)])
+        else:
+            key = self._extra_keys[node - len(self._keys)]
+        code = key[0]
+        if code & _RAW_ID:
+            return ENTITY_TYPES[code & ~_RAW_ID], self._raw_node_ids[key]
+        return ENTITY_TYPES[code], _unpack_id(key[1:])
+
+    def _pack_edge_id(self, edge_id: str) -> bytes:
+        packed = _pack_id(edge_id)
+        if packed is None:
+            packed = _hash_id(edge_id)
+            self._raw_edge_ids[packed] = edge_id
+        return packed
+
+    def _edge_id(self, packed: bytes) -> str:
+        raw = self._raw_edge_ids.get(packed) if self._raw_edge_ids else None
+        return raw if raw is not None else _unpack_id(packed)
+
+    def _type_code(self, relationship_type: str, direction: str) -> int:
+        code = self._type_codes.get(relationship_type)
+        if code is None:
+            code = self._type_codes[relationship_type] = len(self._type_names)
+            self._type_names.append(relationship_type)
+        return code | (_BIDIRECTIONAL if direction == "bidirectional" else 0)
+
+    def _remember(self, edge_id: str, created_at: Optional[datetime]) -> None:
+        if created_at is None:
+            return
+        self._recent[edge_id] = created_at
+        self._recent_order.append((created_at, edge_id))
+        if self.watermark is None or created_at > self.watermark:
+            self.watermark = created_at
+        horizon = self.watermark - REFRESH_OVERLAP
+        while self._recent_order and self._recent_order[0][0] < horizon:
+            _, expired = self._recent_order.popleft()
+            self._recent.pop(expired, None)
+
+    def start_load(self) -> _EdgeKeys:
+        """Return an empty edge list to fill with load_rows and pass to finish_load."""
+        return _EdgeKeys()
+
+    def load_rows(
+        self, edges: _EdgeKeys, rows: Iterable[Tuple[EdgeRow, Optional[datetime]]], skip: Set[str] = frozenset()
+    ) -> None:
+        """
+        Add a batch of relationships to an edge list being loaded.
+
+        Args:
+            edges: Edge list from start_load
+            rows: (edge row, created_at) pairs, in creation order
+            skip: Relationship ids to leave out
+        """
+        for row, created_at in rows:
+            edge_id, source_type, source_id, target_type, target_id, relationship_type, direction = row
+            if edge_id in skip:
+                continue
+            edges.append(
+                self._key(source_type, source_id),
+                self._key(target_type, target_id),
+                self._type_code(relationship_type, direction),
+                self._pack_edge_id(edge_id)
+            )
+            self._remember(edge_id, created_at)
+
+    def finish_load(self, edges: _EdgeKeys) -> None:
+        """Replace the indexed edges with a loaded edge list, numbering its nodes."""
+        count = len(edges)
+        endpoints = np.concatenate((
+            np.frombuffer(edges.sources, dtype=_KEY_DTYPE), np.frombuffer(edges.targets, dtype=_KEY_DTYPE)
+        ))
+        keys, nodes = np.unique(endpoints, return_inverse=True)
+        nodes = nodes.astype(np.uint32)
+        csr = _Csr(
+            len(keys), nodes[:count], nodes[count:],
+            np.frombuffer(edges.types, dtype=np.uint16), np.frombuffer(edges.ids, dtype=np.uint8)
+        )
+        self._set_keys(keys)
+        self._extra_nodes = {}
+        self._extra_keys = []
+        self._csr = csr
+        self._overlay = _EdgeColumns()
+        self._overlay_out.clear()
+        self._overlay_in.clear()
+
+    def load(self, rows: Iterable[Tuple[EdgeRow, Optional[datetime]]]) -> None:
+        """Replace the index contents with the given relationships, in creation order."""
+        edges = self.start_load()
+        self.load_rows(edges, rows)
+        self.finish_load(edges)
+
+    def add(self, row: EdgeRow, created_at: Optional[datetime] = None) -> bool:
+        """Add a relationship, returning False if it was added recently already."""
+        edge_id, source_type, source_id, target_type, target_id, relationship_type, direction = row
+        if edge_id in self._recent:
+            return False
+        source = self._intern_node(self._key(source_type, source_id))
+        target = self._intern_node(self._key(target_type, target_id))
+        self._overlay_out[source].append(len(self._overlay))
+        self._overlay_in[target].append(len(self._overlay))
+        self._overlay.append(source, target, self._type_code(relationship_type, direction), self._pack_edge_id(edge_id))
+        self._remember(edge_id, created_at)
+        return True
+
+    def needs_compaction(self) -> bool:
+        return len(self._overlay) >= max(COMPACT_MIN_OVERLAY, COMPACT_RATIO * len(self._csr))
+
+    async def compact(self) -> None:
+        """Fold the overlay and its new nodes into new arrays, built in a worker thread."""
+        node_count = self.node_count
+        folded = len(self._overlay)
+        overlay = self._overlay.columns(folded)
+        keys = np.concatenate((self._keys, np.array(self._extra_keys, dtype=_KEY_DTYPE)))
+        csr = self._csr
+
+        def build() -> Tuple[np.ndarray, np.ndarray, _Csr]:
+            # Renumber every node by its position among the sorted keys
+            sorted_keys, renumber = np.unique(keys, return_inverse=True)
+            renumber = renumber.astype(np.uint32)
+            sources, targets, types, ids = (np.concatenate(pair) for pair in zip(csr.columns(), overlay))
+            return sorted_keys, renumber, _Csr(node_count, renumber[sources], renumber[targets], types, ids)
+
+        sorted_keys, renumber, csr = await asyncio.to_thread(build)
+        # Nodes and edges added while building keep their numbers and stay in the overlay
+        late_keys = self._extra_keys[node_count - len(self._keys):]
+        renumber = np.concatenate((renumber, np.arange(node_count, node_count + len(late_keys), dtype=np.uint32)))
+        late = self._overlay
+        self._set_keys(sorted_keys)
+        self._extra_keys = late_keys
+        self._extra_nodes = {key: node_count + n for n, key in enumerate(late_keys)}
+        self._csr = csr
+        self._overlay = _EdgeColumns()
+        self._overlay_out.clear()
+        self._overlay_in.clear()
+        for position in range(folded, len(late)):
+            source = int(renumber[late.sources[position]])
+            target = int(renumber[late.targets[position]])
+            self._overlay_out[source].append(len(self._overlay))
+            self._overlay_in[target].append(len(self._overlay))
+            self._overlay.append(source, target, late.types[position], late.packed_id(position))
+        logger.info("Compacted graph index: %s edges, %s nodes", len(self), self.node_count)
+
+    def _edges(
+        self, node: int, outgoing: bool, incoming: bool, types: Optional[Set[int]] = None,
+        bidirectional_only: Tuple[bool, bool] = (False, False), neighbours: bool = True
+    ) -> Iterator[Tuple[str, int]]:
+        """
+        Yield (relationship id, neighbour node) for the edges of a node.
+
+        Args:
+            node: Numbered node
+            outgoing: Include edges where the node is the source
+            incoming: Include edges where the node is the target
+            types: Relationship type codes to include, all when None
+            bidirectional_only: Restrict the (outgoing, incoming) edges to bidirectional ones
+            neighbours: Resolve the neighbour node, -1 is yielded instead when False
+        """
+        csr = self._csr
+        overlay = self._overlay
+        sides = []
+        if outgoing:
+            sides.append((True, bidirectional_only[0]))
+        if incoming:
+            sides.append((False, bidirectional_only[1]))
+        for is_source, only_bidirectional in sides:
+            positions = csr.out_positions(node) if is_source else csr.in_positions_of(node)
+            for position in positions:
+                type_code = csr.type_code(position)
+                if only_bidirectional and not type_code & _BIDIRECTIONAL:
+                    continue
+                if types is not None and type_code & ~_BIDIRECTIONAL not in types:
+                    continue
+                edge_id = self._edge_id(csr.packed_id(position))
+                if is_source:
+                    yield edge_id, csr.target(position)
+                else:
+                    yield edge_id, (csr.source(position) if neighbours else -1)
+            for position in (self._overlay_out if is_source else self._overlay_in).get(node, ()):
+                type_code = overlay.types[position]
+                if only_bidirectional and not type_code & _BIDIRECTIONAL:
+                    continue
+                if types is not None and type_code & ~_BIDIRECTIONAL not in types:
+                    continue
+                neighbour = overlay.targets[position] if is_source else overlay.sources[position]
+                yield self._edge_id(overlay.packed_id(position)), neighbour
+
+    def has_relationships(self, entity_type: str, entity_id: str, direction: str = "both") -> bool:
+        """Return whether an entity is the source ('outgoing'), target ('incoming') or either of a relationship."""
+        node = self._find_node(entity_type, entity_id)
+        if node is None:
+            return False
+        edges = self._edges(node, direction in ("outgoing", "both"), direction in ("incoming", "both"), neighbours=False)
+        return next(edges, None) is not None
+
+    def relationship_ids(self, entity_type: str, entity_id: str, direction: str = "both") -> List[str]:
+        """Return the ids of the relationships of an entity, see has_relationships."""
+        node = self._find_node(entity_type, entity_id)
+        if node is None:
+            return []
+        edges = self._edges(node, direction in ("outgoing", "both"), direction in ("incoming", "both"), neighbours=False)
+        return [edge_id for edge_id, _ in edges]
+
+    def traverse(
+        self,
+        entity_type: str,
+        entity_id: str,
+        depth: int,
+        direction: str = "both",
+        types: Optional[Sequence[str]] = None,
+        max_nodes: int = 100,
+        fan_out: int = 100,
+        max_steps: int = 10000
+    ) -> Tuple[Dict[Tuple[str, str], int], Set[str], bool]:
+        """
+        Breadth-first walk from an entity, with the semantics of app.graph.traverse.
+
+        Returns:
+            The distance of every reached (entity type, id), the ids of the
+            relationships walked between them, and whether a limit cut the walk short
+        """
+        root = self._find_node(entity_type, entity_id)
+        if root is None:
+            return {(entity_type, entity_id): 0}, set(), False
+
+        type_codes = None
+        if types:
+            type_codes = {self._type_codes[name] for name in types if name in self._type_codes}
+        # Bidirectional relationships are also followed against their direction
+        bidirectional_only = {
+            "outgoing": (False, True),
+            "incoming": (True, False),
+        }.get(direction, (False, False))
+
+        depths = {root: 0}
+        edge_ids: Set[str] = set()
+        truncated = False
+        steps = 0
+        frontier = [root]
+        for level in range(1, depth + 1):
+            next_frontier = []
+            for node in frontier:
+                edges = self._edges(node, True, True, type_codes, bidirectional_only)
+                for edge_id, neighbour in islice(edges, fan_out):
+                    if steps == max_steps:
+                        return self._traversal_result(depths, edge_ids, True)
+                    steps += 1
+                    if neighbour not in depths:
+                        if len(depths) >= max_nodes:
+                            truncated = True
+                            continue
+                        depths[neighbour] = level
+                        next_frontier.append(neighbour)
+                    edge_ids.add(edge_id)
+            frontier = next_frontier
+        return self._traversal_result(depths, edge_ids, truncated)
+
+    def _traversal_result(
+        self, depths: Dict[int, int], edge_ids: Set[str], truncated: bool
+    ) -> Tuple[Dict[Tuple[str, str], int], Set[str], bool]:
+        return (
+            {self._entity(node): node_depth for node, node_depth in depths.items()},
+            edge_ids,
+            truncated
+        )
+
+_EDGE_COLUMNS = "id, source_type, source_id, target_type, target_id, relationship_type, direction, created_at"
+
+def _edge_row(row: Any) -> Tuple[EdgeRow, Optional[datetime]]:
+    return (row[0], row[1], row[2], row[3], row[4], row[5], row[6]), row[7]
+
+class GraphIndexManager:
+    """Builds the graph index in the background and keeps it current."""
+
+    def __init__(self):
+        self.index: Optional[GraphIndex] = None
+        self._building = False
+        self._pending: List[Tuple[EdgeRow, Optional[datetime]]] = []
+        self._rebuild_requested = False
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self) -> Optional[GraphIndex]:
+        """Return the index once built, None while disabled or building."""
+        return self.index
+
+    def record(self, row: EdgeRow, created_at: Optional[datetime] = None) -> None:
+        """Add a relationship committed by this process."""
+        if self._building:
+            # Also kept for the index being built, which replaces the current one
+            self._pending.append((row, created_at))
+        if self.index is not None:
+            self.index.add(row, created_at)
+
+    def request_rebuild(self) -> None:
+        """Rebuild the index from the database at the next refresh, e.g. after a bulk import."""
+        self._rebuild_requested = True
+
+    async def build(self, session_factory) -> GraphIndex:
+        """Load every relationship into a new index and make it current."""
+        self._building = True
+        self._pending = []
+        try:
+            index = GraphIndex()
+            edges = index.start_load()
+            async with session_factory() as db:
+                result = await db.stream(
+                    text(f"SELECT {_EDGE_COLUMNS} FROM relationships ORDER BY created_at, id")
+                    .execution_options(yield_per=LOAD_BATCH_SIZE)
+                )
+                async for partition in result.partitions():
+                    # Edges recorded during the build are added from the pending list instead
+                    skip = {row[0] for row, _ in self._pending}
+                    index.load_rows(edges, (_edge_row(row) for row in partition), skip)
+            await asyncio.to_thread(index.finish_load, edges)
+            for row, created_at in self._pending:
+                index.add(row, created_at)
+            self.index = index
+        finally:
+            self._building = False
+            self._pending = []
+        logger.info(
+            "Built graph index: %s edges, %s nodes, %s bytes of arrays", len(index), index.node_count, index.nbytes()
+        )
+        return index
+
+    async def refresh(self, session_factory) -> None:
+        """Add relationships created by other processes since the last refresh."""
+        index = self.index
+        if index is None or self._rebuild_requested:
+            self._rebuild_requested = False
+            await self.build(session_factory)
+            return
+        since = datetime.min.replace(tzinfo=timezone.utc)
+        if index.watermark is not None:
+            since = index.watermark - REFRESH_OVERLAP
+        async with session_factory() as db:
+            result = await db.execute(
+                text(f"SELECT {_EDGE_COLUMNS} FROM relationships WHERE created_at >= :since ORDER BY created_at, id"),
+                {"since": since}
+            )
+            added = sum(index.add(*_edge_row(row)) for row in result)
+        if added:
+            logger.info("Added %s relationships to the graph index", added)
+        if index.needs_compaction():
+            await index.compact()
+
+    async def run(self, session_factory, refresh_seconds: float) -> None:
+        """Build the index, then refresh it periodically until cancelled."""
+        while True:
+            try:
+                await self.refresh(session_factory)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Graph index refresh failed: %s", e)
+            await asyncio.sleep(refresh_seconds)
+
+    def start(self, session_factory, refresh_seconds: float) -> None:
+        self._task = asyncio.create_task(self.run(session_factory, refresh_seconds))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.index = None
+
+graph_index = GraphIndexManager()
@@ -1,107 +1,160 @@
-from typing import Dict, Optional
+"""
+Health reporting.
+
+A background sampler refreshes the database and system metrics every
+HEALTH_SAMPLE_SECONDS, so /health and the liveness and readiness probes only
+read the latest sample and never wait on psutil or the database.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional, Tuple
+
 import psutil
-from datetime import datetime
 from sqlalchemy import text
-from app.database import get_db
+
+from app.database import AsyncSessionLocal
 from app.schemas import ComponentStatus, HealthResponse, HealthMetrics
 from app.logger import setup_logger
+from app.version import VERSION
 
 logger = setup_logger(__name__)
 
+# Connections to the database above which it is reported degraded
+MAX_HEALTHY_CONNECTIONS = 100
+
 class HealthChecker:
-    def __init__(self):
-        self.last_check: Optional[datetime] = None
-        self.cache_duration = 60  # seconds
+    def __init__(self, interval: float = 15, federation_peers: Optional[Callable[[], int]] = None):
+        """
+        Args:
+            interval: Seconds between samples
+            federation_peers: Returns the number of known federation peers; leave unset when federation is off
+        """
+        self.interval = interval
+        self.federation_peers = federation_peers
+        self.last_check: Optional[float] = None
         self._health_cache: Optional[HealthResponse] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # The first non-blocking call only sets the baseline for CPU usage
+        psutil.cpu_percent(interval=None)
+
+    def _is_fresh(self) -> bool:
+        # A running sampler refreshes well within two intervals
+        return self.last_check is not None and time.monotonic() - self.last_check < 2 * self.interval
 
     async def check_health(self, force: bool = False) -> HealthResponse:
-        """Basic system health check."""
-        try:
-            # Use cached response if available and recent
-            if not force and self._health_cache and self.last_check:
-                if (datetime.utcnow() - self.last_check).seconds < self.cache_duration:
-                    return self._health_cache
-
-            # Check database
-            db_status = await self._check_database()
-            metrics = await self._collect_metrics()
-
-            health_response = HealthResponse(
-                status="healthy" if db_status == ComponentStatus.HEALTHY else "unhealthy",
-                timestamp=datetime.utcnow().isoformat(),
-                version="0.1.2",
-                components={
-                    "database": db_status,
-                    "api": ComponentStatus.HEALTHY
-                },
-                metrics=metrics
-            )
+        """Return the latest health sample, sampling now when there is no recent one."""
+        if not force and self._is_fresh():
+            return self._health_cache
+        async with self._lock:
+            if not force and self._is_fresh():
+                return self._health_cache
+            return await self.sample()
 
-            # Update cache
-            self._health_cache = health_response
-            self.last_check = datetime.utcnow()
+    def readiness(self) -> Optional[str]:
+        """Return why the instance should not receive traffic, or None when it is ready."""
+        if self._health_cache is None:
+            return "No health sample yet"
+        if not self._is_fresh():
+            return "Health sample is out of date"
+        if self._health_cache.components["database"] == ComponentStatus.UNHEALTHY:
+            return "Database unavailable"
+        return None
 
-            return health_response
+    async def sample(self) -> HealthResponse:
+        """Check the database and collect system metrics, and keep the result as the latest sample."""
+        try:
+            db_status, connections = await asyncio.wait_for(self._check_database(), timeout=min(self.interval, 5))
+        except asyncio.TimeoutError:
+            logger.error("Database health check timed out")
+            db_status, connections = ComponentStatus.UNHEALTHY, None
+        metrics = await asyncio.to_thread(self._collect_metrics, connections)
 
-        except Exception as e:
-            logger.error(f"Health check failed: {str(e)}", exc_info=True)
-            return HealthResponse(
-                status="unhealthy",
-                timestamp=datetime.utcnow().isoformat(),
-                version="0.1.2",
-                components={
-                    "database": ComponentStatus.UNHEALTHY,
-                    "api": ComponentStatus.HEALTHY
-                },
-                metrics=await self._collect_metrics()
-            )
+        if db_status == ComponentStatus.HEALTHY:
+            status = "healthy"
+        elif db_status == ComponentStatus.DEGRADED:
+            status = "degraded"
+        else:
+            status = "unhealthy"
+        health_response = HealthResponse(
+            status=status,
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            version=VERSION,
+            components={
+                "database": db_status,
+                "api": ComponentStatus.HEALTHY
+            },
+            metrics=metrics
+        )
+        self._health_cache = health_response
+        self.last_check = time.monotonic()
+        return health_response
 
-    async def _check_database(self) -> ComponentStatus:
-        """Check database connectivity and performance."""
+    async def _check_database(self) -> Tuple[ComponentStatus, Optional[int]]:
+        """Check database connectivity and return its status with the number of connections to it."""
         try:
-            db = next(get_db())
-            
-            # Basic connectivity check
-            db.execute(text("SELECT 1"))
-            
-            # Check connection pool
-            pool_info = db.execute(
-                text("""
-                    SELECT count(*) as connections
-                    FROM pg_stat_activity
-                    WHERE datname = current_database()
-                """)
-            ).scalar()
-            
-            if pool_info > 100:  # Simplified check
-                return ComponentStatus.DEGRADED
-                
-            return ComponentStatus.HEALTHY
-            
+            async with AsyncSessionLocal() as db:
+                connections = await db.scalar(
+                    text("""
+                        SELECT count(*) as connections
+                        FROM pg_stat_activity
+                        WHERE datname = current_database()
+                    """)
+                )
+
+            if connections > MAX_HEALTHY_CONNECTIONS:
+                return ComponentStatus.DEGRADED, connections
+
+            return ComponentStatus.HEALTHY, connections
+
         except Exception as e:
-            logger.error(f"Database health check failed: {str(e)}")
-            return ComponentStatus.UNHEALTHY
+            logger.error("Database health check failed: %s", e)
+            return ComponentStatus.UNHEALTHY, None
 
-    async def _collect_metrics(self) -> HealthMetrics:
-        """Collect basic system metrics."""
+    def _collect_metrics(self, connections: Optional[int]) -> HealthMetrics:
+        """Collect system metrics; CPU usage is averaged since the previous sample."""
         try:
-            memory = psutil.virtual_memory()
-            cpu_percent = psutil.cpu_percent(interval=1)
-            
             return HealthMetrics(
-                memory_usage=memory.percent,
-                cpu_usage=cpu_percent,
-                active_connections=0,  # Placeholder for future implementation
+                memory_usage=psutil.virtual_memory().percent,
+                cpu_usage=psutil.cpu_percent(interval=None),
+                active_connections=connections or 0,
                 storage_usage=psutil.disk_usage('/').percent,
-                federation_peers=0  # Placeholder for future implementation
+                federation_peers=self.federation_peers() if self.federation_peers else None
             )
-            
+
         except Exception as e:
-            logger.error(f"Metrics collection failed: {str(e)}")
+            logger.error("Metrics collection failed: %s", e)
             return HealthMetrics(
                 memory_usage=0,
                 cpu_usage=0,
-                active_connections=0,
+                active_connections=connections or 0,
                 storage_usage=0,
-                federation_peers=0
-            )
\ No newline at end of file
+                federation_peers=None
+            )
+
+    async def run(self) -> None:
+        """Sample periodically until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with self._lock:
+                    await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Health sampling failed: %s", e)
+
+    async def start(self) -> None:
+        """Take a first sample, so readiness is known before traffic arrives, then sample in the background."""
+        await self.check_health(force=True)
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,157 @@
+"""
+Per-request SQL instrumentation.
+
+Engine event hooks count the queries each request issues and the time spent
+in them. The totals are returned in a Server-Timing header and logged at
+debug level. Queries slower than SLOW_QUERY_SECONDS are logged with their
+parameter values redacted. With REPEATED_QUERY_MODE set to "warn" or "raise",
+a request running the same statement more than REPEATED_QUERY_THRESHOLD
+times is reported or failed, which catches N+1 query patterns in development
+and tests. Code that repeats statements by design, such as the chunks of a
+bulk import, runs them inside repeated_queries_allowed().
+"""
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+from app.logger import setup_logger
+
+logger = setup_logger(__name__, get_settings().LOG_LEVEL)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r"(?:\$\d+|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|\?))*")
+_WHITESPACE = re.compile(r"\s+")
+
+class RepeatedQueryError(RuntimeError):
+    """Raised in "raise" mode when a request repeats a statement too often."""
+
+def redact(statement: str) -> str:
+    """Statement text with string literals blanked out; bound values are never part of it."""
+    return _WHITESPACE.sub(" ", _STRING_LITERAL.sub("'?'", statement)).strip()
+
+def statement_shape(statement: str) -> str:
+    """Normalised statement, equal for queries that differ only in their values or IN list lengths."""
+    return _PLACEHOLDER_LIST.sub("?", redact(statement))
+
+class RequestStats:
+    """Queries and database time of one request."""
+    __slots__ = ("queries", "db_time", "shapes", "repeat_limit", "raise_on_repeat")
+
+    def __init__(self, repeat_limit: Optional[int] = None, raise_on_repeat: bool = False):
+        self.queries = 0
+        self.db_time = 0.0
+        # Executions per statement shape, only kept while repeated queries are checked
+        self.shapes: Optional[Dict[str, int]] = {} if repeat_limit is not None else None
+        self.repeat_limit = repeat_limit
+        self.raise_on_repeat = raise_on_repeat
+
+    def count_statement(self, statement: str) -> None:
+        shape = statement_shape(statement)
+        count = self.shapes.get(shape, 0) + 1
+        self.shapes[shape] = count
+        if self.raise_on_repeat and count > self.repeat_limit:
+            raise RepeatedQueryError(f"Statement repeated {count} times in one request: {shape[:200]}")
+
+    def repeated(self) -> Dict[str, int]:
+        """Statement shapes run more often than the limit."""
+        if self.shapes is None:
+            return {}
+        return {shape: count for shape, count in self.shapes.items() if count > self.repeat_limit}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"'
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    """Statistics of the request being handled, if any."""
+    return _request_stats.get()
+
+@contextmanager
+def repeated_queries_allowed() -> Iterator[None]:
+    """Leave the statements run inside out of the repeated-query check, for deliberate per-chunk loops."""
+    stats = _request_stats.get()
+    if stats is None or stats.shapes is None:
+        yield
+        return
+    shapes = stats.shapes
+    stats.shapes = None
+    try:
+        yield
+    finally:
+        stats.shapes = shapes
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is not None and stats.shapes is not None:
+        stats.count_statement(statement)
+    context._query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_started
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+    slow_query_seconds = get_settings().SLOW_QUERY_SECONDS
+    if 0 < slow_query_seconds <= elapsed:
+        count = len(parameters) if executemany else 1
+        logger.warning(
+            "Slow query (%.1f ms, %s parameter sets redacted): %s", elapsed * 1000, count, redact(statement)
+        )
+
+def instrument_engine(engine: Engine) -> None:
+    """Attach the query hooks to an engine; for an AsyncEngine pass its sync_engine."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware collecting the SQL statistics of each HTTP request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        settings = get_settings()
+        mode = settings.REPEATED_QUERY_MODE
+        stats = RequestStats(
+            repeat_limit=settings.REPEATED_QUERY_THRESHOLD if mode != "off" else None,
+            raise_on_repeat=mode == "raise"
+        )
+        status = 500
+
+        async def timed_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [
+                    *message.get("headers", ()), (b"server-timing", stats.server_timing().encode("latin-1"))
+                ]
+            await send(message)
+
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            _request_stats.reset(token)
+            logger.debug(
+                "%s %s %s: %s queries, %.1f ms in the database",
+                scope["method"], scope["path"], status, stats.queries, stats.db_time * 1000
+            )
+            for shape, count in stats.repeated().items():
+                logger.warning(
+                    "%s %s ran the same statement %s times, a likely N+1 query: %s",
+                    scope["method"], scope["path"], count, shape[:200]
+                )
@@ -1,39 +1,147 @@
+"""
+Queue-based logging pipeline.
+
+Loggers only put records on an in-memory queue; a background listener thread
+formats them and writes them to stdout and to a size-rotated file, so request
+handlers never wait on log I/O. Records are written as JSON by default
+(LOG_FORMAT=text for plain lines) and carry the correlation id of the request
+they were logged in.
+"""
+import atexit
+import copy
 import logging
+import queue
+import re
 import sys
-from pathlib import Path
+import threading
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
+
+from pythonjsonlogger import jsonlogger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import get_settings
+
+CORRELATION_ID_HEADER = "X-Request-ID"
+# Client-supplied ids are only reused when they look like ids
+_VALID_CORRELATION_ID = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+correlation_id: ContextVar[Optional[str]] = ContextVar("correlation_id", default=None)
+
+class _ContextQueueHandler(QueueHandler):
+    """Queues records with their message rendered and the current correlation id attached."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only runs for records that pass the level check, so disabled calls never format
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.correlation_id = correlation_id.get()
+        return record
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+def _formatter(log_format: str) -> logging.Formatter:
+    if log_format == "text":
+        return logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - [%(correlation_id)s] %(message)s')
+    return jsonlogger.JsonFormatter(
+        '%(asctime)s %(name)s %(levelname)s %(correlation_id)s %(message)s',
+        rename_fields={"asctime": "timestamp", "levelname": "level"}
+    )
+
+def _start_pipeline() -> QueueHandler:
+    """Create the queue and start the listener writing to stdout and the log file, once per process."""
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is None:
+            settings = get_settings()
+            formatter = _formatter(settings.LOG_FORMAT)
+
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(formatter)
+
+            settings.LOG_DIR.mkdir(exist_ok=True)
+            file_handler = RotatingFileHandler(
+                settings.LOG_DIR / "thingdata.log",
+                maxBytes=settings.LOG_FILE_MAX_BYTES,
+                backupCount=settings.LOG_FILE_BACKUPS,
+                encoding="utf-8"
+            )
+            file_handler.setFormatter(formatter)
+
+            records: queue.SimpleQueue = queue.SimpleQueue()
+            _listener = QueueListener(records, console_handler, file_handler, respect_handler_level=True)
+            _listener.start()
+            # Write out what is still queued when the process exits
+            atexit.register(stop_logging)
+            _queue_handler = _ContextQueueHandler(records)
+    return _queue_handler
+
+def stop_logging() -> None:
+    """Flush the queue and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 def setup_logger(name: str, log_level: str = "INFO") -> logging.Logger:
     """
-    Set up logger with file and console handlers.
-    
+    Set up a logger feeding the shared logging pipeline.
+
+    Calling it again for the same name only updates the level.
+
     Args:
         name: Logger name
         log_level: Logging level (default: INFO)
     """
-    # Create logger
     logger = logging.getLogger(name)
     logger.setLevel(log_level)
+    handler = _start_pipeline()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    return logger
 
-    # Create formatters
-    file_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    console_formatter = logging.Formatter(
-        '%(levelname)s: %(message)s'
-    )
+class CorrelationIdMiddleware:
+    """
+    Pure ASGI middleware giving each HTTP request a correlation id.
+
+    The id is taken from the X-Request-ID header when present and well
+    formed, generated otherwise, attached to every record logged while the
+    request is handled and returned in the response's X-Request-ID header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-    # Create console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    # Create logs directory if it doesn't exist
-    logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if request_id is None or not _VALID_CORRELATION_ID.match(request_id):
+            request_id = uuid.uuid4().hex
 
-    # Create file handler
-    file_handler = logging.FileHandler(logs_dir / "thingdata.log")
-    file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[CORRELATION_ID_HEADER] = request_id
+            await send(message)
 
-    return logger
\ No newline at end of file
+        token = correlation_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            correlation_id.reset(token)
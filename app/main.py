@@ -1,28 +1,46 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, status
-from app.security import configure_security, SecurityValidator, SecurityException
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from app.security import configure_security, require_admin_token, SecurityValidator
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, HTMLResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Set
 import uuid
 from datetime import datetime
 import psutil
 from pathlib import Path
 from app.version import VERSION
-
-from app.database import get_db, init_db
+from app.filters import thing_filters, story_filters, guide_filters, relationship_filters
+from app.pagination import MAX_PAGE_SIZE, paginate, set_next_cursor, NEXT_CURSOR_HEADER
+from app.cache import create_entity_cache
+from app.conditional import EntityVersion, entity_version
+from app.export import stream_ndjson
+from app.importer import import_records, reader_for
+from app.search import search_entities
+from app.serialization import serialize
+from app import metrics
+from app.instrumentation import InstrumentationMiddleware
+from app.capture import RequestCaptureMiddleware
+from app.graph import MAX_GRAPH_DEPTH, MAX_GRAPH_NODES, traverse
+from app.graph_index import edge_row, graph_index
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal, async_engine, engine, get_db
 from app.models import Thing, Story, Guide, Relationship
 from app.schemas import (
     ThingCreate, ThingResponse,
     StoryCreate, StoryResponse,
     GuideCreate, GuideResponse,
     RelationshipCreate, RelationshipResponse,
+    BatchResponse, BatchItem, BatchItemResult, BatchItemStatus, RejectedItem,
     HealthResponse, ComponentStatus,
-    EntityType
+    EntityType, ExportCollection, ImportFormat, ImportReport,
+    SearchResponse, GraphResponse, TraversalDirection
 )
 
 from app.health import HealthChecker
-from app.logger import setup_logger
+from app.logger import CORRELATION_ID_HEADER, CorrelationIdMiddleware, setup_logger
 
 # Initialize logger first
 logger = setup_logger(__name__)
@@ -37,7 +55,8 @@ app = FastAPI(
 # Add security module
 configure_security(app)
 
-health_checker = HealthChecker()
+health_checker = HealthChecker(interval=get_settings().HEALTH_SAMPLE_SECONDS)
+entity_cache = create_entity_cache(get_settings())
 
 # CORS configuration
 app.add_middleware(
@@ -46,8 +65,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Link", "ETag", CORRELATION_ID_HEADER],
 )
 
+app.add_middleware(InstrumentationMiddleware)
+app.add_middleware(RequestCaptureMiddleware)
+app.add_middleware(CorrelationIdMiddleware)
+# Outermost, so latencies include the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+@app.on_event("startup")
+async def start_health_sampler():
+    await health_checker.start()
+
+@app.on_event("shutdown")
+async def stop_health_sampler():
+    await health_checker.stop()
+
+@app.on_event("startup")
+async def start_graph_index():
+    """Build the in-memory relationship graph index in the background, when enabled."""
+    settings = get_settings()
+    if settings.GRAPH_INDEX_ENABLED:
+        graph_index.start(AsyncSessionLocal, settings.GRAPH_INDEX_REFRESH_SECONDS)
+
+@app.on_event("shutdown")
+async def stop_graph_index():
+    await graph_index.stop()
+
+@app.on_event("shutdown")
+async def close_entity_cache():
+    if entity_cache is not None:
+        await entity_cache.close()
+
 # Favicon handling
 app_dir = Path(__file__).parent
 static_dir = app_dir / "static"
@@ -96,6 +146,7 @@ async def root():
             <ul>
                 <li><code><a href="docs" title="docs">/docs</a></code> - Interactive API documentation</li>
                 <li><code><a href="health" title="health">/health</a></code> - System health check</li>
+                <li><code><a href="health/live" title="liveness">/health/live</a></code>, <code><a href="health/ready" title="readiness">/health/ready</a></code> - Load balancer probes</li>
                 <li><code><a href="api/v1/things" title="things">/api/v1/things</a></code> - Thing management</li>
                 <li><code><a href="api/v1/stories" title="stories">/api/v1/stories</a></code> - Story management</li>
                 <li><code><a href="api/v1/guides" title="guides">/api/v1/guides</a></code> - Guide management</li>
@@ -110,11 +161,6 @@ async def root():
     </html>
     """
 
-# Initialize database on startup
-@app.on_event("startup")
-async def startup_event():
-    init_db()
-
 @app.get('/favicon.ico')
 async def get_favicon():
     """Serve favicon."""
@@ -122,158 +168,287 @@ async def get_favicon():
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Comprehensive health check endpoint."""
+    """Comprehensive health check endpoint, served from the latest background sample."""
     return await health_checker.check_health()
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: answers as long as the process serves requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe from the latest health sample; 503 while the instance should not receive traffic."""
+    reason = health_checker.readiness()
+    if reason is not None:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "detail": reason}
+        )
+    return {"status": "ready"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics for this process."""
+    content = metrics.render(
+        {"sync": engine.pool, "async": async_engine.pool},
+        entity_cache.stats() if entity_cache is not None else None
+    )
+    return PlainTextResponse(content, media_type=metrics.CONTENT_TYPE)
+
 # Add helper function
-async def verify_entity_exists(db: Session, entity_type: str, entity_id: str) -> bool:
+async def verify_entity_exists(db: AsyncSession, entity_type: str, entity_id: str) -> bool:
     """Verify that an entity exists in the database."""
     if entity_type == EntityType.THING:
-        return db.query(Thing).filter(Thing.id == entity_id).first() is not None
+        return await db.scalar(select(Thing.id).where(Thing.id == entity_id)) is not None
     elif entity_type == EntityType.GUIDE:
-        return db.query(Guide).filter(Guide.id == entity_id).first() is not None
+        return await db.scalar(select(Guide.id).where(Guide.id == entity_id)) is not None
     elif entity_type == EntityType.STORY:
-        return db.query(Story).filter(Story.id == entity_id).first() is not None
+        return await db.scalar(select(Story.id).where(Story.id == entity_id)) is not None
     return False
 
+async def with_relationships(db: AsyncSession, model, entities) -> List[dict]:
+    """Serialize a page of entities with their relationships loaded in one query."""
+    relationships = await model.load_relationships(db, [entity.id for entity in entities])
+    return [
+        {**entity.to_dict(), 'relationships': [r.to_dict() for r in relationships.get(entity.id, [])]}
+        for entity in entities
+    ]
+
+# Rows per INSERT statement, keeping bind parameters well below the PostgreSQL limit
+BATCH_INSERT_CHUNK = 1000
+
+async def entity_response(
+    request: Request,
+    response: Response,
+    db: AsyncSession,
+    model,
+    response_model,
+    entity_id: str,
+    with_relationships: bool = True
+):
+    """
+    Return the representation of a single entity, through the entity cache when enabled.
+
+    Answers 304 when the client's copy is current and 404 when the entity does not exist.
+    """
+    entity_type = model.entity_type
+    cached = await entity_cache.get(entity_type, entity_id) if entity_cache is not None else None
+    if cached is not None:
+        version = EntityVersion(cached["etag"], datetime.fromisoformat(cached["last_modified"]))
+        if version.matches(request):
+            return version.not_modified()
+        response.headers.update(version.headers)
+        return serialize(cached["data"], response, response_model)
+
+    token = entity_cache.generation(entity_type, entity_id) if entity_cache is not None else None
+    version = await entity_version(db, model, entity_id, with_relationships)
+    if version is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    if version.matches(request):
+        return version.not_modified()
+    entity = await db.get(model, entity_id)
+    if not entity:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    data = entity.to_dict()
+    if with_relationships:
+        # Read from the database like the ETag digest, so a lagging graph index
+        # cannot put a stale body in the cache under a current ETag
+        data['relationships'] = [r.to_dict() for r in await entity.get_relationships(db, use_index=False)]
+
+    if entity_cache is not None:
+        await entity_cache.set(entity_type, entity_id, {
+            "data": data,
+            "etag": version.etag,
+            "last_modified": version.last_modified.isoformat(),
+        }, token)
+    response.headers.update(version.headers)
+    return serialize(data, response, response_model)
+
+async def invalidate_cached(entities) -> None:
+    """Drop the cached responses of (entity type, id) pairs whose representation changed."""
+    if entity_cache is not None:
+        await entity_cache.invalidate(entities)
+
+async def existing_ids(db: AsyncSession, model, ids: Set[str]) -> Set[str]:
+    """Return which of the given ids exist for a model, in one query."""
+    if not ids:
+        return set()
+    return set((await db.scalars(select(model.id).where(model.id.in_(ids)))).all())
+
+async def insert_batch(
+    db: AsyncSession,
+    model,
+    entity_type: str,
+    rows: Dict[int, dict],
+    results: List[Optional[BatchItemResult]]
+) -> BatchResponse:
+    """
+    Insert validated rows with multi-row INSERTs in a single transaction.
+
+    Rows that conflict with existing data are skipped and reported as failed
+    instead of aborting the whole batch.
+    """
+    try:
+        inserted: Set[str] = set()
+        pending = list(rows.values())
+        for start in range(0, len(pending), BATCH_INSERT_CHUNK):
+            stmt = (
+                insert(model)
+                .values(pending[start:start + BATCH_INSERT_CHUNK])
+                .on_conflict_do_nothing()
+                .returning(model.id)
+            )
+            inserted.update((await db.scalars(stmt)).all())
+        await db.commit()
+    except Exception as e:
+        logger.error("Failed to create %s batch: %s", entity_type, e)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for index, row in rows.items():
+        if row['id'] in inserted:
+            results[index] = BatchItemResult(index=index, status=BatchItemStatus.CREATED, id=row['id'])
+        else:
+            results[index] = BatchItemResult(
+                index=index,
+                status=BatchItemStatus.FAILED,
+                error=f"{entity_type} conflicts with an existing {entity_type}"
+            )
+
+    created = len(inserted)
+    logger.info("Created %s of %s %s batch items", created, len(results), entity_type)
+    return BatchResponse(created=created, failed=len(results) - created, results=results)
+
+def batch_failure(index: int, error: str) -> BatchItemResult:
+    """Result for a batch item rejected before insertion."""
+    return BatchItemResult(index=index, status=BatchItemStatus.FAILED, error=error)
+
 @app.post("/api/v1/things", response_model=ThingResponse)
-async def create_thing(thing: ThingCreate, db: Session = Depends(get_db)):
+async def create_thing(thing: ThingCreate, db: AsyncSession = Depends(get_db)):
     """Create a new thing."""
     try:
-        thing_data = thing.model_dump(mode='json')
-        
-        # Validate data
-        SecurityValidator.validate_json_depth(thing_data)
-        SecurityValidator.validate_thing_data(thing_data)
-        
-        db_thing = Thing(
-            id=str(uuid.uuid4()),
-            uri=f"thing:{thing_data['type']}/{thing_data['manufacturer']['name']}/{thing_data['name']['default']}",
-            type=thing_data['type'],
-            name=thing_data['name'],
-            manufacturer=thing_data['manufacturer'],
-            properties=thing_data.get('properties', {})
-        )
+        db_thing = Thing(**Thing.values_from_create(thing.model_dump(mode='json')))
         
         db.add(db_thing)
-        db.commit()
-        db.refresh(db_thing)
+        await db.commit()
+        await db.refresh(db_thing)
         
-        logger.info(f"Created thing: {db_thing.id}")
+        logger.info("Created thing: %s", db_thing.id)
         return db_thing.to_dict()
-    except SecurityException as e:
-        logger.error(f"Security validation failed: {str(e)}")
-        raise e
     except Exception as e:
-        logger.error(f"Failed to create thing: {str(e)}")
-        db.rollback()
+        logger.error("Failed to create thing: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/things/batch", response_model=BatchResponse)
+async def create_things_batch(things: List[BatchItem[ThingCreate]], db: AsyncSession = Depends(get_db)):
+    """Create many things in a single transaction."""
+    SecurityValidator.validate_batch_size(things)
+    results: List[Optional[BatchItemResult]] = [None] * len(things)
+    rows: Dict[int, dict] = {}
+
+    for index, thing in enumerate(things):
+        if isinstance(thing, RejectedItem):
+            results[index] = batch_failure(index, thing.error)
+            continue
+        rows[index] = Thing.values_from_create(thing.model_dump(mode='json'))
+
+    return await insert_batch(db, Thing, EntityType.THING.value, rows, results)
+
 @app.get("/api/v1/things/{thing_id}", response_model=ThingResponse)
-async def get_thing(thing_id: str, db: Session = Depends(get_db)):
-    """Get a specific thing with its relationships."""
-    thing = db.query(Thing).filter(Thing.id == thing_id).first()
-    if not thing:
-        raise HTTPException(status_code=404, detail="Thing not found")
-    data = thing.to_dict()
-    data['relationships'] = [r.to_dict() for r in thing.get_relationships(db)]
-    return data
+async def get_thing(thing_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get a specific thing with its relationships; answers 304 when the client's copy is current."""
+    return await entity_response(request, response, db, Thing, ThingResponse, thing_id)
 
 @app.get("/api/v1/things", response_model=List[ThingResponse])
 async def list_things(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all things with optional filtering."""
-    query = db.query(Thing)
-    if type:
-        query = query.filter(Thing.type == type)
-    things = query.offset(skip).limit(limit).all()
-    return [{**thing.to_dict(), 'relationships': [r.to_dict() for r in thing.get_relationships(db)]} 
-            for thing in things]
+    query = select(Thing).where(*thing_filters(type=type))
+    things, next_cursor = await paginate(db, query, Thing, limit, cursor, skip)
+    set_next_cursor(response, request.url, next_cursor)
+    return serialize(await with_relationships(db, Thing, things), response, List[ThingResponse])
 
 @app.post("/api/v1/stories", response_model=StoryResponse)
-async def create_story(story: StoryCreate, db: Session = Depends(get_db)):
+async def create_story(story: StoryCreate, db: AsyncSession = Depends(get_db)):
     """Create a new repair story."""
     try:
         if story.thing_id:
-            thing = db.query(Thing).filter(Thing.id == story.thing_id).first()
-            if not thing:
+            if not await verify_entity_exists(db, EntityType.THING, story.thing_id):
                 raise HTTPException(status_code=404, detail=f"Thing {story.thing_id} not found")
 
-        story_data = story.model_dump(mode='json')
-        
-        # Validate data
-        SecurityValidator.validate_json_depth(story_data)
-        SecurityValidator.validate_story_data(story_data)
-
-        procedure_list = [step.model_dump() for step in story.procedure]
-        
-        story_db = Story(
-            id=str(uuid.uuid4()),
-            thing_id=story.thing_id,
-            thing_category=story.thing_category.model_dump() if story.thing_category else None,
-            version={
-                "number": "1.0.0",
-                "date": datetime.utcnow().isoformat(),
-                "history": []
-            },
-            type=story.type,
-            procedure=procedure_list
-        )
+        story_db = Story(**Story.values_from_create(story.model_dump(mode='json')))
         
         db.add(story_db)
-        db.commit()
-        db.refresh(story_db)
+        await db.commit()
+        await db.refresh(story_db)
         
-        logger.info(f"Created story {story_db.id}")
+        logger.info("Created story %s", story_db.id)
         return story_db.to_dict()
-    except SecurityException as e:
-        logger.error(f"Security validation failed: {str(e)}")
-        raise e
     except Exception as e:
-        logger.error(f"Failed to create story: {str(e)}")
-        db.rollback()
+        logger.error("Failed to create story: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/stories/batch", response_model=BatchResponse)
+async def create_stories_batch(stories: List[BatchItem[StoryCreate]], db: AsyncSession = Depends(get_db)):
+    """Create many repair stories in a single transaction."""
+    SecurityValidator.validate_batch_size(stories)
+    results: List[Optional[BatchItemResult]] = [None] * len(stories)
+    found_things = await existing_ids(db, Thing, {
+        story.thing_id for story in stories if not isinstance(story, RejectedItem) and story.thing_id
+    })
+    rows: Dict[int, dict] = {}
+
+    for index, story in enumerate(stories):
+        if isinstance(story, RejectedItem):
+            results[index] = batch_failure(index, story.error)
+            continue
+        if story.thing_id and story.thing_id not in found_things:
+            results[index] = batch_failure(index, f"Thing {story.thing_id} not found")
+            continue
+        rows[index] = Story.values_from_create(story.model_dump(mode='json'))
+
+    return await insert_batch(db, Story, EntityType.STORY.value, rows, results)
+
 @app.get("/api/v1/stories", response_model=List[StoryResponse])
 async def list_stories(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     thing_id: Optional[str] = None,
     category: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all stories with optional filtering."""
-    query = db.query(Story)
-    if thing_id:
-        query = query.filter(Story.thing_id == thing_id)
-    if category:
-        query = query.filter(Story.thing_category['category'].astext == category)
-    stories = query.offset(skip).limit(limit).all()
-    return [{**story.to_dict(), 'relationships': [r.to_dict() for r in story.get_relationships(db)]} 
-            for story in stories]
+    query = select(Story).where(*story_filters(thing_id=thing_id, category=category))
+    stories, next_cursor = await paginate(db, query, Story, limit, cursor, skip)
+    set_next_cursor(response, request.url, next_cursor)
+    return serialize(await with_relationships(db, Story, stories), response, List[StoryResponse])
 
 @app.get("/api/v1/stories/{story_id}", response_model=StoryResponse)
-async def get_story(story_id: str, db: Session = Depends(get_db)):
-    """Get a specific story with its relationships."""
-    story = db.query(Story).filter(Story.id == story_id).first()
-    if not story:
-        raise HTTPException(status_code=404, detail="Story not found")
-    data = story.to_dict()
-    data['relationships'] = [r.to_dict() for r in story.get_relationships(db)]
-    return data
+async def get_story(story_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get a specific story with its relationships; answers 304 when the client's copy is current."""
+    return await entity_response(request, response, db, Story, StoryResponse, story_id)
 
 @app.get("/api/v1/things/{thing_id}/stories", response_model=List[StoryResponse])
-async def get_thing_stories(thing_id: str, db: Session = Depends(get_db)):
+async def get_thing_stories(thing_id: str, response: Response, db: AsyncSession = Depends(get_db)):
     """Get all stories for a thing."""
-    stories = db.query(Story).filter(Story.thing_id == thing_id).all()
-    return [story.to_dict() for story in stories]
+    stories = (await db.execute(select(Story).where(Story.thing_id == thing_id))).scalars().all()
+    return serialize([story.to_dict() for story in stories], response, List[StoryResponse])
 
 @app.post("/api/v1/relationships", response_model=RelationshipResponse)
-async def create_relationship(relationship: RelationshipCreate, db: Session = Depends(get_db)):
+async def create_relationship(relationship: RelationshipCreate, db: AsyncSession = Depends(get_db)):
     """Create a new relationship."""
     try:
         # Verify source exists
@@ -298,119 +473,230 @@ async def create_relationship(relationship: RelationshipCreate, db: Session = De
             target_id=relationship.target_id,
             relationship_type=relationship.relationship_type,
             direction=relationship.direction,
-            metadata=relationship.metadata
+            relation_metadata=relationship.metadata
         )
         db.add(relationship_db)
-        db.commit()
-        db.refresh(relationship_db)
-        logger.info(f"Created relationship: {relationship_db.id}")
+        await db.commit()
+        await db.refresh(relationship_db)
+        graph_index.record(edge_row(relationship_db.to_dict()), relationship_db.created_at)
+        await invalidate_cached([
+            (relationship_db.source_type, relationship_db.source_id),
+            (relationship_db.target_type, relationship_db.target_id),
+        ])
+        logger.info("Created relationship: %s", relationship_db.id)
         return relationship_db.to_dict()
     except Exception as e:
-        logger.error(f"Failed to create relationship: {str(e)}")
-        db.rollback()
+        logger.error("Failed to create relationship: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/relationships/batch", response_model=BatchResponse)
+async def create_relationships_batch(
+    relationships: List[BatchItem[RelationshipCreate]], db: AsyncSession = Depends(get_db)
+):
+    """Create many relationships in a single transaction."""
+    SecurityValidator.validate_batch_size(relationships)
+    results: List[Optional[BatchItemResult]] = [None] * len(relationships)
+
+    # Look up every referenced entity with one query per entity type
+    referenced: Dict[EntityType, Set[str]] = {entity_type: set() for entity_type in EntityType}
+    for relationship in relationships:
+        if isinstance(relationship, RejectedItem):
+            continue
+        referenced[relationship.source_type].add(relationship.source_id)
+        referenced[relationship.target_type].add(relationship.target_id)
+    models = {EntityType.THING: Thing, EntityType.STORY: Story, EntityType.GUIDE: Guide}
+    found = {
+        entity_type: await existing_ids(db, models[entity_type], ids)
+        for entity_type, ids in referenced.items()
+    }
+
+    rows: Dict[int, dict] = {}
+    for index, relationship in enumerate(relationships):
+        if isinstance(relationship, RejectedItem):
+            results[index] = batch_failure(index, relationship.error)
+            continue
+        if relationship.source_id not in found[relationship.source_type]:
+            results[index] = batch_failure(index, f"{relationship.source_type.value} {relationship.source_id} not found")
+            continue
+        if relationship.target_id not in found[relationship.target_type]:
+            results[index] = batch_failure(index, f"{relationship.target_type.value} {relationship.target_id} not found")
+            continue
+        rows[index] = Relationship.values_from_create(relationship.model_dump(mode='json'))
+
+    response = await insert_batch(db, Relationship, "relationship", rows, results)
+    created = [row for index, row in rows.items() if results[index].status == BatchItemStatus.CREATED]
+    for row in created:
+        graph_index.record(edge_row(row), row['created_at'])
+    await invalidate_cached(
+        entity for row in created
+        for entity in ((row['source_type'], row['source_id']), (row['target_type'], row['target_id']))
+    )
+    return response
+
 @app.get("/api/v1/relationships", response_model=List[RelationshipResponse])
 async def list_relationships(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     source_type: Optional[EntityType] = None,
     source_id: Optional[str] = None,
     target_type: Optional[EntityType] = None,
     target_id: Optional[str] = None,
     relationship_type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List relationships with optional filtering."""
-    query = db.query(Relationship)
-    if source_type:
-        query = query.filter(Relationship.source_type == source_type)
-    if source_id:
-        query = query.filter(Relationship.source_id == source_id)
-    if target_type:
-        query = query.filter(Relationship.target_type == target_type)
-    if target_id:
-        query = query.filter(Relationship.target_id == target_id)
-    if relationship_type:
-        query = query.filter(Relationship.relationship_type == relationship_type)
-    relationships = query.offset(skip).limit(limit).all()
-    return [rel.to_dict() for rel in relationships]
+    query = select(Relationship).where(*relationship_filters(
+        source_type=source_type,
+        source_id=source_id,
+        target_type=target_type,
+        target_id=target_id,
+        relationship_type=relationship_type
+    ))
+    relationships, next_cursor = await paginate(db, query, Relationship, limit, cursor, skip)
+    set_next_cursor(response, request.url, next_cursor)
+    return serialize([rel.to_dict() for rel in relationships], response, List[RelationshipResponse])
 
 @app.get("/api/v1/relationships/{relationship_id}", response_model=RelationshipResponse)
-async def get_relationship(relationship_id: str, db: Session = Depends(get_db)):
-    """Get a specific relationship."""
-    relationship = db.query(Relationship).filter(Relationship.id == relationship_id).first()
-    if not relationship:
-        raise HTTPException(status_code=404, detail="Relationship not found")
-    return relationship.to_dict()
+async def get_relationship(
+    relationship_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)
+):
+    """Get a specific relationship; answers 304 when the client's copy is current."""
+    return await entity_response(
+        request, response, db, Relationship, RelationshipResponse, relationship_id, with_relationships=False
+    )
 
 @app.post("/api/v1/guides", response_model=GuideResponse)
-async def create_guide(guide: GuideCreate, db: Session = Depends(get_db)):
+async def create_guide(guide: GuideCreate, db: AsyncSession = Depends(get_db)):
     """Create a new guide."""
     try:
         if guide.thing_id:
-            thing = db.query(Thing).filter(Thing.id == guide.thing_id).first()
-            if not thing:
+            if not await verify_entity_exists(db, EntityType.THING, guide.thing_id):
                 raise HTTPException(status_code=404, detail=f"Thing {guide.thing_id} not found")
 
-        guide_data = guide.model_dump(mode='json')
-        
-        # Validate data
-        SecurityValidator.validate_json_depth(guide_data)
-        SecurityValidator.validate_guide_data(guide_data)
-
-        guide_db = Guide(
-            id=str(uuid.uuid4()),
-            thing_id=guide.thing_id,
-            thing_category=guide.thing_category.model_dump() if guide.thing_category else None,
-            type=guide.type.model_dump(),
-            content=guide.content.model_dump()
-        )
+        guide_db = Guide(**Guide.values_from_create(guide.model_dump(mode='json')))
         
         db.add(guide_db)
-        db.commit()
-        db.refresh(guide_db)
+        await db.commit()
+        await db.refresh(guide_db)
         
-        logger.info(f"Created guide: {guide_db.id}")
+        logger.info("Created guide: %s", guide_db.id)
         return guide_db.to_dict()
-    except SecurityException as e:
-        logger.error(f"Security validation failed: {str(e)}")
-        raise e
     except Exception as e:
-        logger.error(f"Failed to create guide: {str(e)}")
-        db.rollback()
+        logger.error("Failed to create guide: %s", e)
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/guides/batch", response_model=BatchResponse)
+async def create_guides_batch(guides: List[BatchItem[GuideCreate]], db: AsyncSession = Depends(get_db)):
+    """Create many guides in a single transaction."""
+    SecurityValidator.validate_batch_size(guides)
+    results: List[Optional[BatchItemResult]] = [None] * len(guides)
+    found_things = await existing_ids(db, Thing, {
+        guide.thing_id for guide in guides if not isinstance(guide, RejectedItem) and guide.thing_id
+    })
+    rows: Dict[int, dict] = {}
+
+    for index, guide in enumerate(guides):
+        if isinstance(guide, RejectedItem):
+            results[index] = batch_failure(index, guide.error)
+            continue
+        if guide.thing_id and guide.thing_id not in found_things:
+            results[index] = batch_failure(index, f"Thing {guide.thing_id} not found")
+            continue
+        rows[index] = Guide.values_from_create(guide.model_dump(mode='json'))
+
+    return await insert_batch(db, Guide, EntityType.GUIDE.value, rows, results)
+
 @app.get("/api/v1/guides", response_model=List[GuideResponse])
 async def list_guides(
-    skip: int = 0,
-    limit: int = 100,
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     thing_id: Optional[str] = None,
     category: Optional[str] = None,
     type: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """List all guides with optional filtering."""
-    query = db.query(Guide)
-    if thing_id:
-        query = query.filter(Guide.thing_id == thing_id)
-    if category:
-        query = query.filter(Guide.thing_category['category'].astext == category)
-    if type:
-        query = query.filter(Guide.type['primary'].astext == type)
-    guides = query.offset(skip).limit(limit).all()
-    return [{**guide.to_dict(), 'relationships': [r.to_dict() for r in guide.get_relationships(db)]} 
-            for guide in guides]
+    query = select(Guide).where(*guide_filters(thing_id=thing_id, category=category, type=type))
+    guides, next_cursor = await paginate(db, query, Guide, limit, cursor, skip)
+    set_next_cursor(response, request.url, next_cursor)
+    return serialize(await with_relationships(db, Guide, guides), response, List[GuideResponse])
             
 @app.get("/api/v1/guides/{guide_id}", response_model=GuideResponse)
-async def get_guide(guide_id: str, db: Session = Depends(get_db)):
-    """Get a specific guide with its relationships."""
-    guide = db.query(Guide).filter(Guide.id == guide_id).first()
-    if not guide:
-        raise HTTPException(status_code=404, detail="Guide not found")
-    data = guide.to_dict()
-    data['relationships'] = [r.to_dict() for r in guide.get_relationships(db)]
-    return data
+async def get_guide(guide_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_db)):
+    """Get a specific guide with its relationships; answers 304 when the client's copy is current."""
+    return await entity_response(request, response, db, Guide, GuideResponse, guide_id)
+
+@app.get("/api/v1/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, max_length=256),
+    lang: str = Query("en", min_length=2, max_length=8, description="ISO language code of the query"),
+    types: Optional[List[EntityType]] = Query(None, description="Entity types to search (default: all)"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Full-text search across things, stories and guides, best matches first."""
+    results = await search_entities(db, q, lang, types, limit)
+    return SearchResponse(query=q, language=lang, results=results)
+
+@app.get("/api/v1/graph/{entity_type}/{entity_id}", response_model=GraphResponse)
+async def get_graph(
+    entity_type: EntityType,
+    entity_id: str,
+    depth: int = Query(2, ge=1, le=MAX_GRAPH_DEPTH),
+    types: Optional[List[str]] = Query(None, description="Relationship types to follow (default: all)"),
+    direction: TraversalDirection = TraversalDirection.BOTH,
+    limit: int = Query(100, ge=1, le=MAX_GRAPH_NODES, description="Maximum number of nodes"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the subgraph of entities related to an entity, up to a number of hops away."""
+    if not await verify_entity_exists(db, entity_type, entity_id):
+        raise HTTPException(status_code=404, detail=f"{entity_type.value.capitalize()} not found")
+    return await traverse(db, entity_type, entity_id, depth, types, direction, limit)
+
+@app.get("/api/v1/export/{collection}", response_class=StreamingResponse)
+async def export_collection(collection: ExportCollection, updated_since: Optional[datetime] = None):
+    """Stream a whole collection as newline-delimited JSON, optionally only rows changed since a time."""
+    logger.info("Exporting %s (updated_since=%s)", collection.value, updated_since)
+    return StreamingResponse(
+        stream_ndjson(collection, updated_since),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{collection.value}.ndjson"'}
+    )
+
+@app.post(
+    "/api/v1/admin/import/{collection}",
+    response_model=ImportReport,
+    dependencies=[Depends(require_admin_token)]
+)
+async def import_collection(collection: ExportCollection, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Bulk load NDJSON (application/x-ndjson) or CSV (text/csv) into a collection.
+
+    Requires the X-Admin-Token header. Rows are validated and loaded in
+    chunks; the report lists rejected rows with their line numbers.
+    """
+    content_type = request.headers.get("content-type", "")
+    import_format = ImportFormat.CSV if content_type.startswith("text/csv") else ImportFormat.NDJSON
+    try:
+        report = await import_records(db, collection, reader_for(import_format)(request.stream()))
+    except Exception as e:
+        logger.error("Failed to import %s: %s", collection.value, e)
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    if collection == ExportCollection.RELATIONSHIPS and report.inserted:
+        # Imported rows keep their creation times, which the incremental refresh may not reach
+        graph_index.request_rebuild()
+        if entity_cache is not None:
+            await entity_cache.clear()
+    return report
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,203 @@
+"""
+Prometheus metrics in the text exposition format.
+
+Recording costs a few dict lookups and increments per request; the text is
+only built when /metrics is scraped. Values are kept per process, so every
+server process is scraped on its own.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# Route label for requests that matched no route, so unknown paths cannot grow the series
+UNMATCHED_ROUTE = "unmatched"
+
+class Histogram:
+    """Observation counts per bucket, with their sum, for one label set."""
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        # One slot per bucket plus one for +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _header(name: str, help_text: str, metric_type: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+def sample_lines(
+    name: str, help_text: str, metric_type: str, label_names: Sequence[str], samples: Dict[Tuple, float]
+) -> List[str]:
+    """Exposition lines for a counter or gauge, with one sample per label values tuple."""
+    lines = _header(name, help_text, metric_type)
+    for values, value in sorted(samples.items()):
+        lines.append(f"{name}{_labels(label_names, values)} {value}")
+    return lines
+
+def histogram_lines(
+    name: str, help_text: str, label_names: Sequence[str], series: Dict[Tuple, Histogram]
+) -> List[str]:
+    """Exposition lines for histograms, with one histogram per label values tuple."""
+    lines = _header(name, help_text, "histogram")
+    bucket_names = tuple(label_names) + ("le",)
+    for values, histogram in sorted(series.items()):
+        cumulative = 0
+        bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(bucket_names, values + (bound,))} {cumulative}")
+        labels = _labels(label_names, values)
+        lines.append(f"{name}_sum{labels} {histogram.sum}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+    return lines
+
+class RequestMetrics:
+    """Request counts, latencies and in-flight requests, by method and route template."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float) -> None:
+        key = (method, route, status)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    def lines(self) -> List[str]:
+        requests = {(method, route, str(status)): count for (method, route, status), count in self.requests.items()}
+        return (
+            sample_lines(
+                "thingdata_http_requests_total", "HTTP requests handled", "counter",
+                ("method", "route", "status"), requests
+            )
+            + histogram_lines(
+                "thingdata_http_request_duration_seconds", "HTTP request latency", ("method", "route"), self.latency
+            )
+            + sample_lines(
+                "thingdata_http_requests_in_flight", "HTTP requests being handled", "gauge", (), {(): self.in_flight}
+            )
+        )
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording every HTTP request into RequestMetrics."""
+
+    def __init__(self, app: ASGIApp, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.metrics = metrics if metrics is not None else request_metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def recording_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.in_flight -= 1
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            metrics.observe(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status, elapsed)
+
+request_metrics = RequestMetrics()
+
+# Time spent getting a connection from each pool, by pool label
+pool_checkout: Dict[str, Histogram] = {}
+
+def observe_pool_checkout(pool: str, seconds: float) -> None:
+    histogram = pool_checkout.get(pool)
+    if histogram is None:
+        histogram = pool_checkout[pool] = Histogram(POOL_WAIT_BUCKETS)
+    histogram.observe(seconds)
+
+def pool_lines(pools: Dict[str, Pool]) -> List[str]:
+    """Exposition lines for SQLAlchemy queue pools, by label."""
+    size, checked_out, overflow = {}, {}, {}
+    for label, pool in pools.items():
+        size[(label,)] = pool.size()
+        checked_out[(label,)] = pool.checkedout()
+        # QueuePool counts idle capacity as negative overflow
+        overflow[(label,)] = max(pool.overflow(), 0)
+    return (
+        sample_lines("thingdata_db_pool_size", "Configured pool size", "gauge", ("pool",), size)
+        + sample_lines("thingdata_db_pool_checked_out", "Connections in use", "gauge", ("pool",), checked_out)
+        + sample_lines("thingdata_db_pool_overflow", "Connections open beyond the pool size", "gauge", ("pool",), overflow)
+        + histogram_lines(
+            "thingdata_db_pool_checkout_seconds", "Time to get a connection from the pool",
+            ("pool",), {(label,): histogram for label, histogram in pool_checkout.items()}
+        )
+    )
+
+def cache_lines(stats: Dict[str, int]) -> List[str]:
+    """Exposition lines for EntityCache.stats()."""
+    lookups = stats["hits"] + stats["misses"]
+    return (
+        sample_lines("thingdata_cache_hits_total", "Entity cache hits", "counter", (), {(): stats["hits"]})
+        + sample_lines(
+            "thingdata_cache_shared_hits_total", "Entity cache hits served by the shared store", "counter",
+            (), {(): stats["shared_hits"]}
+        )
+        + sample_lines("thingdata_cache_misses_total", "Entity cache misses", "counter", (), {(): stats["misses"]})
+        + sample_lines("thingdata_cache_entries", "Entries in the local cache", "gauge", (), {(): stats["entries"]})
+        + sample_lines(
+            "thingdata_cache_hit_ratio", "Share of entity cache lookups that hit", "gauge",
+            (), {(): stats["hits"] / lookups if lookups else 0.0}
+        )
+    )
+
+# Extra sources of exposition lines, such as the federation queues
+collectors: List[Callable[[], Iterable[str]]] = []
+
+def register_collector(collector: Callable[[], Iterable[str]]) -> None:
+    if collector not in collectors:
+        collectors.append(collector)
+
+def unregister_collector(collector: Callable[[], Iterable[str]]) -> None:
+    if collector in collectors:
+        collectors.remove(collector)
+
+def render(pools: Dict[str, Pool], cache_stats: Optional[Dict[str, int]] = None) -> str:
+    """Build the exposition text for a scrape."""
+    lines = request_metrics.lines() + pool_lines(pools)
+    if cache_stats is not None:
+        lines += cache_lines(cache_stats)
+    for collector in collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,20 @@
+"""
+Versioned schema migrations.
+
+Migrations own the database schema: each module in app/migrations/versions
+is applied once, in version order, and recorded in the schema_migrations
+table. Run them at deploy time, before starting the API:
+
+    python -m app.migrations upgrade
+    python -m app.migrations status
+
+A migration module defines ``upgrade(op)``, receiving an Operations object,
+and may set ``transactional = False`` to run outside a transaction. That is
+required for ``CREATE INDEX CONCURRENTLY`` and batched backfills, which build
+indexes and fill columns on large tables without blocking writes.
+Non-transactional migrations are recorded only once they complete, so they
+must be safe to re-run after a failure part way through.
+"""
+from app.migrations.runner import Migration, Operations, load_migrations, status, upgrade
+
+__all__ = ["Migration", "Operations", "load_migrations", "status", "upgrade"]
@@ -0,0 +1,36 @@
+"""
+Apply or inspect schema migrations.
+
+Usage:
+    python -m app.migrations upgrade [--target VERSION]
+    python -m app.migrations status
+"""
+import argparse
+import sys
+
+from app.database import engine
+from app.migrations.runner import status, upgrade
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = commands.add_parser("upgrade", help="Apply pending migrations")
+    upgrade_parser.add_argument("--target", help="Last migration version to apply")
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    args = parser.parse_args()
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, args.target)
+        print(f"Applied {len(applied)} migration(s)")
+        return 0
+
+    pending = 0
+    for migration, applied_at in status(engine):
+        state = applied_at.isoformat(timespec="seconds") if applied_at else "pending"
+        pending += applied_at is None
+        print(f"{migration.version}  {state:<25}  {migration.description}")
+    return 1 if pending else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Discovery, bookkeeping and online schema change helpers for migrations."""
+import importlib
+import pkgutil
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+# Key of the advisory lock that keeps concurrent deploys from migrating at once
+MIGRATION_LOCK_ID = 7256013
+# Give up on DDL that waits this long for a lock instead of queueing every
+# other query on the table behind it; migrations can simply be re-run
+LOCK_TIMEOUT = "10s"
+BACKFILL_BATCH_SIZE = 5000
+
+class Migration:
+    """A migration module from app/migrations/versions."""
+
+    def __init__(self, module):
+        self.module = module
+        module_name = module.__name__.rsplit(".", 1)[-1]
+        self.version, _, self.name = module_name.partition("_")
+        self.transactional = getattr(module, "transactional", True)
+        self.description = (module.__doc__ or self.name).strip().splitlines()[0]
+
+    def upgrade(self, op: "Operations") -> None:
+        self.module.upgrade(op)
+
+    def __repr__(self) -> str:
+        return f"<Migration {self.version}_{self.name}>"
+
+class Operations:
+    """Schema change helpers handed to a migration's upgrade function."""
+
+    def __init__(self, connection: Connection, transactional: bool):
+        self.connection = connection
+        self.transactional = transactional
+
+    def execute(self, sql: str, params: Optional[Dict[str, Any]] = None):
+        """Execute a SQL statement."""
+        return self.connection.execute(text(sql), params or {})
+
+    def scalar(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Execute a SQL query and return the first column of the first row."""
+        return self.connection.execute(text(sql), params or {}).scalar()
+
+    def column_type(self, table: str, column: str) -> Optional[str]:
+        """Return the data type of a column, or None if it does not exist."""
+        return self.scalar(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column",
+            {"table": table, "column": column}
+        )
+
+    def constraint_exists(self, table: str, name: str) -> bool:
+        """Return whether a table has a constraint with this name."""
+        return bool(self.scalar(
+            "SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(:table) AND conname = :name",
+            {"table": table, "name": name}
+        ))
+
+    def index_valid(self, name: str) -> Optional[bool]:
+        """Return whether an index is valid, or None if it does not exist."""
+        return self.scalar(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace",
+            {"name": name}
+        )
+
+    def _require_autocommit(self, operation: str) -> None:
+        if self.transactional:
+            raise RuntimeError(f"{operation} requires a migration with transactional = False")
+
+    def create_index_concurrently(self, name: str, table: str, definition: str, unique: bool = False) -> None:
+        """
+        Build an index without blocking writes to the table.
+
+        A failed concurrent build leaves an invalid index behind, which is
+        dropped and rebuilt; a valid index with this name is kept as is.
+
+        Args:
+            name: Index name
+            table: Table name
+            definition: Everything after the table name, e.g. ``(created_at, id)``
+                or ``USING gin (search_en)``
+            unique: Whether to build a unique index
+        """
+        self._require_autocommit("CREATE INDEX CONCURRENTLY")
+        valid = self.index_valid(name)
+        if valid:
+            return
+        if valid is False:
+            logger.warning("Rebuilding invalid index %s left by an interrupted build", name)
+            self.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        logger.info("Building index %s on %s", name, table)
+        self.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY {name} ON {table} {definition}")
+
+    def drop_index_concurrently(self, name: str) -> None:
+        """Drop an index, if it exists, without blocking writes to its table."""
+        self._require_autocommit("DROP INDEX CONCURRENTLY")
+        self.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    def backfill(
+        self, table: str, assignments: str, where: str, batch_size: int = BACKFILL_BATCH_SIZE, key: str = "id"
+    ) -> int:
+        """
+        Update the rows matching a condition in batches, committing each batch.
+
+        Each batch locks only the rows it updates, so writers are never held up
+        for long. The assignments must make the condition false for the
+        updated rows, otherwise the backfill never finishes.
+
+        Args:
+            table: Table name
+            assignments: SET clause, e.g. ``search_simple = ...``
+            where: Condition selecting rows still to be filled, e.g. ``search_simple IS NULL``
+            batch_size: Rows updated per transaction
+            key: Unique column used to select batches
+
+        Returns:
+            The number of updated rows
+        """
+        self._require_autocommit("Batched backfill")
+        total = 0
+        while True:
+            updated = self.execute(
+                f"UPDATE {table} SET {assignments} WHERE {key} IN "
+                f"(SELECT {key} FROM {table} WHERE {where} LIMIT :batch_size)",
+                {"batch_size": batch_size}
+            ).rowcount
+            if not updated:
+                break
+            total += updated
+            logger.info("Backfilled %s rows of %s", total, table)
+        return total
+
+def load_migrations() -> List[Migration]:
+    """Return all migrations in version order."""
+    from app.migrations import versions
+
+    migrations = [
+        Migration(importlib.import_module(f"{versions.__name__}.{info.name}"))
+        for info in pkgutil.iter_modules(versions.__path__)
+    ]
+    migrations.sort(key=lambda migration: migration.version)
+    seen = set()
+    for migration in migrations:
+        if migration.version in seen:
+            raise RuntimeError(f"Duplicate migration version {migration.version}")
+        seen.add(migration.version)
+    return migrations
+
+def _ensure_migrations_table(connection: Connection) -> None:
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        "version TEXT PRIMARY KEY, "
+        "name TEXT NOT NULL, "
+        "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW())"
+    ))
+
+def _applied(connection: Connection) -> Dict[str, datetime]:
+    if connection.execute(text("SELECT to_regclass(:table)"), {"table": MIGRATIONS_TABLE}).scalar() is None:
+        return {}
+    rows = connection.execute(text(f"SELECT version, applied_at FROM {MIGRATIONS_TABLE}"))
+    return {version: applied_at for version, applied_at in rows}
+
+def _record(connection: Connection, migration: Migration) -> None:
+    connection.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name}
+    )
+
+def status(engine: Engine) -> List[Tuple[Migration, Optional[datetime]]]:
+    """Return every migration with the time it was applied, or None if pending."""
+    with engine.connect() as connection:
+        applied = _applied(connection)
+    return [(migration, applied.get(migration.version)) for migration in load_migrations()]
+
+def upgrade(engine: Engine, target: Optional[str] = None) -> List[Migration]:
+    """
+    Apply pending migrations in version order.
+
+    Args:
+        engine: Synchronous engine of the database to migrate
+        target: Last version to apply, all pending migrations when None
+
+    Returns:
+        The migrations that were applied
+    """
+    applied_now: List[Migration] = []
+    with engine.connect() as lock_connection:
+        lock_connection = lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        lock_connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            _ensure_migrations_table(lock_connection)
+            applied = _applied(lock_connection)
+            for migration in load_migrations():
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in applied:
+                    continue
+
+                logger.info("Applying migration %s_%s", migration.version, migration.name)
+                if migration.transactional:
+                    with engine.begin() as connection:
+                        connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+                        migration.upgrade(Operations(connection, transactional=True))
+                        _record(connection, migration)
+                else:
+                    with engine.connect() as connection:
+                        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+                        connection.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+                        try:
+                            migration.upgrade(Operations(connection, transactional=False))
+                            _record(connection, migration)
+                        finally:
+                            connection.execute(text("RESET lock_timeout"))
+                applied_now.append(migration)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+    if not applied_now:
+        logger.info("Database schema is up to date")
+    return applied_now
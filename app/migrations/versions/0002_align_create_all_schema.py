@@ -0,0 +1,56 @@
+"""Align databases created by create_all with the baseline schema.
+
+Such databases have VARCHAR instead of TEXT columns, timestamps without time
+zone, and lack the created_at defaults and the relationship constraints.
+Every change here is online: the column type changes are binary compatible
+or, with the session in UTC, skip the table rewrite; constraints are added
+NOT VALID and validated without blocking writes; the unique constraint is
+attached to a concurrently built index.
+"""
+transactional = False
+
+TABLES = ("things", "stories", "guides", "relationships")
+
+CHECK_CONSTRAINTS = {
+    "relationships_source_type_check": "CHECK (source_type IN ('thing', 'guide', 'story'))",
+    "relationships_target_type_check": "CHECK (target_type IN ('thing', 'guide', 'story'))",
+    "relationships_direction_check": "CHECK (direction IN ('unidirectional', 'bidirectional'))",
+}
+
+RELATIONSHIPS_UNIQUE = "relationships_source_type_source_id_target_type_target_id_r_key"
+
+def upgrade(op):
+    # timestamp -> timestamptz keeps the stored values as UTC and needs no
+    # rewrite only when the session time zone is UTC
+    op.execute("SET TIME ZONE 'UTC'")
+    try:
+        for table in TABLES:
+            columns = op.execute(
+                "SELECT column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table",
+                {"table": table}
+            ).all()
+            for column, data_type in columns:
+                if data_type == "character varying":
+                    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE text")
+                elif data_type == "timestamp without time zone":
+                    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE timestamp with time zone")
+            op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET DEFAULT now()")
+    finally:
+        op.execute("RESET TIME ZONE")
+
+    for name, definition in CHECK_CONSTRAINTS.items():
+        if not op.constraint_exists("relationships", name):
+            op.execute(f"ALTER TABLE relationships ADD CONSTRAINT {name} {definition} NOT VALID")
+        op.execute(f"ALTER TABLE relationships VALIDATE CONSTRAINT {name}")
+
+    if not op.constraint_exists("relationships", RELATIONSHIPS_UNIQUE):
+        op.create_index_concurrently(
+            RELATIONSHIPS_UNIQUE, "relationships",
+            "(source_type, source_id, target_type, target_id, relationship_type)",
+            unique=True
+        )
+        op.execute(
+            f"ALTER TABLE relationships ADD CONSTRAINT {RELATIONSHIPS_UNIQUE} "
+            f"UNIQUE USING INDEX {RELATIONSHIPS_UNIQUE}"
+        )
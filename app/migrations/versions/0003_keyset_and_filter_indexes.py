@@ -0,0 +1,37 @@
+"""Keyset pagination and list filter indexes, built concurrently.
+
+Replaces the created_at indexes with (created_at, id) keyset indexes, the
+whole-column GIN indexes on JSONB filter fields with expression indexes that
+serve ->> equality, and the relationship endpoint indexes with id-first ones.
+"""
+transactional = False
+
+INDEXES = [
+    ("idx_things_keyset", "things", "(created_at, id)"),
+    ("idx_stories_keyset", "stories", "(created_at, id)"),
+    ("idx_guides_keyset", "guides", "(created_at, id)"),
+    ("idx_relationships_keyset", "relationships", "(created_at, id)"),
+    ("idx_stories_category_key", "stories", "((thing_category ->> 'category'))"),
+    ("idx_guides_category_key", "guides", "((thing_category ->> 'category'))"),
+    ("idx_guides_type_primary", "guides", "((type ->> 'primary'))"),
+    ("idx_relationships_source_id", "relationships", "(source_id, source_type)"),
+    ("idx_relationships_target_id", "relationships", "(target_id, target_type)"),
+]
+
+SUPERSEDED = [
+    "idx_things_created",
+    "idx_stories_created",
+    "idx_guides_created",
+    "idx_stories_category",
+    "idx_guides_type",
+    "idx_guides_category",
+    "idx_relationships_source",
+    "idx_relationships_target",
+]
+
+def upgrade(op):
+    # Build the replacements before dropping anything, so queries always have an index
+    for name, table, definition in INDEXES:
+        op.create_index_concurrently(name, table, definition)
+    for name in SUPERSEDED:
+        op.drop_index_concurrently(name)
@@ -0,0 +1,108 @@
+"""Full-text search vectors maintained by triggers and backfilled in batches.
+
+Adding a generated column rewrites the whole table under an exclusive lock,
+so the vectors are plain tsvector columns filled by a BEFORE trigger, and
+existing rows are backfilled in small transactions. Databases that already
+have generated search columns keep their values: the generation expression
+is dropped and the trigger takes over.
+"""
+transactional = False
+
+# Search languages, sources and vector expression at the time of this
+# migration, copied from app/models.py so that later changes there do not
+# alter what this migration does; they need a new migration replacing the triggers
+SEARCH_LANGUAGES = {
+    'en': 'english',
+    'es': 'spanish',
+    'de': 'german',
+    'fr': 'french',
+    'it': 'italian',
+    'pt': 'portuguese',
+}
+SEARCH_DEFAULT_LANGUAGE = 'en'
+SEARCH_SIMPLE = 'simple'
+
+SOURCES = {
+    "things": [
+        ("name", "$", "A", True),
+        ("manufacturer", "$.name", "B", False),
+    ],
+    "stories": [
+        ("thing_category", "$.category", "A", False),
+        ("procedure", "$[*].description", "B", True),
+    ],
+    "guides": [
+        ("content", "$.title", "A", True),
+        ("content", "$.summary", "B", True),
+        ("thing_category", "$.category", "B", False),
+        ("content", "$.procedure[*].description", "C", True),
+    ],
+}
+
+LANGUAGES = [*SEARCH_LANGUAGES, None]
+
+def search_vector_expression(sources, language=None, record=None):
+    """Weighted tsvector over JSONB text fields, see app.models.search_vector_expression."""
+    config = SEARCH_LANGUAGES.get(language, SEARCH_SIMPLE)
+    if language is None:
+        suffixes = ['.default', '.translations.*']
+    elif language == SEARCH_DEFAULT_LANGUAGE:
+        suffixes = ['.default', f'.translations.{language}']
+    else:
+        suffixes = [f'.translations.{language}']
+
+    parts = []
+    for column, path, weight, multilingual in sources:
+        for suffix in (suffixes if multilingual else ['']):
+            parts.append(
+                f"setweight(coalesce(to_tsvector('{config}'::regconfig, "
+                f"jsonb_path_query_array({f'{record}.' if record else ''}{column}, '{path}{suffix}')), "
+                f"''::tsvector), '{weight}')"
+            )
+    return " || ".join(parts)
+
+def column_name(language):
+    return f"search_{language or SEARCH_SIMPLE}"
+
+def upgrade(op):
+    for table, sources in SOURCES.items():
+        for language in LANGUAGES:
+            column = column_name(language)
+            generated = op.scalar(
+                "SELECT is_generated FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column",
+                {"table": table, "column": column}
+            )
+            if generated == "ALWAYS":
+                op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} DROP EXPRESSION")
+            elif generated is None:
+                op.execute(f"ALTER TABLE {table} ADD COLUMN {column} tsvector")
+
+        function = f"{table}_search_vectors"
+        assignments = "\n".join(
+            f"    NEW.{column_name(language)} := {search_vector_expression(sources, language, 'NEW')};"
+            for language in LANGUAGES
+        )
+        source_columns = ", ".join(sorted({source[0] for source in sources}))
+        op.execute(f"""
+CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+BEGIN
+{assignments}
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+""")
+        op.execute(
+            f"CREATE OR REPLACE TRIGGER {function} BEFORE INSERT OR UPDATE OF {source_columns} ON {table} "
+            f"FOR EACH ROW EXECUTE FUNCTION {function}()"
+        )
+
+        # Rows written from now on are covered by the trigger
+        op.backfill(
+            table,
+            ", ".join(
+                f"{column_name(language)} = {search_vector_expression(sources, language)}"
+                for language in LANGUAGES
+            ),
+            " OR ".join(f"{column_name(language)} IS NULL" for language in LANGUAGES)
+        )
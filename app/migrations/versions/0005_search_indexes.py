@@ -0,0 +1,11 @@
+"""GIN indexes on the full-text search vectors, built concurrently."""
+transactional = False
+
+# Vector columns added by 0004_search_vectors
+LANGUAGES = ['en', 'es', 'de', 'fr', 'it', 'pt', 'simple']
+
+def upgrade(op):
+    for table in ("things", "stories", "guides"):
+        for language in LANGUAGES:
+            column = f"search_{language}"
+            op.create_index_concurrently(f"idx_{table}_{column}", table, f"USING gin ({column})")
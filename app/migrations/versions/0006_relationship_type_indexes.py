@@ -0,0 +1,16 @@
+"""Indexes for listing relationships by source or target type, built concurrently.
+
+Each index leads with the endpoint type and continues with the keyset
+columns, so a page of relationships filtered on the type alone is read in
+order without scanning the other types.
+"""
+transactional = False
+
+INDEXES = [
+    ("idx_relationships_source_type_keyset", "relationships", "(source_type, created_at, id)"),
+    ("idx_relationships_target_type_keyset", "relationships", "(target_type, created_at, id)"),
+]
+
+def upgrade(op):
+    for name, table, definition in INDEXES:
+        op.create_index_concurrently(name, table, definition)
@@ -1,22 +1,138 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, and_, select, union
-from sqlalchemy.orm import relationship, Session
-from datetime import datetime
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    CheckConstraint, Column, DateTime, ForeignKey, Index, Select, Text, UniqueConstraint,
+    and_, func, literal_column, or_, select
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import deferred, relationship
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import uuid
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from app.database import Base
+from app.graph_index import graph_index
+
+# Languages with their own full-text search column: ISO code -> text search configuration.
+# Default texts are indexed as English; every text is also indexed without stemming
+# in the language-agnostic search_simple column. Migrations 0004 and 0005 keep their
+# own copies; changing the languages or search_vector_expression needs a new migration.
+SEARCH_LANGUAGES = {
+    'en': 'english',
+    'es': 'spanish',
+    'de': 'german',
+    'fr': 'french',
+    'it': 'italian',
+    'pt': 'portuguese',
+}
+SEARCH_DEFAULT_LANGUAGE = 'en'
+SEARCH_SIMPLE = 'simple'
+
+def utcnow() -> datetime:
+    """Current time as an aware UTC datetime, as stored in timestamptz columns."""
+    return datetime.now(timezone.utc)
+
+# (column, JSON path, weight, whether the path points at MultilingualText objects)
+SearchSource = Tuple[str, str, str, bool]
+
+def search_vector_expression(
+    sources: List[SearchSource], language: Optional[str] = None, record: Optional[str] = None
+) -> str:
+    """
+    Build the SQL expression of a weighted tsvector over JSONB text fields.
+
+    Args:
+        sources: Fields to index, see SearchSource
+        language: ISO code from SEARCH_LANGUAGES, or None for the simple vector
+        record: Row variable qualifying the columns, e.g. NEW in a trigger
+    """
+    config = SEARCH_LANGUAGES.get(language, SEARCH_SIMPLE)
+    if language is None:
+        suffixes = ['.default', '.translations.*']
+    elif language == SEARCH_DEFAULT_LANGUAGE:
+        suffixes = ['.default', f'.translations.{language}']
+    else:
+        suffixes = [f'.translations.{language}']
+
+    parts = []
+    for column, path, weight, multilingual in sources:
+        for suffix in (suffixes if multilingual else ['']):
+            parts.append(
+                f"setweight(coalesce(to_tsvector('{config}'::regconfig, "
+                f"jsonb_path_query_array({f'{record}.' if record else ''}{column}, '{path}{suffix}')), "
+                f"''::tsvector), '{weight}')"
+            )
+    return " || ".join(parts)
+
+def add_search_vectors(model, sources: List[SearchSource]) -> None:
+    """
+    Add GIN-indexed search_<language> columns to a model.
+
+    The columns are filled by a trigger built from the same sources, see
+    migration 0004_search_vectors; the application never writes them.
+    """
+    for language in [*SEARCH_LANGUAGES, None]:
+        name = f"search_{language or SEARCH_SIMPLE}"
+        column = Column(name, TSVECTOR)
+        # Deferred so regular queries never load the vectors
+        setattr(model, name, deferred(column))
+        Index(f"idx_{model.__tablename__}_{name}", column, postgresql_using='gin')
+
+def json_text(column, key: str):
+    """
+    ``column ->> 'key'`` with the key inlined as a literal.
+
+    SQLAlchemy's ``column[key].astext`` sends the key as a bind parameter,
+    which prepared statements cannot match against an expression index.
+    """
+    return column.op('->>', return_type=Text)(literal_column(f"'{key}'"))
 
 class Relationship(Base):
     __tablename__ = "relationships"
+    __table_args__ = (
+        Index('idx_relationships_keyset', 'created_at', 'id'),
+        # Id first, so filters on the id alone use the index too
+        Index('idx_relationships_source_id', 'source_id', 'source_type'),
+        Index('idx_relationships_target_id', 'target_id', 'target_type'),
+        # Endpoint type with the keyset columns, so a type filter reads its page in order
+        Index('idx_relationships_source_type_keyset', 'source_type', 'created_at', 'id'),
+        Index('idx_relationships_target_type_keyset', 'target_type', 'created_at', 'id'),
+        Index('idx_relationships_type', 'relationship_type'),
+        Index('idx_relationships_metadata', 'relation_metadata', postgresql_using='gin'),
+        CheckConstraint("source_type IN ('thing', 'guide', 'story')", name='relationships_source_type_check'),
+        CheckConstraint("target_type IN ('thing', 'guide', 'story')", name='relationships_target_type_check'),
+        CheckConstraint("direction IN ('unidirectional', 'bidirectional')", name='relationships_direction_check'),
+        UniqueConstraint(
+            'source_type', 'source_id', 'target_type', 'target_id', 'relationship_type',
+            name='relationships_source_type_source_id_target_type_target_id_r_key'
+        ),
+    )
+    entity_type = "relationship"
 
-    id = Column(String, primary_key=True)
-    source_type = Column(String, nullable=False)
-    source_id = Column(String, nullable=False)
-    target_type = Column(String, nullable=False)
-    target_id = Column(String, nullable=False)
-    relationship_type = Column(String, nullable=False)
-    direction = Column(String, nullable=False)
+    id = Column(Text, primary_key=True)
+    source_type = Column(Text, nullable=False)
+    source_id = Column(Text, nullable=False)
+    target_type = Column(Text, nullable=False)
+    target_id = Column(Text, nullable=False)
+    relationship_type = Column(Text, nullable=False)
+    direction = Column(Text, nullable=False)
     relation_metadata = Column(JSONB)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
+
+    @staticmethod
+    def values_from_create(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for a new relationship from validated RelationshipCreate data."""
+        return {
+            'id': str(uuid.uuid4()),
+            'source_type': data['source_type'],
+            'source_id': data['source_id'],
+            'target_type': data['target_type'],
+            'target_id': data['target_id'],
+            'relationship_type': data['relationship_type'],
+            'direction': data['direction'],
+            'relation_metadata': data.get('metadata'),
+            'created_at': utcnow()
+        }
 
     def to_dict(self):
         return {
@@ -32,48 +148,110 @@ class Relationship(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-class Thing(Base):
+class RelationshipMixin:
+    """Relationship lookups shared by every entity that can be a relationship endpoint."""
+    entity_type: str
+
+    async def get_relationships(
+        self, db: AsyncSession, direction: str = 'both', use_index: bool = True
+    ) -> List[Relationship]:
+        """Get all relationships for this entity."""
+        return (await self.load_relationships(db, [self.id], direction, use_index)).get(self.id, [])
+
+    @classmethod
+    def relationships_query(cls, entity_ids: Iterable[str], direction: str = 'both') -> Optional[Select]:
+        """Select the relationships of many entities, or None for an unknown direction."""
+        ids = list(entity_ids)
+        conditions = []
+        if direction == 'outgoing' or direction == 'both':
+            conditions.append(and_(
+                Relationship.source_id.in_(ids),
+                Relationship.source_type == cls.entity_type
+            ))
+        if direction == 'incoming' or direction == 'both':
+            conditions.append(and_(
+                Relationship.target_id.in_(ids),
+                Relationship.target_type == cls.entity_type
+            ))
+        if not conditions:
+            return None
+        return select(Relationship).where(or_(*conditions))
+
+    @classmethod
+    async def load_relationships(
+        cls, db: AsyncSession, entity_ids: Iterable[str], direction: str = 'both', use_index: bool = True
+    ) -> Dict[str, List[Relationship]]:
+        """
+        Get the relationships of many entities with a single query.
+
+        Returns a mapping of entity id to its relationships; entities without
+        relationships are absent from the mapping. When the graph index is
+        built and use_index is set, the relationships are looked up in it and
+        read by primary key. The index can lag writes made by other processes,
+        so callers that must agree with the database pass use_index=False.
+        """
+        ids = set(entity_ids)
+        query = cls.relationships_query(ids, direction)
+        if not ids or query is None:
+            return {}
+        index = graph_index.get() if use_index else None
+        if index is not None:
+            # The index knows which relationships exist; only their rows are read
+            edge_ids = {
+                edge_id
+                for entity_id in ids
+                for edge_id in index.relationship_ids(cls.entity_type, entity_id, direction)
+            }
+            if not edge_ids:
+                return {}
+            query = select(Relationship).where(Relationship.id.in_(edge_ids))
+
+        grouped: Dict[str, List[Relationship]] = defaultdict(list)
+        result = await db.execute(query)
+        for rel in result.scalars():
+            owners = set()
+            if direction != 'incoming' and rel.source_type == cls.entity_type and rel.source_id in ids:
+                owners.add(rel.source_id)
+            if direction != 'outgoing' and rel.target_type == cls.entity_type and rel.target_id in ids:
+                owners.add(rel.target_id)
+            for owner in owners:
+                grouped[owner].append(rel)
+        return dict(grouped)
+
+class Thing(RelationshipMixin, Base):
     __tablename__ = "things"
+    __table_args__ = (
+        Index('idx_things_keyset', 'created_at', 'id'),
+        Index('idx_things_type', 'type'),
+        Index('idx_things_name', 'name', postgresql_using='gin'),
+        Index('idx_things_manufacturer', 'manufacturer', postgresql_using='gin'),
+    )
+    entity_type = "thing"
 
-    id = Column(String, primary_key=True)
-    uri = Column(String, unique=True, nullable=False)
-    type = Column(String, nullable=False)
+    id = Column(Text, primary_key=True)
+    uri = Column(Text, unique=True, nullable=False)
+    type = Column(Text, nullable=False)
     name = Column(JSONB, nullable=False)
     manufacturer = Column(JSONB)
     properties = Column(JSONB)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
 
     stories = relationship("Story", back_populates="thing")
     guides = relationship("Guide", back_populates="thing")
 
-    def get_relationships(self, db: Session, direction: str = 'both'):
-        """Get all relationships for this thing."""
-        queries = []
-        
-        if direction == 'outgoing' or direction == 'both':
-            outgoing = db.query(Relationship).filter(
-                and_(
-                    Relationship.source_type == 'thing',
-                    Relationship.source_id == self.id
-                )
-            )
-            queries.append(outgoing)
-        
-        if direction == 'incoming' or direction == 'both':
-            incoming = db.query(Relationship).filter(
-                and_(
-                    Relationship.target_type == 'thing',
-                    Relationship.target_id == self.id
-                )
-            )
-            queries.append(incoming)
-
-        if len(queries) > 1:
-            return queries[0].union(queries[1]).all()
-        elif queries:
-            return queries[0].all()
-        return []
+    @staticmethod
+    def values_from_create(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for a new thing from validated ThingCreate data."""
+        return {
+            'id': str(uuid.uuid4()),
+            'uri': f"thing:{data['type']}/{data['manufacturer']['name']}/{data['name']['default']}",
+            'type': data['type'],
+            'name': data['name'],
+            'manufacturer': data['manufacturer'],
+            'properties': data.get('properties', {}),
+            'created_at': utcnow()
+        }
 
     def to_dict(self):
         return {
@@ -87,47 +265,43 @@ class Thing(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-class Story(Base):
+class Story(RelationshipMixin, Base):
     __tablename__ = "stories"
+    __table_args__ = (
+        Index('idx_stories_keyset', 'created_at', 'id'),
+        Index('idx_stories_thing_id', 'thing_id'),
+        Index('idx_stories_type', 'type'),
+    )
+    entity_type = "story"
 
-    id = Column(String, primary_key=True)
-    thing_id = Column(String, ForeignKey("things.id"), nullable=True)
+    id = Column(Text, primary_key=True)
+    thing_id = Column(Text, ForeignKey("things.id"), nullable=True)
     thing_category = Column(JSONB, nullable=True)
     version = Column(JSONB, nullable=False)
-    type = Column(String, nullable=False)
+    type = Column(Text, nullable=False)
     procedure = Column(JSONB, nullable=False)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
 
     thing = relationship("Thing", back_populates="stories")
 
-    def get_relationships(self, db: Session, direction: str = 'both'):
-        """Get all relationships for this story."""
-        queries = []
-        
-        if direction == 'outgoing' or direction == 'both':
-            outgoing = db.query(Relationship).filter(
-                and_(
-                    Relationship.source_type == 'story',
-                    Relationship.source_id == self.id
-                )
-            )
-            queries.append(outgoing)
-        
-        if direction == 'incoming' or direction == 'both':
-            incoming = db.query(Relationship).filter(
-                and_(
-                    Relationship.target_type == 'story',
-                    Relationship.target_id == self.id
-                )
-            )
-            queries.append(incoming)
-
-        if len(queries) > 1:
-            return queries[0].union(queries[1]).all()
-        elif queries:
-            return queries[0].all()
-        return []
+    @staticmethod
+    def values_from_create(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for a new story from validated StoryCreate data."""
+        now = utcnow()
+        return {
+            'id': str(uuid.uuid4()),
+            'thing_id': data.get('thing_id'),
+            'thing_category': data.get('thing_category'),
+            'version': {
+                "number": "1.0.0",
+                "date": now.isoformat(),
+                "history": []
+            },
+            'type': data['type'],
+            'procedure': data['procedure'],
+            'created_at': now
+        }
 
     def to_dict(self):
         return {
@@ -141,46 +315,36 @@ class Story(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
-class Guide(Base):
+class Guide(RelationshipMixin, Base):
     __tablename__ = "guides"
+    __table_args__ = (
+        Index('idx_guides_keyset', 'created_at', 'id'),
+        Index('idx_guides_thing_id', 'thing_id'),
+        Index('idx_guides_content', 'content', postgresql_using='gin'),
+    )
+    entity_type = "guide"
 
-    id = Column(String, primary_key=True)
-    thing_id = Column(String, ForeignKey("things.id"), nullable=True)
+    id = Column(Text, primary_key=True)
+    thing_id = Column(Text, ForeignKey("things.id"), nullable=True)
     thing_category = Column(JSONB, nullable=True)
     type = Column(JSONB, nullable=False)
     content = Column(JSONB, nullable=False)
-    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    updated_at = Column(DateTime, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
 
     thing = relationship("Thing", back_populates="guides")
 
-    def get_relationships(self, db: Session, direction: str = 'both'):
-        """Get all relationships for this guide."""
-        queries = []
-        
-        if direction == 'outgoing' or direction == 'both':
-            outgoing = db.query(Relationship).filter(
-                and_(
-                    Relationship.source_type == 'guide',
-                    Relationship.source_id == self.id
-                )
-            )
-            queries.append(outgoing)
-        
-        if direction == 'incoming' or direction == 'both':
-            incoming = db.query(Relationship).filter(
-                and_(
-                    Relationship.target_type == 'guide',
-                    Relationship.target_id == self.id
-                )
-            )
-            queries.append(incoming)
-
-        if len(queries) > 1:
-            return queries[0].union(queries[1]).all()
-        elif queries:
-            return queries[0].all()
-        return []
+    @staticmethod
+    def values_from_create(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values for a new guide from validated GuideCreate data."""
+        return {
+            'id': str(uuid.uuid4()),
+            'thing_id': data.get('thing_id'),
+            'thing_category': data.get('thing_category'),
+            'type': data['type'],
+            'content': data['content'],
+            'created_at': utcnow()
+        }
 
     def to_dict(self):
         return {
@@ -192,3 +356,23 @@ class Guide(Base):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+add_search_vectors(Thing, [
+    ('name', '$', 'A', True),
+    ('manufacturer', '$.name', 'B', False),
+])
+add_search_vectors(Story, [
+    ('thing_category', '$.category', 'A', False),
+    ('procedure', '$[*].description', 'B', True),
+])
+add_search_vectors(Guide, [
+    ('content', '$.title', 'A', True),
+    ('content', '$.summary', 'B', True),
+    ('thing_category', '$.category', 'B', False),
+    ('content', '$.procedure[*].description', 'C', True),
+])
+
+# Expression indexes serving the JSONB equality filters in app/filters.py
+Index('idx_stories_category_key', json_text(Story.__table__.c.thing_category, 'category'))
+Index('idx_guides_category_key', json_text(Guide.__table__.c.thing_category, 'category'))
+Index('idx_guides_type_primary', json_text(Guide.__table__.c.type, 'primary'))
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Pages are ordered on ``(created_at, id)`` and each page continues strictly
+after the last row of the previous one, so fetching a deep page costs the
+same as fetching the first and concurrent inserts never shift rows between
+pages. Cursors are opaque to clients: a URL-safe base64 encoding of the sort
+key of the last row served.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Largest page a list endpoint serves
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(created_at: datetime, entity_id: str) -> str:
+    """Encode the sort key of a row as an opaque cursor."""
+    payload = json.dumps([created_at.isoformat(), entity_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, entity_id = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = datetime.fromisoformat(created_at)
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return created_at, str(entity_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_query(query: Select, model, limit: int, cursor: Optional[str] = None, skip: int = 0) -> Select:
+    """
+    Restrict a query to one page, fetching one extra row to detect a next page.
+
+    Args:
+        query: Select statement for rows of model
+        model: Mapped class with created_at and id columns
+        limit: Maximum number of rows to return
+        cursor: Cursor returned with the previous page, if any
+        skip: Legacy offset, only honoured when no cursor is given
+    """
+    query = query.order_by(model.created_at, model.id)
+    if cursor:
+        created_at, entity_id = decode_cursor(cursor)
+        query = query.where(tuple_(model.created_at, model.id) > tuple_(created_at, entity_id))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+async def paginate(
+    db: AsyncSession, query: Select, model, limit: int, cursor: Optional[str] = None, skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Fetch one page of a query using keyset pagination.
+
+    Arguments are those of page_query.
+
+    Returns:
+        The rows of the page and the cursor of the next page, or None on the last page
+    """
+    rows = (await db.execute(page_query(query, model, limit, cursor, skip))).scalars().all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+def set_next_cursor(response: Response, request_url, next_cursor: Optional[str]) -> None:
+    """Advertise the next page through the X-Next-Cursor and Link headers."""
+    if next_cursor is None:
+        return
+    response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    next_url = request_url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
@@ -1,7 +1,11 @@
-from pydantic import BaseModel, Field, EmailStr, ConfigDict
-from typing import Optional, Dict, List, Any
+from pydantic import (
+    BaseModel, Field, EmailStr, ConfigDict, ValidationError, ValidatorFunctionWrapHandler, WrapValidator,
+    field_validator
+)
+from typing import Annotated, Optional, Dict, List, Any, TypeVar
 from datetime import datetime
 from enum import Enum
+from app.security import SecurityConfig, SecurityValidator, is_security_failure
 
 # First define the enums
 class ComponentStatus(str, Enum):
@@ -14,6 +18,12 @@ class EntityType(str, Enum):
     GUIDE = "guide"
     STORY = "story"
 
+class ExportCollection(str, Enum):
+    THINGS = "things"
+    STORIES = "stories"
+    GUIDES = "guides"
+    RELATIONSHIPS = "relationships"
+
 class RelationshipDirection(str, Enum):
     UNIDIRECTIONAL = "unidirectional"
     BIDIRECTIONAL = "bidirectional"
@@ -33,7 +43,7 @@ class Properties(BaseModel):
     manufacturing_date: Optional[str] = None
     serial_number: Optional[str] = None
 
-class ThingCreate(BaseModel):
+class ThingBase(BaseModel):
     type: str
     name: MultilingualText
     manufacturer: Manufacturer
@@ -41,7 +51,14 @@ class ThingCreate(BaseModel):
     
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
-class ThingResponse(ThingCreate):
+class ThingCreate(ThingBase):
+    @field_validator("type")
+    @classmethod
+    def check_type(cls, value: str) -> str:
+        SecurityValidator.validate_allowed_type(value, SecurityConfig.ALLOWED_THING_TYPES, "thing")
+        return value
+
+class ThingResponse(ThingBase):
     id: str
     uri: str
     created_at: str
@@ -62,7 +79,13 @@ class ThingCategory(BaseModel):
     subcategory: Optional[str] = None
     attributes: Optional[Dict[str, Any]] = None
 
-class StoryCreate(BaseModel):
+def check_category_depth(category: Optional[ThingCategory]) -> Optional[ThingCategory]:
+    """Depth check for the free-form category attributes, found at depth 2 of a story or guide."""
+    if category is not None and category.attributes is not None:
+        SecurityValidator.validate_json_depth(category.attributes, 2)
+    return category
+
+class StoryBase(BaseModel):
     thing_id: Optional[str] = None
     thing_category: Optional[ThingCategory] = None
     type: str
@@ -70,7 +93,19 @@ class StoryCreate(BaseModel):
 
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
-class StoryResponse(StoryCreate):
+class StoryCreate(StoryBase):
+    @field_validator("type")
+    @classmethod
+    def check_type(cls, value: str) -> str:
+        SecurityValidator.validate_allowed_type(value, SecurityConfig.ALLOWED_STORY_TYPES, "story")
+        return value
+
+    @field_validator("thing_category")
+    @classmethod
+    def check_category(cls, value: Optional[ThingCategory]) -> Optional[ThingCategory]:
+        return check_category_depth(value)
+
+class StoryResponse(StoryBase):
     id: str
     version: Dict[str, Any]
     created_at: str
@@ -90,7 +125,7 @@ class GuideContent(BaseModel):
     warnings: Optional[List[Dict[str, Any]]] = None
     procedure: Optional[List[Dict[str, Any]]] = None
 
-class GuideCreate(BaseModel):
+class GuideBase(BaseModel):
     thing_id: Optional[str] = None
     thing_category: Optional[ThingCategory] = None
     type: GuideType
@@ -98,7 +133,34 @@ class GuideCreate(BaseModel):
 
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
-class GuideResponse(GuideCreate):
+class GuideCreate(GuideBase):
+    @field_validator("type")
+    @classmethod
+    def check_type(cls, value: GuideType) -> GuideType:
+        SecurityValidator.validate_allowed_type(
+            value.primary, SecurityConfig.ALLOWED_GUIDE_PRIMARY_TYPES, "guide primary"
+        )
+        if value.secondary:
+            SecurityValidator.validate_allowed_type(
+                value.secondary, SecurityConfig.ALLOWED_GUIDE_SECONDARY_TYPES, "guide secondary"
+            )
+        return value
+
+    @field_validator("thing_category")
+    @classmethod
+    def check_category(cls, value: Optional[ThingCategory]) -> Optional[ThingCategory]:
+        return check_category_depth(value)
+
+    @field_validator("content")
+    @classmethod
+    def check_content(cls, value: GuideContent) -> GuideContent:
+        # Only warnings and procedure are free-form; they sit at depth 2
+        for steps in (value.warnings, value.procedure):
+            if steps is not None:
+                SecurityValidator.validate_json_depth(steps, 2)
+        return value
+
+class GuideResponse(GuideBase):
     id: str
     created_at: str
     updated_at: Optional[str] = None
@@ -106,7 +168,7 @@ class GuideResponse(GuideCreate):
 
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
-class RelationshipCreate(BaseModel):
+class RelationshipBase(BaseModel):
     source_type: EntityType
     source_id: str
     target_type: EntityType
@@ -117,13 +179,103 @@ class RelationshipCreate(BaseModel):
 
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
-class RelationshipResponse(RelationshipCreate):
+class RelationshipCreate(RelationshipBase):
+    @field_validator("metadata")
+    @classmethod
+    def check_metadata(cls, value: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if value is not None:
+            SecurityValidator.validate_json_depth(value, 1)
+        return value
+
+class RelationshipResponse(RelationshipBase):
     id: str
     created_at: str
     updated_at: Optional[str] = None
 
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
 
+class BatchItemStatus(str, Enum):
+    CREATED = "created"
+    FAILED = "failed"
+
+class BatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the submitted array")
+    status: BatchItemStatus
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemResult]
+
+class RejectedItem(BaseModel):
+    """A batch item that failed validation, reported on its own rather than failing the batch."""
+    error: str
+
+def _reject_individually(value: Any, handler: ValidatorFunctionWrapHandler) -> Any:
+    try:
+        return handler(value)
+    except ValidationError as e:
+        errors = e.errors()
+        first = errors[0]
+        location = ".".join(str(part) for part in first["loc"])
+        # Security failures keep the message single creates answer with
+        if is_security_failure(errors) or not location:
+            return RejectedItem(error=first["msg"])
+        return RejectedItem(error=f"{location}: {first['msg']}")
+
+CreateModel = TypeVar("CreateModel", bound=BaseModel)
+# Batch element: the parsed create model, or a RejectedItem when it failed validation
+BatchItem = Annotated[CreateModel, WrapValidator(_reject_individually)]
+
+class SearchResult(BaseModel):
+    entity_type: EntityType
+    id: str
+    rank: float
+    entity: Dict[str, Any]
+
+class SearchResponse(BaseModel):
+    query: str
+    language: str
+    results: List[SearchResult]
+
+class TraversalDirection(str, Enum):
+    OUTGOING = "outgoing"
+    INCOMING = "incoming"
+    BOTH = "both"
+
+class GraphNode(BaseModel):
+    entity_type: EntityType
+    id: str
+    depth: int
+    entity: Optional[Dict[str, Any]] = None
+
+class GraphResponse(BaseModel):
+    root: GraphNode
+    nodes: List[GraphNode]
+    edges: List[RelationshipResponse]
+    truncated: bool = False
+
+class ImportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class ImportRejection(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    collection: ExportCollection
+    received: int = 0
+    inserted: int = 0
+    skipped: int = Field(0, description="Valid rows already present in the database")
+    rejected: int = 0
+    rejections: List[ImportRejection] = Field(
+        default_factory=list,
+        description="The first rejected rows with their line numbers"
+    )
+
 # Add this to schemas.py after the other schemas
 
 class HealthMetrics(BaseModel):
@@ -0,0 +1,71 @@
+"""
+Ranked full-text search across things, stories and guides.
+
+Each searchable table carries trigger-maintained tsvector columns, one per
+language in SEARCH_LANGUAGES plus a language-agnostic ``search_simple``
+column, all backed by GIN indexes. A search matches either the stemmed vector of the
+requested language or the unstemmed simple vector, so exact words are found
+in any language while stemmed matches in the requested language rank higher.
+"""
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Float, cast, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Thing, Story, Guide, SEARCH_LANGUAGES, SEARCH_SIMPLE
+from app.schemas import EntityType, SearchResult
+
+SEARCH_MODELS = {
+    EntityType.THING: Thing,
+    EntityType.STORY: Story,
+    EntityType.GUIDE: Guide,
+}
+
+# Weight of a match on the unstemmed vector relative to a stemmed match
+SIMPLE_MATCH_WEIGHT = 0.1
+
+def _tsquery(config: str, query: str):
+    return func.websearch_to_tsquery(literal_column(f"'{config}'::regconfig"), query)
+
+async def search_entities(
+    db: AsyncSession,
+    query: str,
+    language: str,
+    entity_types: Optional[Sequence[EntityType]] = None,
+    limit: int = 20
+) -> List[SearchResult]:
+    """
+    Search entities and return the best matches across all requested types.
+
+    Args:
+        db: Database session
+        query: Web-search style query (quoted phrases, OR, -exclusions)
+        language: ISO language code; codes without a dedicated column only use the simple vector
+        entity_types: Entity types to search, all when empty
+        limit: Maximum number of results
+    """
+    language_query = None
+    if language in SEARCH_LANGUAGES:
+        language_query = _tsquery(SEARCH_LANGUAGES[language], query)
+    simple_query = _tsquery(SEARCH_SIMPLE, query)
+
+    results: List[SearchResult] = []
+    for entity_type in entity_types or list(SEARCH_MODELS):
+        model = SEARCH_MODELS[entity_type]
+        simple_vector = model.search_simple
+        rank = SIMPLE_MATCH_WEIGHT * func.ts_rank_cd(simple_vector, simple_query)
+        match = simple_vector.op('@@')(simple_query)
+        if language_query is not None:
+            language_vector = getattr(model, f"search_{language}")
+            rank = func.ts_rank_cd(language_vector, language_query) + rank
+            match = or_(language_vector.op('@@')(language_query), match)
+
+        rank = cast(rank, Float).label('rank')
+        rows = await db.execute(select(model, rank).where(match).order_by(rank.desc()).limit(limit))
+        results.extend(
+            SearchResult(entity_type=entity_type, id=entity.id, rank=score, entity=entity.to_dict())
+            for entity, score in rows
+        )
+
+    results.sort(key=lambda result: result.rank, reverse=True)
+    return results[:limit]
@@ -1,14 +1,24 @@
-from fastapi import FastAPI, Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from app.schemas import EntityType, RelationshipDirection, GuideType
+from pydantic_core import PydanticCustomError
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import get_settings
+import hmac
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
 class SecurityConfig:
     MAX_REQUEST_SIZE: int = 10_000_000  # 10MB
     MAX_CONTENT_TYPE_LENGTH: int = 256
     MAX_JSON_DEPTH: int = 20
+    MAX_BATCH_SIZE: int = 5_000
+    # Admin bulk imports stream their body and may be much larger
+    IMPORT_PATH_PREFIX: str = "/api/v1/admin/import/"
+    MAX_IMPORT_REQUEST_SIZE: int = 2_000_000_000  # 2GB
+    IMPORT_CONTENT_TYPES = ["application/x-ndjson", "text/csv"]
     # Use the allowed types from your domain model
     ALLOWED_THING_TYPES = ["device", "component", "material", "tool"]
     ALLOWED_STORY_TYPES = ["repair", "maintenance", "modification", "diagnosis"]
@@ -19,84 +29,155 @@ class SecurityException(HTTPException):
     def __init__(self, status_code: int, detail: str):
         super().__init__(status_code=status_code, detail=detail)
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+class SecurityMiddleware:
+    """
+    Pure ASGI middleware enforcing request size and content type limits on writes.
+
+    Both checks use the headers only. The declared Content-Length is checked
+    up front and the body is counted as the application receives it, so
+    chunked uploads without a Content-Length are limited too: once the limit
+    is crossed, receiving fails and the application's response is replaced
+    with 413.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        is_import = scope["path"].startswith(SecurityConfig.IMPORT_PATH_PREFIX)
+        max_size = SecurityConfig.MAX_IMPORT_REQUEST_SIZE if is_import else SecurityConfig.MAX_REQUEST_SIZE
         try:
-            if request.method in ("POST", "PUT", "PATCH"):
-                await self._validate_request_size(request)
-                await self._validate_content_type(request)
-            return await call_next(request)
+            self._validate_request_size(headers, max_size)
+            self._validate_content_type(headers, is_import)
         except SecurityException as e:
-            return JSONResponse(
-                status_code=e.status_code,
-                content={"error": e.detail}
-            )
+            await self._reject(e, scope, receive, send)
+            return
+
+        received = 0
+        too_large = False
+        response_started = False
 
-    async def _validate_request_size(self, request: Request):
-        content_length = request.headers.get("content-length", 0)
-        if int(content_length) > SecurityConfig.MAX_REQUEST_SIZE:
+        async def limited_receive() -> Message:
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    too_large = True
+                    raise SecurityException(413, "Request too large")
+            return message
+
+        async def checked_send(message: Message) -> None:
+            nonlocal response_started
+            if too_large and not response_started:
+                # Whatever the application made of the failed receive, the answer is 413
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, checked_send)
+        except Exception:
+            # The application may turn the failed receive into any error
+            if not too_large or response_started:
+                raise
+        if too_large and not response_started:
+            await self._reject(SecurityException(413, "Request too large"), scope, receive, send)
+
+    @staticmethod
+    async def _reject(error: SecurityException, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(status_code=error.status_code, content={"error": error.detail})
+        await response(scope, receive, send)
+
+    @staticmethod
+    def _validate_request_size(headers: Headers, max_size: int) -> None:
+        content_length = headers.get("content-length")
+        if content_length is None:
+            return
+        if not content_length.isdigit():
+            raise SecurityException(400, "Invalid Content-Length header")
+        if int(content_length) > max_size:
             raise SecurityException(413, "Request too large")
 
-    async def _validate_content_type(self, request: Request):
-        content_type = request.headers.get("content-type", "")
-        if not content_type.startswith("application/json"):
+    @staticmethod
+    def _validate_content_type(headers: Headers, is_import: bool) -> None:
+        content_type = headers.get("content-type", "")
+        if is_import:
+            allowed = ["application/json"] + SecurityConfig.IMPORT_CONTENT_TYPES
+            if not any(content_type.startswith(allowed_type) for allowed_type in allowed):
+                raise SecurityException(400, f"Only {', '.join(allowed)} content types are allowed")
+        elif not content_type.startswith("application/json"):
             raise SecurityException(400, "Only application/json content type is allowed")
 
+# Error types raised by the checks below while request bodies are parsed
+SECURITY_ERROR_TYPES = frozenset({"json_too_deep", "type_not_allowed"})
+
 class SecurityValidator:
     @staticmethod
-    def validate_json_depth(data: Dict[str, Any], current_depth: int = 0) -> None:
-        if current_depth > SecurityConfig.MAX_JSON_DEPTH:
-            raise SecurityException(400, "JSON structure too deep")
-        
-        if isinstance(data, dict):
-            for value in data.values():
-                SecurityValidator.validate_json_depth(value, current_depth + 1)
-        elif isinstance(data, list):
-            for item in data:
-                SecurityValidator.validate_json_depth(item, current_depth + 1)
+    def validate_json_depth(data: Any, current_depth: int = 0) -> None:
+        """
+        Reject free-form data nested deeper than MAX_JSON_DEPTH.
+
+        Args:
+            data: The parsed JSON value
+            current_depth: Depth of data within the request document
+        """
+        max_depth = SecurityConfig.MAX_JSON_DEPTH
+        pending = [(data, current_depth)]
+        while pending:
+            value, depth = pending.pop()
+            if depth > max_depth:
+                raise PydanticCustomError("json_too_deep", "JSON structure too deep")
+            if isinstance(value, dict):
+                pending.extend((item, depth + 1) for item in value.values())
+            elif isinstance(value, list):
+                pending.extend((item, depth + 1) for item in value)
 
     @staticmethod
-    def validate_thing_data(data: Dict[str, Any]) -> None:
-        if data.get("type") not in SecurityConfig.ALLOWED_THING_TYPES:
-            raise SecurityException(
-                400, 
-                f"Invalid thing type. Allowed types: {SecurityConfig.ALLOWED_THING_TYPES}"
+    def validate_allowed_type(value: Optional[str], allowed: List[str], kind: str) -> None:
+        if value not in allowed:
+            raise PydanticCustomError(
+                "type_not_allowed",
+                "Invalid {kind} type. Allowed types: {allowed}",
+                {"kind": kind, "allowed": str(allowed)}
             )
 
     @staticmethod
-    def validate_story_data(data: Dict[str, Any]) -> None:
-        if data.get("type") not in SecurityConfig.ALLOWED_STORY_TYPES:
+    def validate_batch_size(items: List[Any]) -> None:
+        if not items:
+            raise SecurityException(400, "Batch must contain at least one item")
+        if len(items) > SecurityConfig.MAX_BATCH_SIZE:
             raise SecurityException(
-                400, 
-                f"Invalid story type. Allowed types: {SecurityConfig.ALLOWED_STORY_TYPES}"
+                413,
+                f"Batch too large. Maximum items per batch: {SecurityConfig.MAX_BATCH_SIZE}"
             )
 
-    @staticmethod
-    def validate_guide_data(data: Dict[str, Any]) -> None:
-        if "type" in data:
-            guide_type = data["type"]
-            if isinstance(guide_type, dict):
-                if guide_type.get("primary") not in SecurityConfig.ALLOWED_GUIDE_PRIMARY_TYPES:
-                    raise SecurityException(
-                        400,
-                        f"Invalid guide primary type. Allowed types: {SecurityConfig.ALLOWED_GUIDE_PRIMARY_TYPES}"
-                    )
-                if guide_type.get("secondary") and guide_type.get("secondary") not in SecurityConfig.ALLOWED_GUIDE_SECONDARY_TYPES:
-                    raise SecurityException(
-                        400,
-                        f"Invalid guide secondary type. Allowed types: {SecurityConfig.ALLOWED_GUIDE_SECONDARY_TYPES}"
-                    )
+def is_security_failure(errors: List[Dict[str, Any]]) -> bool:
+    """Whether every error of a failed validation comes from the security checks."""
+    return bool(errors) and all(error["type"] in SECURITY_ERROR_TYPES for error in errors)
 
-    @staticmethod
-    def validate_relationship_data(data: Dict[str, Any]) -> None:
-        # EntityType validation is handled by Pydantic
-        try:
-            EntityType(data.get("source_type"))
-            EntityType(data.get("target_type"))
-            RelationshipDirection(data.get("direction", "unidirectional"))
-        except ValueError as e:
-            raise SecurityException(400, str(e))
+async def security_validation_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+    """Answer security check failures found while parsing the body with 400, other validation errors as usual."""
+    errors = exc.errors()
+    if is_security_failure(errors):
+        return JSONResponse(status_code=400, content={"detail": errors[0]["msg"]})
+    return await request_validation_exception_handler(request, exc)
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Dependency guarding admin endpoints with the configured ADMIN_TOKEN."""
+    admin_token = get_settings().ADMIN_TOKEN
+    if not admin_token:
+        raise SecurityException(403, "Admin API is disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise SecurityException(401, "Invalid admin token")
 
 def configure_security(app: FastAPI) -> None:
     """Configure security middleware and any other security settings."""
     app.add_middleware(SecurityMiddleware)
+    app.add_exception_handler(RequestValidationError, security_validation_handler)
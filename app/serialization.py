@@ -0,0 +1,137 @@
+"""
+Opt-in fast path for entity JSON responses.
+
+By default FastAPI validates every returned dict against the route's
+response model and then encodes it with the standard json module. The rows
+returned by the entity endpoints were validated against the same schemas when
+they were written, so with FAST_SERIALIZATION enabled they are encoded
+directly with orjson (or compact stdlib json when orjson is not installed)
+and returned as a ready response. The routes keep their response models, so
+the OpenAPI schema is unchanged.
+
+Defaults the response model would add are filled in on the fast path, so
+fields missing from a stored document (such as the relationships of rows
+returned without them) come out as the validated path returns them.
+"""
+import json
+import typing
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+from app.config import get_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(content)
+        except TypeError:
+            # Integers beyond 64 bits and other values orjson rejects
+            pass
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+Filler = Callable[[Any], Any]
+
+def _unchanged(value: Any) -> Any:
+    return value
+
+@lru_cache(maxsize=None)
+def _filler(annotation: Any) -> Filler:
+    """Function filling in the model defaults of a value of the annotated type, identity when there are none."""
+    origin = typing.get_origin(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _model_filler(annotation)
+    if origin is typing.Union:
+        # Optional[Model]: None passes through, anything else is filled as the model
+        fillers = [_filler(arg) for arg in typing.get_args(annotation) if arg is not type(None)]
+        fillers = [filler for filler in fillers if filler is not _unchanged]
+        if len(fillers) == 1:
+            [filler] = fillers
+            return lambda value: value if value is None else filler(value)
+        return _unchanged
+    if origin in (list, List):
+        filler = _filler(typing.get_args(annotation)[0])
+        if filler is _unchanged:
+            return _unchanged
+        return lambda values: [filler(value) for value in values] if isinstance(values, list) else values
+    if origin in (dict, Dict):
+        filler = _filler(typing.get_args(annotation)[1])
+        if filler is _unchanged:
+            return _unchanged
+        return lambda values: (
+            {key: filler(value) for key, value in values.items()} if isinstance(values, dict) else values
+        )
+    return _unchanged
+
+def _model_filler(model: Type[BaseModel]) -> Filler:
+    defaults: List[Tuple[str, Any]] = []
+    nested: List[Tuple[str, Filler]] = []
+    for name, field in model.model_fields.items():
+        key = field.alias or name
+        if not field.is_required():
+            defaults.append((key, field))
+        filler = _filler(field.annotation)
+        if filler is not _unchanged:
+            nested.append((key, filler))
+
+    def fill(value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        filled: Optional[dict] = None
+        for key, field in defaults:
+            if key not in value:
+                filled = filled if filled is not None else dict(value)
+                filled[key] = field.get_default(call_default_factory=True)
+        result = filled if filled is not None else value
+        for key, filler in nested:
+            if key in result:
+                item = result[key]
+                new = filler(item)
+                if new is not item:
+                    if result is value:
+                        result = dict(value)
+                    result[key] = new
+        return result
+
+    return fill
+
+def fill_defaults(model: Any, content: Any) -> Any:
+    """
+    Content with the defaults of fields it lacks filled in, as validation against model would.
+
+    Args:
+        model: The route's response model, such as ThingResponse or List[ThingResponse]
+        content: JSON-compatible content; it is not modified
+    """
+    return _filler(model)(content)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def serialize(content: Any, response: Response, model: Any) -> Any:
+    """
+    Return endpoint content for FastAPI to validate, or an encoded response on the fast path.
+
+    Args:
+        content: JSON-compatible content matching the route's response model
+        response: The Response injected into the endpoint; its status code and headers are kept
+        model: The route's response model, whose defaults are filled in on the fast path
+    """
+    if not get_settings().FAST_SERIALIZATION:
+        return content
+    fast_response = FastJSONResponse(fill_defaults(model, content), status_code=response.status_code or 200)
+    for name, value in response.raw_headers:
+        if name != b"content-length":
+            fast_response.raw_headers.append((name, value))
+    return fast_response
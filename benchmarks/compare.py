@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmarks/endpoints.py or benchmarks/replay.py results and flag regressions
+
+A scenario regresses when its p95 latency grows, or its throughput drops, by
+more than the threshold, or when it issues more SQL queries per request.
+Exits with status 1 when any scenario regressed, so it can gate CI.
+
+Usage:
+    From project root: python benchmarks/compare.py before.json after.json
+    Looser threshold:  python benchmarks/compare.py before.json after.json --threshold 20
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+def change(before: float, after: float) -> Optional[float]:
+    """Relative change in percent, None when there is no baseline."""
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+def regressions(before: dict, after: dict, threshold: float) -> List[str]:
+    """Reasons a scenario got worse between two results."""
+    reasons = []
+    p95 = change(before["p95_ms"], after["p95_ms"])
+    if p95 is not None and p95 > threshold:
+        reasons.append(f"p95 +{p95:.1f}%")
+    throughput = change(before["throughput"], after["throughput"])
+    if throughput is not None and throughput < -threshold:
+        reasons.append(f"throughput {throughput:.1f}%")
+    if (before["queries_per_request"] or 0) + 0.5 < (after["queries_per_request"] or 0):
+        reasons.append(f"queries {before['queries_per_request']} -> {after['queries_per_request']}")
+    if after["errors"] > before["errors"]:
+        reasons.append(f"errors {before['errors']} -> {after['errors']}")
+    return reasons
+
+def format_change(value: Optional[float]) -> str:
+    return f"{value:+.1f}%" if value is not None else "-"
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path, help="Baseline results")
+    parser.add_argument("after", type=Path, help="Results to check")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Tolerated p95 and throughput change in percent (default: 10)")
+    args = parser.parse_args()
+
+    before, after = (json.loads(path.read_text()) for path in (args.before, args.after))
+    for label, report in (("before", before), ("after", after)):
+        metadata = report["metadata"]
+        print(f"{label}: commit {metadata['commit']} at {metadata['timestamp']}, dataset {metadata['dataset']}")
+    if before["metadata"]["dataset"] != after["metadata"]["dataset"]:
+        print("warning: the runs used different datasets")
+
+    print(f"\n{'scenario':<40} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'req/s change':>13}  regression")
+    regressed = 0
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            print(f"{name:<40} missing from {args.after}")
+            continue
+        reasons = regressions(old, new, args.threshold)
+        regressed += bool(reasons)
+        print(
+            f"{name:<40} {old['p95_ms']:>11.2f} {new['p95_ms']:>10.2f} "
+            f"{format_change(change(old['p95_ms'], new['p95_ms'])):>8} "
+            f"{format_change(change(old['throughput'], new['throughput'])):>13}  {', '.join(reasons)}"
+        )
+
+    print(f"\n{regressed} of {len(before['scenarios'])} scenarios regressed beyond {args.threshold}%")
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
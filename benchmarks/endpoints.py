@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Benchmark every /api/v1 endpoint under concurrent load
+
+Each scenario is driven by a number of concurrent clients for a fixed time
+after a warm-up, and reports throughput, mean/p50/p95/p99 latency, the
+error count and the SQL queries per request (read from the Server-Timing
+header). Ids for the lookups are sampled from the list endpoints, so any
+populated database works; benchmarks/seed.py creates reproducible datasets.
+Results are printed and saved as JSON for benchmarks/compare.py.
+
+Write scenarios add rows, so runs without --read-only change the dataset;
+reseed between runs that are to be compared. The admin import scenario only
+runs when --admin-token is given.
+
+Usage:
+    From project root:   python benchmarks/endpoints.py --output before.json
+    Against a server:    python benchmarks/endpoints.py --base-url http://localhost:8000 --output before.json
+    Selected scenarios:  python benchmarks/endpoints.py --scenario things.get --scenario graph --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.pagination import NEXT_CURSOR_HEADER  # noqa: E402
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+SAMPLED_COLLECTIONS = ("things", "stories", "guides", "relationships")
+BATCH_ITEMS = 10
+
+# Request bodies of the write scenarios; thing names are random because thing uris must be unique
+def thing_body(rng: random.Random) -> dict:
+    suffix = uuid.UUID(int=rng.getrandbits(128)).hex[:12]
+    return {
+        "type": rng.choice(["device", "component", "material", "tool"]),
+        "name": {"default": f"Benchmark kettle {suffix}", "translations": {"de": f"Wasserkocher {suffix}"}},
+        "manufacturer": {"name": "Acme", "website": "https://acme.example"},
+        "properties": {"dimensions": {"width": 20, "height": 25}, "materials": ["steel"]}
+    }
+
+def story_body(rng: random.Random, samples: Dict[str, List[str]]) -> dict:
+    return {
+        "thing_id": rng.choice(samples["things"]),
+        "thing_category": {"category": f"category-{rng.randrange(500)}"},
+        "type": "repair",
+        "procedure": [{"order": 1, "description": {"default": "Replace the switch", "translations": {}}}]
+    }
+
+def guide_body(rng: random.Random, samples: Dict[str, List[str]]) -> dict:
+    return {
+        "thing_id": rng.choice(samples["things"]),
+        "type": {"primary": "manual", "secondary": "maintenance"},
+        "content": {"title": {"default": "Descaling", "translations": {"fr": "Détartrage"}}}
+    }
+
+def relationship_body(rng: random.Random, samples: Dict[str, List[str]]) -> dict:
+    # A fresh relationship type keeps the pair from conflicting with an existing relationship
+    return {
+        "source_type": "thing",
+        "source_id": rng.choice(samples["things"]),
+        "target_type": "thing",
+        "target_id": rng.choice(samples["things"]),
+        "relationship_type": f"benchmark-{rng.getrandbits(48):x}",
+        "direction": "unidirectional",
+        "metadata": {"quantity": 1}
+    }
+
+Samples = Dict[str, List[str]]
+# A request builder returns the method, the path and the keyword arguments for httpx
+Builder = Callable[[random.Random, Samples], Tuple[str, str, dict]]
+
+class Scenario:
+    def __init__(self, name: str, build: Builder, write: bool = False, admin: bool = False):
+        self.name = name
+        self.build = build
+        self.write = write
+        self.admin = admin
+
+def get(path: str, **params) -> Tuple[str, str, dict]:
+    return "GET", path, {"params": params}
+
+def post(path: str, body) -> Tuple[str, str, dict]:
+    return "POST", path, {"json": body}
+
+def import_body(rng: random.Random, samples: Samples) -> Tuple[str, str, dict]:
+    rows = "".join(json.dumps(thing_body(rng)) + "\n" for _ in range(100))
+    return "POST", "/api/v1/admin/import/things", {
+        "content": rows, "headers": {"Content-Type": "application/x-ndjson"}
+    }
+
+def recent() -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+
+SCENARIOS = [
+    Scenario("things.list", lambda rng, s: get("/api/v1/things", limit=50)),
+    Scenario("things.list_by_type", lambda rng, s: get("/api/v1/things", type=rng.choice(["device", "tool"]), limit=50)),
+    Scenario("things.get", lambda rng, s: get(f"/api/v1/things/{rng.choice(s['things'])}")),
+    Scenario("things.stories", lambda rng, s: get(f"/api/v1/things/{rng.choice(s['things'])}/stories")),
+    Scenario("stories.list", lambda rng, s: get("/api/v1/stories", limit=50)),
+    Scenario("stories.list_by_category",
+             lambda rng, s: get("/api/v1/stories", category=f"category-{rng.randrange(500)}", limit=50)),
+    Scenario("stories.get", lambda rng, s: get(f"/api/v1/stories/{rng.choice(s['stories'])}")),
+    Scenario("guides.list", lambda rng, s: get("/api/v1/guides", limit=50)),
+    Scenario("guides.list_by_type", lambda rng, s: get("/api/v1/guides", type="manual", limit=50)),
+    Scenario("guides.get", lambda rng, s: get(f"/api/v1/guides/{rng.choice(s['guides'])}")),
+    Scenario("relationships.list", lambda rng, s: get("/api/v1/relationships", limit=50)),
+    Scenario("relationships.by_source",
+             lambda rng, s: get("/api/v1/relationships", source_type="thing", source_id=rng.choice(s["things"]))),
+    Scenario("relationships.get", lambda rng, s: get(f"/api/v1/relationships/{rng.choice(s['relationships'])}")),
+    Scenario("search.en", lambda rng, s: get("/api/v1/search", q="kettle", lang="en")),
+    Scenario("search.de", lambda rng, s: get("/api/v1/search", q="Wasserkocher", lang="de")),
+    Scenario("graph", lambda rng, s: get(f"/api/v1/graph/thing/{rng.choice(s['things'])}", depth=2)),
+    Scenario("export.things_recent", lambda rng, s: get("/api/v1/export/things", updated_since=recent())),
+    Scenario("things.create", lambda rng, s: post("/api/v1/things", thing_body(rng)), write=True),
+    Scenario("things.batch",
+             lambda rng, s: post("/api/v1/things/batch", [thing_body(rng) for _ in range(BATCH_ITEMS)]), write=True),
+    Scenario("stories.create", lambda rng, s: post("/api/v1/stories", story_body(rng, s)), write=True),
+    Scenario("stories.batch",
+             lambda rng, s: post("/api/v1/stories/batch", [story_body(rng, s) for _ in range(BATCH_ITEMS)]),
+             write=True),
+    Scenario("guides.create", lambda rng, s: post("/api/v1/guides", guide_body(rng, s)), write=True),
+    Scenario("guides.batch",
+             lambda rng, s: post("/api/v1/guides/batch", [guide_body(rng, s) for _ in range(BATCH_ITEMS)]),
+             write=True),
+    Scenario("relationships.create",
+             lambda rng, s: post("/api/v1/relationships", relationship_body(rng, s)), write=True),
+    Scenario("relationships.batch",
+             lambda rng, s: post("/api/v1/relationships/batch", [relationship_body(rng, s) for _ in range(BATCH_ITEMS)]),
+             write=True),
+    Scenario("admin.import_things", import_body, write=True, admin=True),
+]
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def query_count(response: Optional[httpx.Response]) -> Optional[int]:
+    """SQL queries reported in a response's Server-Timing header."""
+    match = QUERY_COUNT.search(response.headers.get("server-timing", "")) if response is not None else None
+    return int(match.group(1)) if match else None
+
+def summarize(latencies: List[float], queries: List[int], errors: int, wall: float) -> dict:
+    """Throughput, latency percentiles, errors and queries per request of measured requests."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "error_rate": round(errors / len(ordered), 4) if ordered else 0.0,
+        "throughput": round(len(ordered) / wall, 2) if wall > 0 else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+@asynccontextmanager
+async def open_client(
+    base_url: Optional[str], concurrency: int, timeout: float, headers: Dict[str, str]
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Client for a running server, or for the application in-process when no base URL is given."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    app = None
+    if base_url:
+        transport = None
+    else:
+        from app.main import app
+        await app.router.startup()
+        transport, base_url = httpx.ASGITransport(app=app), "http://benchmark"
+    try:
+        async with httpx.AsyncClient(
+            base_url=base_url, transport=transport, headers=headers, limits=limits, timeout=timeout
+        ) as client:
+            yield client
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+async def sample_ids(client: httpx.AsyncClient, collection: str, pages: int) -> List[str]:
+    """Ids from the first pages of a list endpoint."""
+    ids, cursor = [], None
+    for _ in range(pages):
+        params = {"limit": 100, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"/api/v1/{collection}", params=params)
+        response.raise_for_status()
+        ids.extend(row["id"] for row in response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    return ids
+
+async def run_scenario(
+    client: httpx.AsyncClient, scenario: Scenario, samples: Samples,
+    concurrency: int, duration: float, warmup: float, seed: int
+) -> dict:
+    """Drive one scenario with concurrent clients and summarise the measured part."""
+    latencies: List[float] = []
+    queries: List[int] = []
+    errors = 0
+    measuring = False
+
+    async def worker(rng: random.Random, deadline: float) -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            method, path, kwargs = scenario.build(rng, samples)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                response, failed = None, True
+            elapsed = time.perf_counter() - started
+            if not measuring:
+                continue
+            latencies.append(elapsed)
+            errors += failed
+            count = query_count(response)
+            if count is not None:
+                queries.append(count)
+
+    rngs = [random.Random(f"{seed}-{scenario.name}-{n}") for n in range(concurrency)]
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(rng, deadline) for rng in rngs))
+    measuring = True
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(rng, deadline) for rng in rngs))
+    return summarize(latencies, queries, errors, time.perf_counter() - started)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def dataset_counts() -> Optional[Dict[str, int]]:
+    """Row counts of the configured database, when it is reachable from here."""
+    from sqlalchemy import text
+    from sqlalchemy.exc import SQLAlchemyError
+    from app.database import engine
+    try:
+        with engine.connect() as connection:
+            return {
+                table: connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+                for table in SAMPLED_COLLECTIONS
+            }
+    except SQLAlchemyError:
+        return None
+
+async def run(args) -> dict:
+    selected = [
+        scenario for scenario in SCENARIOS
+        if (not args.scenario or scenario.name in args.scenario)
+        and not (args.read_only and scenario.write)
+        and not (scenario.admin and not args.admin_token)
+    ]
+    headers = {"X-Admin-Token": args.admin_token} if args.admin_token else {}
+
+    async with open_client(args.base_url, args.concurrency, args.timeout, headers) as client:
+        samples = {
+            collection: await sample_ids(client, collection, args.id_pages)
+            for collection in SAMPLED_COLLECTIONS
+        }
+        empty = [collection for collection, ids in samples.items() if not ids]
+        if empty:
+            raise SystemExit(f"No {', '.join(empty)} to sample ids from; seed the database first")
+
+        results = {}
+        for scenario in selected:
+            results[scenario.name] = await run_scenario(
+                client, scenario, samples, args.concurrency, args.duration, args.warmup, args.seed
+            )
+            print(format_row(scenario.name, results[scenario.name]))
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "target": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "dataset": dataset_counts(),
+        },
+        "scenarios": results,
+    }
+
+HEADER = f"{'scenario':<40} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'errors':>7}"
+
+def format_row(name: str, result: dict) -> str:
+    queries = result["queries_per_request"]
+    return (
+        f"{name:<40} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+        f"{result['p99_ms']:>9.2f} {queries if queries is not None else '-':>8} {result['errors']:>7}"
+    )
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Running server to benchmark (default: the application in-process)")
+    parser.add_argument("--scenario", action="append", choices=[scenario.name for scenario in SCENARIOS],
+                        help="Scenario to run, repeatable (default: all)")
+    parser.add_argument("--read-only", action="store_true", help="Skip the scenarios that write")
+    parser.add_argument("--admin-token", help="X-Admin-Token for the import scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario (default: 10)")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds per scenario (default: 2)")
+    parser.add_argument("--id-pages", type=int, default=5, help="Pages of 100 ids sampled per collection (default: 5)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds (default: 30)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the request mix (default: 42)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    print(HEADER)
+    report = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {args.output}")
+    failed = sum(result["errors"] for result in report["scenarios"].values())
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Replay recorded production traffic against a ThingData instance
+
+Reads requests from the capture file written by the server with
+CAPTURE_SAMPLE_RATE set (logs/captured_requests.ndjson) or from access logs
+in common/combined log format or uvicorn's format, and replays the /api/
+requests with their original spacing, sped up or slowed down by --speed
+(0 sends them as fast as --concurrency allows). Captured bodies and query
+values have their free text replaced by random text of the same length. Access logs carry no
+bodies, so their writes are skipped, as are captured NDJSON and CSV imports.
+Uvicorn access logs carry no times and are replayed as fast as possible.
+
+Reports latency percentiles, throughput and error rates per route and in
+total, plus how far the replay fell behind the recorded schedule. The JSON
+output has the format of benchmarks/endpoints.py, so two replays can be
+compared with benchmarks/compare.py.
+
+Usage:
+    From project root: python benchmarks/replay.py logs/captured_requests.ndjson --base-url http://localhost:8000
+    Twice as fast:     python benchmarks/replay.py access.log --base-url http://staging:8000 --speed 2 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import random
+import re
+import string
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+import httpx
+from starlette.routing import Match
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.metrics import UNMATCHED_ROUTE  # noqa: E402
+from benchmarks.endpoints import (  # noqa: E402
+    HEADER, dataset_counts, format_row, git_commit, open_client, query_count, summarize
+)
+
+# 127.0.0.1 - - [10/Oct/2024:13:55:36 +0000] "GET /api/v1/things?limit=10 HTTP/1.1" 200 2326 ...
+COMMON_LOG = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<target>\S+) HTTP/[\d.]+" (?P<status>\d{3})'
+)
+# INFO:     127.0.0.1:54321 - "GET /api/v1/things HTTP/1.1" 200 OK
+UVICORN_LOG = re.compile(r'"(?P<method>[A-Z]+) (?P<target>\S+) HTTP/[\d.]+" (?P<status>\d{3})')
+STRING_MARKER = re.compile(r"^<str:(\d+)>$")
+BODY_METHODS = {"POST", "PUT", "PATCH"}
+
+class RecordedRequest:
+    __slots__ = ("time", "method", "path", "query", "body")
+
+    def __init__(self, timestamp: Optional[float], method: str, path: str, query: str, body: Any = None):
+        self.time = timestamp
+        self.method = method
+        self.path = path
+        self.query = query
+        self.body = body
+
+def parse_line(line: str) -> Optional[RecordedRequest]:
+    """A request from a capture record or an access log line, None for other lines."""
+    if line.startswith("{"):
+        record = json.loads(line)
+        return RecordedRequest(
+            datetime.fromisoformat(record["time"]).timestamp(), record["method"], record["path"],
+            record.get("query", ""), record.get("body")
+        )
+    match = COMMON_LOG.match(line)
+    timestamp = None
+    if match:
+        timestamp = datetime.strptime(match.group("time"), "%d/%b/%Y:%H:%M:%S %z").timestamp()
+    else:
+        match = UVICORN_LOG.search(line)
+        if not match:
+            return None
+    path, _, query = match.group("target").partition("?")
+    return RecordedRequest(timestamp, match.group("method"), path, query)
+
+def read_requests(paths: List[Path]) -> Iterator[RecordedRequest]:
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                request = parse_line(line.strip())
+                if request is not None and request.path.startswith("/api/"):
+                    yield request
+
+def materialize(shape: Any, rng: random.Random) -> Any:
+    """Request body from a captured shape, with random text in place of the blanked strings."""
+    if isinstance(shape, dict):
+        return {name: materialize(value, rng) for name, value in shape.items()}
+    if isinstance(shape, list):
+        return [materialize(value, rng) for value in shape]
+    if shape == "<email>":
+        return f"{''.join(rng.choices(string.ascii_lowercase, k=8))}@example.com"
+    if isinstance(shape, str):
+        match = STRING_MARKER.match(shape)
+        if match:
+            return "".join(rng.choices(string.ascii_letters + " ", k=max(1, int(match.group(1)))))
+    return shape
+
+def route_of(routes, method: str, path: str) -> str:
+    """Path template of the application route serving a request."""
+    scope = {"type": "http", "method": method, "path": path}
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+async def replay(args) -> dict:
+    from app.main import app
+
+    requests = list(read_requests(args.files))
+    if args.limit:
+        requests = requests[:args.limit]
+    if not requests:
+        raise SystemExit("No /api/ requests found in the input")
+    timed = args.speed > 0 and all(request.time is not None for request in requests)
+    if timed:
+        requests.sort(key=lambda request: request.time)
+    first_time = requests[0].time if timed else 0.0
+
+    rng = random.Random(args.seed)
+    measurements: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+    late = 0
+    max_lag = 0.0
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def send(
+        client: httpx.AsyncClient, request: RecordedRequest, name: str, query: List[Tuple[str, str]], body: Any
+    ) -> None:
+        try:
+            started = time.perf_counter()
+            try:
+                kwargs = {"params": query} if query else {}
+                if body is not None:
+                    kwargs["json"] = body
+                response = await client.request(request.method, request.path, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                response, failed = None, True
+            elapsed = time.perf_counter() - started
+        finally:
+            slots.release()
+        route = measurements.setdefault(name, {"latencies": [], "queries": [], "errors": 0})
+        route["latencies"].append(elapsed)
+        route["errors"] += failed
+        count = query_count(response)
+        if count is not None:
+            route["queries"].append(count)
+
+    async with open_client(args.base_url, args.concurrency, args.timeout, {}) as client:
+        tasks = []
+        started = time.perf_counter()
+        for request in requests:
+            body = None
+            if request.method in BODY_METHODS:
+                if request.body is None:
+                    skipped += 1
+                    continue
+                body = materialize(request.body, rng)
+            query = [(key, materialize(value, rng)) for key, value in parse_qsl(request.query, keep_blank_values=True)]
+            if timed:
+                due = started + (request.time - first_time) / args.speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await slots.acquire()
+            if timed:
+                lag = time.perf_counter() - due
+                max_lag = max(max_lag, lag)
+                late += lag > args.late_after
+            name = f"{request.method} {route_of(app.routes, request.method, request.path)}"
+            tasks.append(asyncio.create_task(send(client, request, name, query, body)))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - started
+
+    results = {
+        name: summarize(route["latencies"], route["queries"], route["errors"], wall)
+        for name, route in sorted(measurements.items())
+    }
+    everything = [latency for route in measurements.values() for latency in route["latencies"]]
+    total = summarize(
+        everything,
+        [count for route in measurements.values() for count in route["queries"]],
+        sum(route["errors"] for route in measurements.values()),
+        wall
+    )
+    for name, result in results.items():
+        print(format_row(name, result))
+    print(format_row("total", total))
+    if skipped:
+        print(f"{skipped} writes without a recorded body skipped")
+    if timed:
+        print(f"{late} requests started more than {args.late_after * 1000:.0f} ms late "
+              f"(max {max_lag * 1000:.0f} ms): the target or --concurrency could not keep up")
+
+    return {
+        "metadata": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "target": args.base_url or "in-process",
+            "inputs": [str(path) for path in args.files],
+            "speed": args.speed,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "skipped": skipped,
+            "late": late,
+            "max_lag_ms": round(max_lag * 1000, 1),
+            "dataset": dataset_counts(),
+        },
+        "total": total,
+        "scenarios": results,
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", type=Path, help="Capture files or access logs")
+    parser.add_argument("--base-url", help="Instance to replay against (default: the application in-process)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed as a multiple of the recorded rate; 0 for as fast as possible (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight (default: 64)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--late-after", type=float, default=0.1,
+                        help="Seconds behind schedule after which a request counts as late (default: 0.1)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds (default: 30)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the generated body text (default: 42)")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    print(HEADER)
+    report = asyncio.run(replay(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark the request overhead of SecurityMiddleware on small POSTs
+
+Drives a minimal FastAPI application in process, with ASGI messages and no
+network, three ways: without middleware, behind the previous
+BaseHTTPMiddleware implementation (kept below as the baseline), and behind
+the current pure ASGI SecurityMiddleware.
+
+Usage:
+    From project root: python benchmarks/security_middleware.py
+    More requests:     python benchmarks/security_middleware.py --requests 50000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.security import SecurityConfig, SecurityException, SecurityMiddleware  # noqa: E402
+
+BODY = b'{"source_type": "thing", "source_id": "kettle", "relationship_type": "has_component"}'
+
+class LegacySecurityMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation SecurityMiddleware replaced."""
+
+    async def dispatch(self, request: Request, call_next):
+        try:
+            if request.method in ("POST", "PUT", "PATCH"):
+                max_size = SecurityConfig.MAX_REQUEST_SIZE
+                if int(request.headers.get("content-length", 0)) > max_size:
+                    raise SecurityException(413, "Request too large")
+                if not request.headers.get("content-type", "").startswith("application/json"):
+                    raise SecurityException(400, "Only application/json content type is allowed")
+            return await call_next(request)
+        except SecurityException as e:
+            return JSONResponse(status_code=e.status_code, content={"error": e.detail})
+
+def make_app(middleware=None):
+    app = FastAPI()
+
+    @app.post("/api/v1/relationships")
+    async def create(payload: dict):
+        return {"id": "created", "source_id": payload["source_id"]}
+
+    if middleware is not None:
+        app.add_middleware(middleware)
+    return app
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+    "scheme": "http", "path": "/api/v1/relationships", "raw_path": b"/api/v1/relationships",
+    "query_string": b"", "root_path": "", "server": ("bench", 80), "client": ("bench", 1234),
+    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(BODY)).encode())],
+}
+
+async def request(app) -> int:
+    status = 0
+    sent_body = False
+
+    async def receive():
+        nonlocal sent_body
+        if sent_body:
+            return {"type": "http.disconnect"}
+        sent_body = True
+        return {"type": "http.request", "body": BODY, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(dict(SCOPE), receive, send)
+    return status
+
+async def throughput(app, requests: int) -> float:
+    """Return requests per second for sequential requests."""
+    assert await request(app) == 200
+    start = time.perf_counter()
+    for _ in range(requests):
+        await request(app)
+    return requests / (time.perf_counter() - start)
+
+async def run(requests: int, rounds: int) -> None:
+    apps = {
+        "none": make_app(),
+        "legacy": make_app(LegacySecurityMiddleware),
+        "asgi": make_app(SecurityMiddleware),
+    }
+    best = {name: 0.0 for name in apps}
+    for _ in range(rounds):
+        for name, app in apps.items():
+            best[name] = max(best[name], await throughput(app, requests))
+
+    print(f"{requests} small POSTs per round, best of {rounds} rounds")
+    for name, rate in best.items():
+        overhead = 1e6 / rate - 1e6 / best["none"]
+        print(f"  {name:<7} {rate:9.0f} req/s   middleware overhead {overhead:6.1f} us/request")
+    print(f"  asgi vs legacy: {best['asgi'] / best['legacy']:.2f}x throughput")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10000, help="Requests per round (default: 10000)")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds, the best is kept (default: 3)")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.rounds))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
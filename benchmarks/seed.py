@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Seed the database with a benchmark dataset
+
+Rows are generated inside PostgreSQL with generate_series, in chunks, from a
+fixed random seed, so the same preset always produces the same ids and
+content. Relationship fan-out follows a power law: most things have one or
+two relationships while a few hubs have hundreds, and relationship targets
+are skewed towards the same hubs. Ids are uuids derived from the row number
+(see entity_id), stories and guides point at things, and every hundredth
+row carries a recent updated_at for the incremental export.
+
+Presets:
+    small   10,000 things,    5,000 stories,   2,500 guides, ~24,000 relationships
+    large   1,000,000 things, 500,000 stories, 250,000 guides, ~2.4M relationships
+
+Usage:
+    From project root: python benchmarks/seed.py --dataset small --reset
+    Custom size:       python benchmarks/seed.py --things 200000 --reset
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Every seeding statement is slow; keep them out of the slow query log
+os.environ.setdefault("SLOW_QUERY_SECONDS", "0")
+
+from app.database import engine  # noqa: E402
+from app.migrations.runner import upgrade  # noqa: E402
+
+DATASETS = {"small": 10_000, "large": 1_000_000}
+TABLES = ("things", "stories", "guides", "relationships")
+CHUNK_ROWS = 50_000
+# Cap on the relationships of a single thing
+MAX_FAN_OUT = 500
+
+def entity_id(kind: str, n: int) -> str:
+    """Id of the n-th seeded row of a kind, as generated by the seed SQL (md5 of 'kind-n' as a uuid)."""
+    return str(uuid.UUID(hashlib.md5(f"{kind}-{n}".encode()).hexdigest()))
+
+def row_id(kind: str) -> str:
+    return f"md5('{kind}-' || n)::uuid::text"
+
+def hub(things: int) -> str:
+    """A random thing number, skewed towards low numbers so that a few things become hubs."""
+    return f"(floor({things} * power(random(), 3))::int + 1)"
+
+# Chunk statements take :first and :last row numbers
+THINGS_SQL = """
+INSERT INTO things (id, uri, type, name, manufacturer, properties, created_at, updated_at)
+SELECT {id}, 'thing:' || type || '/' || maker || '/Item ' || n, type,
+       jsonb_build_object(
+           'default', 'Item ' || n,
+           'translations', jsonb_build_object(
+               'en', 'Kettle model ' || n, 'de', 'Wasserkocher Modell ' || n,
+               'es', 'Hervidor modelo ' || n, 'ja', '電気ケトル ' || n
+           )
+       ),
+       jsonb_build_object('name', maker, 'website', 'https://' || lower(maker) || '.example'),
+       jsonb_build_object(
+           'dimensions', jsonb_build_object('width', n % 50 + 10, 'height', n % 30 + 10),
+           'materials', jsonb_build_array('steel', 'plastic'),
+           'serial_number', 'SN-' || n
+       ),
+       timestamptz '2024-01-01' + n * interval '1 second',
+       CASE WHEN n % 100 = 0 THEN now() - (n % 24) * interval '1 hour' END
+FROM (
+    SELECT n, (ARRAY['device', 'component', 'material', 'tool'])[floor(random() * 4)::int + 1] AS type,
+           (ARRAY['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli'])[floor(random() * 5)::int + 1] AS maker
+    FROM generate_series(:first, :last) AS n
+) AS rows
+"""
+
+STORIES_SQL = """
+INSERT INTO stories (id, thing_id, thing_category, version, type, procedure, created_at, updated_at)
+SELECT {id}, {thing_id}, jsonb_build_object('category', 'category-' || n % 500),
+       '{{"number": "1.0.0", "history": []}}',
+       (ARRAY['repair', 'maintenance', 'modification', 'diagnosis'])[floor(random() * 4)::int + 1],
+       jsonb_build_array(
+           jsonb_build_object('order', 1, 'description', jsonb_build_object(
+               'default', 'Unplug the device and let it cool down',
+               'translations', jsonb_build_object('de', 'Gerät ausstecken und abkühlen lassen')
+           ), 'tools', jsonb_build_array()),
+           jsonb_build_object('order', 2, 'description', jsonb_build_object(
+               'default', 'Remove the ' || (ARRAY['lid', 'base', 'filter', 'switch'])[n % 4 + 1] || ' screws',
+               'translations', jsonb_build_object('es', 'Retire los tornillos')
+           ), 'tools', jsonb_build_array('screwdriver'))
+       ),
+       timestamptz '2024-01-01' + n * interval '1 second',
+       CASE WHEN n % 100 = 0 THEN now() - (n % 24) * interval '1 hour' END
+FROM generate_series(:first, :last) AS n
+"""
+
+GUIDES_SQL = """
+INSERT INTO guides (id, thing_id, thing_category, type, content, created_at, updated_at)
+SELECT {id}, {thing_id}, jsonb_build_object('category', 'category-' || n % 500),
+       jsonb_build_object(
+           'primary', (ARRAY['manual', 'tutorial', 'specification', 'documentation'])[n % 4 + 1],
+           'secondary', (ARRAY['repair', 'maintenance'])[n % 2 + 1]
+       ),
+       jsonb_build_object(
+           'title', jsonb_build_object(
+               'default', 'Descaling guide ' || n,
+               'translations', jsonb_build_object('de', 'Entkalkungsanleitung ' || n, 'fr', 'Guide de détartrage ' || n)
+           ),
+           'summary', jsonb_build_object('default', 'How to keep the heating element free of limescale'),
+           'procedure', jsonb_build_array(jsonb_build_object('description', 'Fill with vinegar and boil'))
+       ),
+       timestamptz '2024-01-01' + n * interval '1 second',
+       CASE WHEN n % 100 = 0 THEN now() - (n % 24) * interval '1 hour' END
+FROM generate_series(:first, :last) AS n
+"""
+
+# One chunk of things with their outgoing relationships: a power-law number
+# of links per thing to other things, plus links from its stories and guides
+RELATIONSHIPS_SQL = """
+INSERT INTO relationships (id, source_type, source_id, target_type, target_id,
+                           relationship_type, direction, relation_metadata, created_at)
+SELECT md5('relationship-' || n || '-' || k)::uuid::text, 'thing', md5('thing-' || n)::uuid::text,
+       'thing', md5('thing-' || {hub})::uuid::text,
+       (ARRAY['has_component', 'compatible_with', 'replaces', 'made_from'])[floor(random() * 4)::int + 1],
+       (ARRAY['unidirectional', 'bidirectional'])[floor(random() * 2)::int + 1],
+       jsonb_build_object('quantity', k),
+       timestamptz '2024-01-01' + n * interval '1 second'
+FROM (
+    SELECT n, least(floor(power(1 - random(), -0.5))::int, {max_fan_out}) AS degree
+    FROM generate_series(:first, :last) AS n
+) AS things
+CROSS JOIN LATERAL generate_series(1, things.degree) AS k
+UNION ALL
+SELECT md5('relationship-story-' || n)::uuid::text, 'story', md5('story-' || n)::uuid::text,
+       'thing', {thing_id}, 'documents', 'unidirectional', NULL,
+       timestamptz '2024-01-01' + n * interval '1 second'
+FROM generate_series(:first, least(:last, {stories})) AS n
+UNION ALL
+SELECT md5('relationship-guide-' || n)::uuid::text, 'guide', md5('guide-' || n)::uuid::text,
+       'thing', {thing_id}, 'describes', 'unidirectional', NULL,
+       timestamptz '2024-01-01' + n * interval '1 second'
+FROM generate_series(:first, least(:last, {guides})) AS n
+ON CONFLICT DO NOTHING
+"""
+
+def seed(things: int, seed_value: int, reset: bool) -> dict:
+    """Create the schema if needed, fill the tables and return their row counts."""
+    upgrade(engine)
+    stories, guides = things // 2, things // 4
+    # Stories and guides are spread over the things by multiplying their number with a prime
+    thing_of = f"md5('thing-' || ((n * 7919) % {things} + 1))::uuid::text"
+    plan = [
+        ("things", things, THINGS_SQL.format(id=row_id("thing"))),
+        ("stories", stories, STORIES_SQL.format(id=row_id("story"), thing_id=thing_of)),
+        ("guides", guides, GUIDES_SQL.format(id=row_id("guide"), thing_id=thing_of)),
+        ("relationships", things, RELATIONSHIPS_SQL.format(
+            hub=hub(things), max_fan_out=MAX_FAN_OUT, stories=stories, guides=guides, thing_id=thing_of
+        )),
+    ]
+
+    with engine.connect() as connection:
+        existing = connection.execute(text("SELECT count(*) FROM things")).scalar()
+        if existing and not reset:
+            raise SystemExit(f"things already holds {existing} rows; pass --reset to replace them")
+        if reset:
+            connection.execute(text(f"TRUNCATE {', '.join(TABLES)}"))
+        # Parallel plans would interleave the random sequence between workers
+        connection.execute(text("SET max_parallel_workers_per_gather = 0"))
+        connection.execute(text("SELECT setseed(:seed)"), {"seed": seed_value / 2**31})
+        connection.commit()
+
+        for table, rows, statement in plan:
+            started = time.perf_counter()
+            for first in range(1, rows + 1, CHUNK_ROWS):
+                last = min(first + CHUNK_ROWS - 1, rows)
+                connection.execute(text(statement), {"first": first, "last": last})
+                connection.commit()
+                print(f"  {table}: {last}/{rows}", end="\r", flush=True)
+            print(f"  {table}: {rows} source rows in {time.perf_counter() - started:.1f}s")
+
+        connection.execution_options(isolation_level="AUTOCOMMIT")
+        for table in TABLES:
+            connection.execute(text(f"VACUUM ANALYZE {table}"))
+        counts = {
+            table: connection.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+            for table in TABLES
+        }
+    return counts
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="small", help="Dataset preset")
+    parser.add_argument("--things", type=int, help="Number of things, overriding the preset")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--reset", action="store_true", help="Empty the tables before seeding")
+    args = parser.parse_args()
+
+    things = args.things or DATASETS[args.dataset]
+    print(f"Seeding {things} things (seed {args.seed})")
+    counts = seed(things, args.seed, args.reset)
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-row cost of serializing list responses
+
+Compares the default pipeline (to_dict, validation against the response
+model, stdlib json encoding, as FastAPI does for a route with a
+response_model) with the FAST_SERIALIZATION path (to_dict, filling in
+the model defaults, direct encoding).
+Rows are built in memory, so no database is needed.
+
+Usage:
+    From project root: python benchmarks/serialization.py
+    Larger pages:      python benchmarks/serialization.py --rows 1000 --relationships 5
+"""
+
+import argparse
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import Thing, Relationship  # noqa: E402
+from app.schemas import RelationshipCreate, ThingCreate, ThingResponse  # noqa: E402
+from app.serialization import dumps, fill_defaults, orjson  # noqa: E402
+
+def build_page(rows: int, relationships: int):
+    """Return a page of things and their relationships by source, stored as the create endpoints store them."""
+    things = []
+    for n in range(rows):
+        data = ThingCreate(
+            type="device",
+            name={"default": f"Kettle {n}", "translations": {"de": f"Wasserkocher {n}", "es": f"Hervidor {n}"}},
+            manufacturer={"name": "Acme", "website": "https://acme.example"},
+            properties={"dimensions": {"width": 20, "height": 25, "depth": 15}, "materials": ["steel"]}
+        ).model_dump(mode='json')
+        things.append(Thing(**Thing.values_from_create(data), updated_at=None))
+
+    by_source = {}
+    for thing in things:
+        for _ in range(relationships):
+            data = RelationshipCreate(
+                source_type="thing",
+                source_id=thing.id,
+                target_type="thing",
+                target_id=str(uuid.uuid4()),
+                relationship_type="has_component",
+                direction="unidirectional",
+                metadata={"quantity": 1}
+            ).model_dump(mode='json')
+            relationship = Relationship(**Relationship.values_from_create(data), updated_at=None)
+            by_source.setdefault(thing.id, []).append(relationship)
+    return things, by_source
+
+def to_page(things, by_source) -> List[dict]:
+    return [
+        {**thing.to_dict(), 'relationships': [r.to_dict() for r in by_source.get(thing.id, [])]}
+        for thing in things
+    ]
+
+def validated(things, by_source, adapter) -> bytes:
+    content = adapter.dump_python(adapter.validate_python(to_page(things, by_source)), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def fast(things, by_source, adapter) -> bytes:
+    return dumps(fill_defaults(List[ThingResponse], to_page(things, by_source)))
+
+def measure(encode, things, by_source, adapter, repeat: int) -> float:
+    """Return the best per-row time in microseconds over repeat runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(things, by_source, adapter)
+        best = min(best, time.perf_counter() - start)
+    return best / len(things) * 1e6
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page (default: 100)")
+    parser.add_argument("--relationships", type=int, default=3, help="Relationships per row (default: 3)")
+    parser.add_argument("--repeat", type=int, default=50, help="Runs per pipeline, the best is kept (default: 50)")
+    args = parser.parse_args()
+
+    things, by_source = build_page(args.rows, args.relationships)
+    adapter = TypeAdapter(List[ThingResponse])
+    assert json.loads(validated(things, by_source, adapter)) == json.loads(fast(things, by_source, adapter))
+
+    results = {
+        "validated": measure(validated, things, by_source, adapter, args.repeat),
+        "fast": measure(fast, things, by_source, adapter, args.repeat),
+    }
+    encoder = "orjson" if orjson is not None else "json"
+    print(f"{args.rows} rows, {args.relationships} relationships per row, fast path encoder: {encoder}")
+    for name, per_row in results.items():
+        print(f"  {name:<10} {per_row:8.1f} us/row")
+    print(f"  speedup    {results['validated'] / results['fast']:8.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
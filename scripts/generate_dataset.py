@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Generate a large synthetic ThingData dataset
+
+Produces things, stories, guides and relationships with realistic
+distributions: manufacturer and category popularity follow Zipf's law, the
+number of relationships per thing follows a power law with links skewed
+towards a few hub things, names and procedure steps are translated into a
+varying subset of languages, and procedure lengths are log-normal with a
+long tail.
+
+Rows are generated in fixed-size shards by parallel worker processes. Every
+shard draws from its own random generator derived from the seed, so the
+output is the same whatever the number of workers. Records are written as
+NDJSON files in the export format (ids and timestamps included, loadable with
+scripts/import_data.py) or loaded directly into the database through the
+bulk importer, things first so that references resolve.
+
+Usage:
+    From project root:  python scripts/generate_dataset.py --things 1000000 --output-dir data/synthetic
+    Into the database:  python scripts/generate_dataset.py --things 1000000 --database --workers 8
+"""
+
+import argparse
+import asyncio
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.schemas import ExportCollection  # noqa: E402
+from app.serialization import dumps  # noqa: E402
+
+SHARD_SIZE = 20_000
+# Namespace of the generated ids, which are uuid5(namespace, "seed:kind:n")
+ID_NAMESPACE = uuid.UUID("6f1c2d3e-8a4b-4c5d-9e6f-7a8b9c0d1e2f")
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=3 * 365)
+MAX_RELATIONSHIPS = 1000
+MAX_STEPS = 120
+
+# Product nouns with their thing type and translations
+PRODUCTS = [
+    ("device", {"en": "Kettle", "de": "Wasserkocher", "fr": "Bouilloire", "es": "Hervidor", "it": "Bollitore",
+                "ja": "電気ケトル", "zh": "电水壶", "ru": "Чайник"}),
+    ("tool", {"en": "Drill", "de": "Bohrmaschine", "fr": "Perceuse", "es": "Taladro", "it": "Trapano",
+              "ja": "ドリル", "zh": "电钻", "ru": "Дрель"}),
+    ("device", {"en": "Lamp", "de": "Lampe", "fr": "Lampe", "es": "Lámpara", "it": "Lampada",
+                "ja": "ランプ", "zh": "台灯", "ru": "Лампа"}),
+    ("device", {"en": "Bicycle", "de": "Fahrrad", "fr": "Vélo", "es": "Bicicleta", "it": "Bicicletta",
+                "ja": "自転車", "zh": "自行车", "ru": "Велосипед"}),
+    ("device", {"en": "Washing machine", "de": "Waschmaschine", "fr": "Lave-linge", "es": "Lavadora",
+                "it": "Lavatrice", "ja": "洗濯機", "zh": "洗衣机", "ru": "Стиральная машина"}),
+    ("device", {"en": "Phone", "de": "Telefon", "fr": "Téléphone", "es": "Teléfono", "it": "Telefono",
+                "ja": "電話", "zh": "电话", "ru": "Телефон"}),
+    ("component", {"en": "Power supply", "de": "Netzteil", "fr": "Alimentation", "es": "Fuente de alimentación",
+                   "it": "Alimentatore", "ja": "電源ユニット", "zh": "电源", "ru": "Блок питания"}),
+    ("component", {"en": "Heating element", "de": "Heizelement", "fr": "Résistance", "es": "Resistencia",
+                   "it": "Resistenza", "ja": "ヒーター", "zh": "加热元件", "ru": "Нагревательный элемент"}),
+    ("material", {"en": "Stainless steel sheet", "de": "Edelstahlblech", "fr": "Tôle inox",
+                  "es": "Chapa de acero inoxidable", "it": "Lamiera inox", "ja": "ステンレス板", "zh": "不锈钢板",
+                  "ru": "Лист нержавеющей стали"}),
+    ("tool", {"en": "Screwdriver", "de": "Schraubendreher", "fr": "Tournevis", "es": "Destornillador",
+              "it": "Cacciavite", "ja": "ドライバー", "zh": "螺丝刀", "ru": "Отвёртка"}),
+]
+LANGUAGES = ("de", "fr", "es", "it", "ja", "zh", "ru")
+PRODUCT_LINES = ("Pro", "Eco", "Compact", "Max", "Lite", "Plus", "Classic", "Smart")
+
+# Procedure steps: "<verb> <part>" arranged per language
+STEP_PATTERNS = {"en": "{verb} the {part}", "de": "{part} {verb}", "fr": "{verb} {part}",
+                 "es": "{verb} {part}", "ja": "{part}を{verb}"}
+VERBS = [
+    {"en": "Remove", "de": "entfernen", "fr": "Retirer", "es": "Retirar", "ja": "外す"},
+    {"en": "Clean", "de": "reinigen", "fr": "Nettoyer", "es": "Limpiar", "ja": "掃除する"},
+    {"en": "Replace", "de": "ersetzen", "fr": "Remplacer", "es": "Sustituir", "ja": "交換する"},
+    {"en": "Check", "de": "prüfen", "fr": "Vérifier", "es": "Comprobar", "ja": "確認する"},
+    {"en": "Tighten", "de": "festziehen", "fr": "Serrer", "es": "Apretar", "ja": "締める"},
+]
+PARTS = [
+    {"en": "lid", "de": "Deckel", "fr": "le couvercle", "es": "la tapa", "ja": "蓋"},
+    {"en": "filter", "de": "Filter", "fr": "le filtre", "es": "el filtro", "ja": "フィルター"},
+    {"en": "power cable", "de": "Netzkabel", "fr": "le câble d'alimentation", "es": "el cable de alimentación",
+     "ja": "電源コード"},
+    {"en": "seal", "de": "Dichtung", "fr": "le joint", "es": "la junta", "ja": "パッキン"},
+    {"en": "screws", "de": "Schrauben", "fr": "les vis", "es": "los tornillos", "ja": "ネジ"},
+    {"en": "switch", "de": "Schalter", "fr": "l'interrupteur", "es": "el interruptor", "ja": "スイッチ"},
+    {"en": "hinge", "de": "Scharnier", "fr": "la charnière", "es": "la bisagra", "ja": "ヒンジ"},
+    {"en": "battery", "de": "Akku", "fr": "la batterie", "es": "la batería", "ja": "バッテリー"},
+]
+TOOLS = ("screwdriver", "pliers", "multimeter", "soldering iron", "spudger", "hex key", "brush")
+WARNINGS = ("Disconnect from mains first", "Hot surface", "Sharp edges", "Wear eye protection")
+
+MANUFACTURERS = [
+    "Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell", "Cyberdyne", "Soylent",
+    "Vandelay", "Wonka", "Gringotts", "Monarch", "Oscorp", "Aperture", "Black Mesa", "Massive Dynamic",
+    "Nakatomi", "Weyland", "Dunder Mifflin", "Pied Piper", "Virtucon", "Gekko", "Zorg",
+]
+CATEGORIES = [
+    (product["en"].lower().replace(" ", "-"), part["en"].replace(" ", "-"))
+    for _, product in PRODUCTS for part in PARTS
+]
+STORY_TYPES = ("repair", "maintenance", "modification", "diagnosis")
+GUIDE_PRIMARY_TYPES = ("manual", "tutorial", "specification", "documentation")
+GUIDE_SECONDARY_TYPES = ("repair", "maintenance")
+RELATIONSHIP_TYPES = ("has_component", "compatible_with", "replaces", "made_from")
+
+def zipf_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative Zipf weights: the k-th item is chosen in proportion to 1/k^exponent."""
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+MANUFACTURER_WEIGHTS = zipf_weights(len(MANUFACTURERS))
+CATEGORY_WEIGHTS = zipf_weights(len(CATEGORIES))
+
+class Dataset:
+    """Sizes and seed of a dataset; ids and timestamps are pure functions of them."""
+
+    def __init__(self, things: int, stories: int, guides: int, seed: int, degree_exponent: float):
+        self.counts = {
+            ExportCollection.THINGS: things,
+            ExportCollection.STORIES: stories,
+            ExportCollection.GUIDES: guides,
+        }
+        self.seed = seed
+        self.degree_exponent = degree_exponent
+
+    def entity_id(self, kind: str, n: int) -> str:
+        return str(uuid.uuid5(ID_NAMESPACE, f"{self.seed}:{kind}:{n}"))
+
+    def created_at(self, collection: ExportCollection, n: int) -> str:
+        """Creation times grow with the row number across the dataset's time span."""
+        offset = SPAN * (n / max(1, self.counts.get(collection, self.counts[ExportCollection.THINGS])))
+        return (START + offset).isoformat()
+
+    def popular_thing(self, rng: random.Random, skew: float = 3.0) -> int:
+        """A thing number skewed towards low numbers, which therefore become hubs."""
+        return int(self.counts[ExportCollection.THINGS] * rng.random() ** skew)
+
+def translated(rng: random.Random, texts: Dict[str, str]) -> Dict[str, Any]:
+    """Multilingual text with the English default and a random subset of the other languages."""
+    languages = [language for language in LANGUAGES if language in texts]
+    chosen = rng.sample(languages, rng.randint(min(1, len(languages)), len(languages)))
+    return {"default": texts["en"], "translations": {language: texts[language] for language in sorted(chosen)}}
+
+def step_text(verb: Dict[str, str], part: Dict[str, str]) -> Dict[str, str]:
+    texts = {}
+    for language, pattern in STEP_PATTERNS.items():
+        text = pattern.format(verb=verb[language], part=part[language])
+        texts[language] = text[0].upper() + text[1:]
+    return texts
+
+def procedure(rng: random.Random) -> List[Dict[str, Any]]:
+    """Log-normal number of steps: a median of about eight with a long tail."""
+    steps = min(MAX_STEPS, max(1, int(rng.lognormvariate(math.log(8), 0.8))))
+    return [
+        {
+            "order": order,
+            "description": translated(rng, step_text(rng.choice(VERBS), rng.choice(PARTS))),
+            "warnings": [rng.choice(WARNINGS)] if rng.random() < 0.15 else [],
+            "tools": rng.sample(TOOLS, rng.randint(0, 2)),
+            "media": [],
+        }
+        for order in range(1, steps + 1)
+    ]
+
+def category(rng: random.Random) -> Dict[str, Any]:
+    name, subcategory = rng.choices(CATEGORIES, cum_weights=CATEGORY_WEIGHTS)[0]
+    return {"category": name, "subcategory": subcategory}
+
+def things(dataset: Dataset, rng: random.Random, first: int, last: int) -> Iterator[Dict[str, Any]]:
+    for n in range(first, last):
+        thing_type, names = rng.choice(PRODUCTS)
+        line = rng.choice(PRODUCT_LINES)
+        code = f"{line[:2].upper()}-{n:08d}"
+        manufacturer = rng.choices(MANUFACTURERS, cum_weights=MANUFACTURER_WEIGHTS)[0]
+        yield {
+            "id": dataset.entity_id("thing", n),
+            "type": thing_type,
+            "name": translated(rng, {language: f"{name} {line} {code}" for language, name in names.items()}),
+            "manufacturer": {
+                "name": manufacturer,
+                "website": f"https://{manufacturer.lower().replace(' ', '-')}.example",
+            },
+            "properties": {
+                "dimensions": {
+                    "width": round(rng.uniform(5, 80), 1),
+                    "height": round(rng.uniform(5, 120), 1),
+                    "depth": round(rng.uniform(5, 60), 1),
+                },
+                "materials": rng.sample(["steel", "plastic", "aluminium", "glass", "copper", "rubber"], 2),
+                "serial_number": f"SN{rng.getrandbits(40):012X}",
+            },
+            "created_at": dataset.created_at(ExportCollection.THINGS, n),
+        }
+
+def stories(dataset: Dataset, rng: random.Random, first: int, last: int) -> Iterator[Dict[str, Any]]:
+    for n in range(first, last):
+        yield {
+            "id": dataset.entity_id("story", n),
+            "thing_id": dataset.entity_id("thing", dataset.popular_thing(rng, skew=2.0)),
+            "thing_category": category(rng),
+            "type": rng.choice(STORY_TYPES),
+            "procedure": procedure(rng),
+            "created_at": dataset.created_at(ExportCollection.STORIES, n),
+        }
+
+def guides(dataset: Dataset, rng: random.Random, first: int, last: int) -> Iterator[Dict[str, Any]]:
+    for n in range(first, last):
+        verb, part = rng.choice(VERBS), rng.choice(PARTS)
+        steps = procedure(rng)
+        yield {
+            "id": dataset.entity_id("guide", n),
+            "thing_id": dataset.entity_id("thing", dataset.popular_thing(rng, skew=2.0)),
+            "thing_category": category(rng),
+            "type": {"primary": rng.choice(GUIDE_PRIMARY_TYPES), "secondary": rng.choice(GUIDE_SECONDARY_TYPES)},
+            "content": {
+                "title": translated(rng, step_text(verb, part)),
+                "summary": {"default": f"{len(steps)} steps, about {len(steps) * 5} minutes", "translations": {}},
+                "requirements": {"tools": sorted({tool for step in steps for tool in step["tools"]})},
+                "procedure": [{"order": step["order"], "description": step["description"]} for step in steps],
+            },
+            "created_at": dataset.created_at(ExportCollection.GUIDES, n),
+        }
+
+def relationships(dataset: Dataset, rng: random.Random, first: int, last: int) -> Iterator[Dict[str, Any]]:
+    """Outgoing relationships of things first..last, a power-law number each."""
+    stories_count = dataset.counts[ExportCollection.STORIES]
+    guides_count = dataset.counts[ExportCollection.GUIDES]
+    for n in range(first, last):
+        degree = min(MAX_RELATIONSHIPS, int(rng.paretovariate(dataset.degree_exponent)))
+        for k in range(degree):
+            target_type, target = "thing", dataset.popular_thing(rng)
+            roll = rng.random()
+            if roll < 0.1 and stories_count:
+                target_type, target = "story", rng.randrange(stories_count)
+            elif roll < 0.2 and guides_count:
+                target_type, target = "guide", rng.randrange(guides_count)
+            yield {
+                "id": dataset.entity_id("relationship", n * MAX_RELATIONSHIPS + k),
+                "source_type": "thing",
+                "source_id": dataset.entity_id("thing", n),
+                "target_type": target_type,
+                "target_id": dataset.entity_id(target_type, target),
+                "relationship_type": rng.choice(RELATIONSHIP_TYPES) if target_type == "thing" else "documented_by",
+                "direction": "bidirectional" if rng.random() < 0.3 else "unidirectional",
+                "metadata": {"quantity": rng.randint(1, 4)} if target_type == "thing" else None,
+                "created_at": dataset.created_at(ExportCollection.THINGS, n),
+            }
+
+GENERATORS = {
+    ExportCollection.THINGS: things,
+    ExportCollection.STORIES: stories,
+    ExportCollection.GUIDES: guides,
+    ExportCollection.RELATIONSHIPS: relationships,
+}
+# Collections loaded together; each phase only references rows of earlier phases
+PHASES = [
+    [ExportCollection.THINGS],
+    [ExportCollection.STORIES, ExportCollection.GUIDES],
+    [ExportCollection.RELATIONSHIPS],
+]
+
+async def load(collection: ExportCollection, records: Iterator[Dict[str, Any]]) -> Tuple[int, int]:
+    """Load records through the bulk importer; returns (inserted, rejected)."""
+    from app.database import AsyncSessionLocal, async_engine
+    from app.importer import import_records
+
+    async def numbered():
+        for line, record in enumerate(records, 1):
+            yield line, record
+
+    try:
+        async with AsyncSessionLocal() as db:
+            report = await import_records(db, collection, numbered())
+    finally:
+        # Connections belong to this shard's event loop
+        await async_engine.dispose()
+    for rejection in report.rejections[:5]:
+        print(f"  {collection.value} line {rejection.line}: {rejection.error}", file=sys.stderr)
+    return report.inserted, report.rejected
+
+def generate_shard(task: Tuple[Dataset, ExportCollection, int, Optional[Path]]) -> Tuple[str, int, int]:
+    """Generate one shard into a file or the database; returns (collection, rows, rejected)."""
+    dataset, collection, shard, output_dir = task
+    rng = random.Random(f"{dataset.seed}:{collection.value}:{shard}")
+    total = dataset.counts.get(collection, dataset.counts[ExportCollection.THINGS])
+    first, last = shard * SHARD_SIZE, min((shard + 1) * SHARD_SIZE, total)
+    records = GENERATORS[collection](dataset, rng, first, last)
+
+    if output_dir is None:
+        inserted, rejected = asyncio.run(load(collection, records))
+        return collection.value, inserted, rejected
+
+    rows = 0
+    with open(output_dir / f"{collection.value}-{shard:05d}.ndjson", "wb") as f:
+        for record in records:
+            f.write(dumps(record) + b"\n")
+            rows += 1
+    return collection.value, rows, 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--things", type=int, default=100_000, help="Number of things (default: 100000)")
+    parser.add_argument("--stories", type=int, help="Number of stories (default: half the things)")
+    parser.add_argument("--guides", type=int, help="Number of guides (default: a quarter of the things)")
+    parser.add_argument("--degree-exponent", type=float, default=1.5,
+                        help="Power-law exponent of relationships per thing; lower means more hubs (default: 1.5)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (default: CPU count)")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--output-dir", type=Path, help="Write NDJSON files, one per collection and shard")
+    target.add_argument("--database", action="store_true", help="Load into the configured database")
+    args = parser.parse_args()
+
+    dataset = Dataset(
+        things=args.things,
+        stories=args.stories if args.stories is not None else args.things // 2,
+        guides=args.guides if args.guides is not None else args.things // 4,
+        seed=args.seed,
+        degree_exponent=args.degree_exponent,
+    )
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    totals: Dict[str, List[int]] = {}
+    # Spawned workers open their own database connections instead of inheriting the parent's
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        for phase in PHASES:
+            started = time.perf_counter()
+            tasks = [
+                (dataset, collection, shard, args.output_dir)
+                for collection in phase
+                for shard in range(math.ceil(dataset.counts.get(collection, args.things) / SHARD_SIZE))
+            ]
+            for collection, rows, rejected in pool.imap_unordered(generate_shard, tasks):
+                counts = totals.setdefault(collection, [0, 0])
+                counts[0] += rows
+                counts[1] += rejected
+            names = ", ".join(f"{collection.value}: {totals.get(collection.value, [0])[0]}" for collection in phase)
+            print(f"{names} ({time.perf_counter() - started:.1f}s)")
+
+    rejected = sum(counts[1] for counts in totals.values())
+    if rejected:
+        print(f"{rejected} rows rejected")
+    return 1 if rejected else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Bulk import NDJSON or CSV files straight into the ThingData database
+
+Uses the same validation and COPY-based loader as the admin import endpoint,
+without going through HTTP. Load collections in dependency order: things
+first, then stories and guides, then relationships.
+
+Usage:
+    From project root: python scripts/import_data.py things data/things.ndjson
+    CSV input:         python scripts/import_data.py guides data/guides.csv --format csv
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import aiofiles
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import AsyncSessionLocal, async_engine  # noqa: E402
+from app.importer import IMPORT_CHUNK_SIZE, import_records, reader_for  # noqa: E402
+from app.schemas import ExportCollection, ImportFormat  # noqa: E402
+
+READ_SIZE = 1024 * 1024
+
+async def read_file(path: Path):
+    """Yield the contents of a file in chunks."""
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(READ_SIZE):
+            yield chunk
+
+async def run(collection: ExportCollection, paths, import_format: ImportFormat, chunk_size: int) -> int:
+    rejected = 0
+    try:
+        for path in paths:
+            async with AsyncSessionLocal() as db:
+                report = await import_records(
+                    db, collection, reader_for(import_format)(read_file(path)), chunk_size
+                )
+            print(f"{path}: {report.inserted} inserted, {report.skipped} skipped, "
+                  f"{report.rejected} rejected of {report.received}")
+            for rejection in report.rejections:
+                print(f"  line {rejection.line}: {rejection.error}")
+            rejected += report.rejected
+    finally:
+        await async_engine.dispose()
+    return rejected
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("collection", type=ExportCollection, choices=list(ExportCollection))
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--format", dest="import_format", type=ImportFormat,
+                        choices=list(ImportFormat), default=None,
+                        help="Input format (default: from the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help="Rows loaded per transaction")
+    args = parser.parse_args()
+
+    import_format = args.import_format
+    if import_format is None:
+        import_format = ImportFormat.CSV if args.files[0].suffix == ".csv" else ImportFormat.NDJSON
+
+    rejected = asyncio.run(run(args.collection, args.files, import_format, args.chunk_size))
+    sys.exit(1 if rejected else 0)
+
+if __name__ == "__main__":
+    main()
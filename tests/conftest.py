@@ -0,0 +1,37 @@
+import os
+
+import pytest
+from sqlalchemy import text
+
+# Fail any request that repeats a statement, so N+1 queries show up as test failures
+os.environ.setdefault("REPEATED_QUERY_MODE", "raise")
+
+import app.models  # noqa: F401  (registers the tables on Base.metadata)
+from app.database import Base, engine
+from app.migrations import upgrade
+from app.migrations.runner import MIGRATIONS_TABLE
+
+def drop_schema(bind=engine):
+    """Drop everything the migrations create."""
+    Base.metadata.drop_all(bind=bind)
+    with bind.begin() as connection:
+        connection.execute(text(f"DROP TABLE IF EXISTS {MIGRATIONS_TABLE}"))
+        for table in ("things", "stories", "guides"):
+            connection.execute(text(f"DROP FUNCTION IF EXISTS {table}_search_vectors()"))
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    """Database with the schema built by the migrations, dropped after the session."""
+    drop_schema()
+    upgrade(engine)
+    yield engine
+    drop_schema()
+
+@pytest.fixture(scope="session")
+def truncate_tables(migrated_database):
+    """Function removing all rows while keeping the schema."""
+    def truncate():
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        with migrated_database.begin() as connection:
+            connection.execute(text(f"TRUNCATE {tables}"))
+    return truncate
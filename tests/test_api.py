@@ -1,22 +1,30 @@
 import pytest
 from fastapi.testclient import TestClient
+import asyncio
+import json
 import uuid
 from datetime import datetime
+from functools import partial
 
+import app.main as main
 from app.main import app, get_db
-from app.database import Base, engine, SessionLocal
+from app.cache import EntityCache, InMemoryRedis
+from app.config import get_settings
+from app.database import SessionLocal
+from app.graph_index import GraphIndex, graph_index
+from app.importer import import_records
+from app.models import Relationship
+from app.version import VERSION
 
 @pytest.fixture(scope="module")
-def test_client():
+def test_client(migrated_database, truncate_tables):
     """Create test client."""
-    # Set up test database
-    Base.metadata.create_all(bind=engine)
-    
-    client = TestClient(app)
-    yield client
+    # Keep one event loop for the whole module so pooled async connections stay usable
+    with TestClient(app) as client:
+        yield client
     
     # Clean up
-    Base.metadata.drop_all(bind=engine)
+    truncate_tables()
 
 @pytest.fixture
 def test_db():
@@ -30,9 +38,10 @@ def test_db():
 @pytest.fixture
 def test_thing_data():
     return {
-        "type": "appliance",
+        "type": "device",
         "name": {
-            "default": "Coffee Machine",
+            # The URI is built from the name, so every test gets its own
+            "default": f"Coffee Machine {uuid.uuid4()}",
             "translations": {
                 "es": "Máquina de Café",
                 "de": "Kaffeemaschine"
@@ -69,6 +78,45 @@ def test_health_check(test_client):
     assert "components" in data
     assert "metrics" in data
 
+def test_health_probes(test_client, monkeypatch):
+    """Test the probes and the health report are served from the background sample."""
+    assert test_client.get("/health/live").json() == {"status": "alive"}
+    assert test_client.get("/health/ready").json() == {"status": "ready"}
+
+    health = test_client.get("/health").json()
+    assert health["version"] == VERSION
+    assert health["metrics"]["active_connections"] >= 1
+    assert health["metrics"]["federation_peers"] is None
+
+    # A stale sample, as left by a stuck sampler, takes the instance out of rotation
+    monkeypatch.setattr(main.health_checker, "last_check", main.health_checker.last_check - 3600)
+    response = test_client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["detail"] == "Health sample is out of date"
+
+def test_metrics_endpoint(test_client, monkeypatch):
+    """Test /metrics exposes request, pool and cache metrics in Prometheus text format."""
+    monkeypatch.setattr(main, "entity_cache", EntityCache())
+    thing = test_client.post("/api/v1/things", json={
+        "type": "device",
+        "name": {"default": "Metrics Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }).json()
+    test_client.get(f"/api/v1/things/{thing['id']}")
+    test_client.get(f"/api/v1/things/{thing['id']}")
+
+    response = test_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert any(
+        line.startswith('thingdata_http_requests_total{method="GET",route="/api/v1/things/{thing_id}",status="200"}')
+        for line in lines
+    )
+    assert 'thingdata_http_requests_in_flight 1' in lines
+    assert any(line.startswith('thingdata_db_pool_checkout_seconds_count{pool="async"}') for line in lines)
+    assert 'thingdata_cache_hit_ratio 0.5' in lines
+
 def test_create_thing(test_client, test_thing_data):
     """Test creating a new thing."""
     response = test_client.post("/api/v1/things", json=test_thing_data)
@@ -128,13 +176,18 @@ def test_create_relationship(test_client, test_thing_data):
     """Test creating a relationship between things."""
     # Create two things
     thing1 = test_client.post("/api/v1/things", json=test_thing_data).json()
-    thing2 = test_client.post("/api/v1/things", json=test_thing_data).json()
+    thing2 = test_client.post("/api/v1/things", json={
+        **test_thing_data, "name": {"default": f"{test_thing_data['name']['default']} lid"}
+    }).json()
 
     relationship_data = {
-        "thing_id": thing1["id"],
+        "source_type": "thing",
+        "source_id": thing1["id"],
+        "target_type": "thing",
+        "target_id": thing2["id"],
         "relationship_type": "has_component",
-        "target_uri": thing2["id"],
-        "relation_metadata": {
+        "direction": "unidirectional",
+        "metadata": {
             "position": "top",
             "removable": True
         }
@@ -143,5 +196,550 @@ def test_create_relationship(test_client, test_thing_data):
     response = test_client.post("/api/v1/relationships", json=relationship_data)
     assert response.status_code == 200
     data = response.json()
-    assert data["thing_id"] == thing1["id"]
-    assert data["target_uri"] == thing2["id"]
\ No newline at end of file
+    assert data["source_id"] == thing1["id"]
+    assert data["target_id"] == thing2["id"]
+
+
+@pytest.fixture
+def device_data():
+    """Valid thing payloads for tests creating several things; each call gets a unique name and URI."""
+    return lambda: {
+        "type": "device",
+        "name": {"default": f"Kettle {uuid.uuid4()}"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }
+
+@pytest.fixture(params=["database", "graph_index"])
+def graph_source(request):
+    """Serve relationship lookups from the database, or from an index kept current by the write paths."""
+    if request.param == "graph_index":
+        graph_index.index = GraphIndex()
+    yield request.param
+    graph_index.index = None
+
+def test_list_things_includes_relationships(test_client, device_data, graph_source):
+    """Test that list pages embed the relationships of every row."""
+    thing1 = test_client.post("/api/v1/things", json=device_data()).json()
+    thing2 = test_client.post("/api/v1/things", json=device_data()).json()
+    relationship = test_client.post("/api/v1/relationships", json={
+        "source_type": "thing",
+        "source_id": thing1["id"],
+        "target_type": "thing",
+        "target_id": thing2["id"],
+        "relationship_type": "has_component",
+        "direction": "unidirectional"
+    }).json()
+
+    response = test_client.get("/api/v1/things", params={"limit": 1000})
+    assert response.status_code == 200
+    things = {thing["id"]: thing for thing in response.json()}
+    assert [r["id"] for r in things[thing1["id"]]["relationships"]] == [relationship["id"]]
+    assert [r["id"] for r in things[thing2["id"]]["relationships"]] == [relationship["id"]]
+
+def test_list_things_cursor_pagination(test_client, device_data):
+    """Test walking the thing list with cursors visits every row once."""
+    created = {test_client.post("/api/v1/things", json=device_data()).json()["id"] for _ in range(3)}
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = test_client.get("/api/v1/things", params=params)
+        assert response.status_code == 200
+        seen.extend(thing["id"] for thing in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params = {"limit": 2, "cursor": next_cursor}
+
+    assert len(seen) == len(set(seen))
+    assert created <= set(seen)
+
+def test_list_things_invalid_cursor(test_client):
+    """Test that a malformed cursor is rejected."""
+    response = test_client.get("/api/v1/things", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("path", ["/api/v1/things", "/api/v1/stories", "/api/v1/relationships", "/api/v1/guides"])
+@pytest.mark.parametrize("params", [{"limit": 0}, {"limit": -1}, {"limit": 1001}, {"skip": -1}])
+def test_list_rejects_invalid_page_parameters(test_client, path, params):
+    """Test that out-of-range limit and skip values are rejected instead of failing the query."""
+    assert test_client.get(path, params=params).status_code == 422
+
+def test_create_relationship_keeps_metadata(test_client, device_data):
+    """Test that relationship metadata is stored and returned."""
+    thing1 = test_client.post("/api/v1/things", json=device_data()).json()
+    thing2 = test_client.post("/api/v1/things", json=device_data()).json()
+    response = test_client.post("/api/v1/relationships", json={
+        "source_type": "thing",
+        "source_id": thing1["id"],
+        "target_type": "thing",
+        "target_id": thing2["id"],
+        "relationship_type": "has_component",
+        "direction": "bidirectional",
+        "metadata": {"position": "top", "removable": True}
+    })
+    assert response.status_code == 200
+    relationship_id = response.json()["id"]
+
+    response = test_client.get(f"/api/v1/relationships/{relationship_id}")
+    assert response.status_code == 200
+    assert response.json()["metadata"] == {"position": "top", "removable": True}
+
+def test_create_things_batch(test_client):
+    """Test batch creation reports a result for every item."""
+    valid = {
+        "type": "device",
+        "name": {"default": "Batch Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }
+    invalid = {**valid, "type": "appliance"}
+    response = test_client.post("/api/v1/things/batch", json=[valid, invalid, valid])
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 1
+    assert data["failed"] == 2
+    statuses = [result["status"] for result in data["results"]]
+    assert statuses == ["created", "failed", "failed"]
+    assert "Invalid thing type" in data["results"][1]["error"]
+
+    thing_id = data["results"][0]["id"]
+    assert test_client.get(f"/api/v1/things/{thing_id}").status_code == 200
+
+def test_create_batch_with_malformed_item(test_client):
+    """Test that a structurally invalid item fails on its own while the valid items are created."""
+    kettle = {
+        "type": "device",
+        "name": {"default": "First Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }
+    malformed = {"type": "device", "name": {"default": "Kettle"}}
+    items = [kettle, malformed, "kettle", {**kettle, "name": {"default": "Second Kettle"}}]
+    response = test_client.post("/api/v1/things/batch", json=items)
+    assert response.status_code == 200
+    data = response.json()
+    assert (data["created"], data["failed"]) == (2, 2)
+    assert [result["status"] for result in data["results"]] == ["created", "failed", "failed", "created"]
+    assert data["results"][1]["error"] == "manufacturer: Field required"
+    for result in (data["results"][0], data["results"][3]):
+        assert test_client.get(f"/api/v1/things/{result['id']}").status_code == 200
+
+def test_create_stories_batch_unknown_thing(test_client):
+    """Test that batch stories referencing missing things fail individually."""
+    thing = test_client.post("/api/v1/things", json={
+        "type": "device",
+        "name": {"default": "Story Batch Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }).json()
+    story = {
+        "type": "repair",
+        "procedure": [{"order": 1, "description": {"default": "Descale"}}]
+    }
+    response = test_client.post("/api/v1/stories/batch", json=[
+        {**story, "thing_id": thing["id"]},
+        {**story, "thing_id": str(uuid.uuid4())}
+    ])
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == "created"
+    assert results[1]["status"] == "failed"
+    assert "not found" in results[1]["error"]
+
+def test_create_rejects_unsafe_documents(test_client):
+    """Test that type allow-lists and depth limits are enforced while parsing, with 400 for single creates."""
+    def nested(depth):
+        value = "deep"
+        for _ in range(depth):
+            value = [value]
+        return value
+
+    # The procedure list sits at depth 2, each step at 3 and its "notes" at 4
+    guide = {
+        "type": {"primary": "manual"},
+        "content": {"title": {"default": "Descaling"}, "procedure": [{"notes": nested(16)}]}
+    }
+    assert test_client.post("/api/v1/guides", json=guide).status_code == 200
+
+    too_deep = {**guide, "content": {**guide["content"], "procedure": [{"notes": nested(17)}]}}
+    response = test_client.post("/api/v1/guides", json=too_deep)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "JSON structure too deep"
+
+    response = test_client.post("/api/v1/guides", json={**guide, "type": {"primary": "poster"}})
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Invalid guide primary type")
+
+    response = test_client.post("/api/v1/guides/batch", json=[guide, too_deep])
+    assert response.status_code == 200
+    assert [result["error"] for result in response.json()["results"]] == [None, "JSON structure too deep"]
+
+    # Structural errors are still reported as usual
+    assert test_client.post("/api/v1/guides", json={"type": {"primary": "manual"}}).status_code == 422
+
+def test_export_things_ndjson(test_client):
+    """Test streaming export emits one JSON document per line."""
+    thing = test_client.post("/api/v1/things", json={
+        "type": "device",
+        "name": {"default": "Export Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }).json()
+
+    response = test_client.get("/api/v1/export/things")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert thing["id"] in {row["id"] for row in rows}
+
+    response = test_client.get("/api/v1/export/things", params={"updated_since": "2999-01-01T00:00:00Z"})
+    assert response.status_code == 200
+    assert response.text == ""
+
+@pytest.fixture
+def admin_headers(monkeypatch):
+    """Enable the admin API for one test."""
+    monkeypatch.setattr(get_settings(), "ADMIN_TOKEN", "test-admin-token")
+    return {"X-Admin-Token": "test-admin-token"}
+
+def test_import_requires_admin_token(test_client):
+    """Test that the import endpoint rejects requests without the admin token."""
+    response = test_client.post(
+        "/api/v1/admin/import/things",
+        content=b"",
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code in (401, 403)
+
+def test_import_things_ndjson(test_client, admin_headers):
+    """Test NDJSON import loads valid rows and reports rejected ones."""
+    kettle = {
+        "type": "device",
+        "name": {"default": "Existing Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }
+    existing = test_client.post("/api/v1/things", json=kettle).json()
+    new_id = str(uuid.uuid4())
+    lines = [
+        json.dumps({
+            **kettle, "name": {"default": "Imported Kettle"}, "id": new_id, "created_at": "2024-12-01T10:00:00Z"
+        }),
+        "{not json",
+        json.dumps({**kettle, "type": "appliance"}),
+        json.dumps(existing),
+    ]
+    response = test_client.post(
+        "/api/v1/admin/import/things",
+        content="\n".join(lines).encode(),
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["received"] == 4
+    assert report["inserted"] == 1
+    assert report["skipped"] == 1
+    assert report["rejected"] == 2
+    assert [rejection["line"] for rejection in report["rejections"]] == [2, 3]
+
+    thing = test_client.get(f"/api/v1/things/{new_id}").json()
+    assert thing["created_at"].startswith("2024-12-01T10:00:00")
+
+def test_import_stories_csv(test_client, admin_headers):
+    """Test CSV import decodes JSON cells and rejects rows with missing things."""
+    thing = test_client.post("/api/v1/things", json={
+        "type": "device",
+        "name": {"default": "CSV Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }).json()
+    # Indented JSON makes the quoted cell span several lines
+    procedure = json.dumps([{"order": 1, "description": {"default": "Replace fuse, then test"}}], indent=2)
+    quoted = '"' + procedure.replace('"', '""') + '"'
+    csv_body = "\n".join([
+        "thing_id,type,procedure",
+        f"{thing['id']},repair,{quoted}",
+        f"{uuid.uuid4()},repair,{quoted}",
+    ])
+    response = test_client.post(
+        "/api/v1/admin/import/stories",
+        content=csv_body.encode(),
+        headers={**admin_headers, "Content-Type": "text/csv"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 1
+    assert report["rejected"] == 1
+    assert report["rejections"][0]["line"] == 3 + procedure.count("\n")
+
+def test_import_rejects_mistyped_preserved_columns(test_client, admin_headers):
+    """Test preserved ids and versions of the wrong type are rejected by line instead of failing the import."""
+    kettle = {
+        "type": "device",
+        "name": {"default": "Mistyped Import Kettle"},
+        "manufacturer": {"name": "BaristaPlus"}
+    }
+    story = {"type": "repair", "procedure": [{"order": 1, "description": {"default": "Descale"}}]}
+    lines = [
+        json.dumps({**kettle, "id": 5}),
+        json.dumps({**kettle, "uri": ["thing:kettle"]}),
+        json.dumps(kettle),
+    ]
+    response = test_client.post(
+        "/api/v1/admin/import/things",
+        content="\n".join(lines).encode(),
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 1
+    assert [(rejection["line"], rejection["error"]) for rejection in report["rejections"]] == [
+        (1, "id: must be a string"), (2, "uri: must be a string")
+    ]
+
+    response = test_client.post(
+        "/api/v1/admin/import/stories",
+        content=json.dumps({**story, "version": "1.0"}).encode(),
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.json()["rejections"] == [{"line": 1, "error": "version: must be a JSON object"}]
+
+def test_import_many_chunks(test_client, device_data, admin_headers, monkeypatch):
+    """Test that an import running the same statements for each chunk is not reported as an N+1 pattern."""
+    monkeypatch.setattr(main, "import_records", partial(import_records, chunk_size=2))
+    lines = [json.dumps(device_data()) for _ in range(2 * get_settings().REPEATED_QUERY_THRESHOLD + 2)]
+    response = test_client.post(
+        "/api/v1/admin/import/things",
+        content="\n".join(lines).encode(),
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json()["inserted"] == len(lines)
+
+def test_search_multilingual(test_client):
+    """Test search finds entities by stemmed default text and by translations."""
+    marker = uuid.uuid4().hex[:8]
+    thing = test_client.post("/api/v1/things", json={
+        "type": "device",
+        "name": {
+            "default": f"Espresso grinder {marker}",
+            "translations": {"de": f"Kaffeemühlen {marker}"}
+        },
+        "manufacturer": {"name": "BaristaPlus"}
+    }).json()
+    guide = test_client.post("/api/v1/guides", json={
+        "type": {"primary": "manual"},
+        "content": {"title": {"default": f"Cleaning grinders {marker}"}}
+    }).json()
+
+    response = test_client.get("/api/v1/search", params={"q": f"grinder {marker}"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert {(r["entity_type"], r["id"]) for r in results} == {("thing", thing["id"]), ("guide", guide["id"])}
+
+    response = test_client.get("/api/v1/search", params={"q": f"Kaffeemühle {marker}", "lang": "de", "types": "thing"})
+    assert [r["id"] for r in response.json()["results"]] == [thing["id"]]
+
+def test_graph_traversal(test_client, device_data, graph_source):
+    """Test the graph endpoint walks edges by depth, direction and type, stopping at cycles."""
+    kettle, lid, hinge = (test_client.post("/api/v1/things", json=device_data()).json()["id"] for _ in range(3))
+    guide = test_client.post("/api/v1/guides", json={
+        "type": {"primary": "manual"},
+        "content": {"title": {"default": "Replacing the lid"}}
+    }).json()["id"]
+
+    def link(source_type, source_id, target_type, target_id, relationship_type):
+        return test_client.post("/api/v1/relationships", json={
+            "source_type": source_type,
+            "source_id": source_id,
+            "target_type": target_type,
+            "target_id": target_id,
+            "relationship_type": relationship_type,
+            "direction": "unidirectional"
+        }).json()["id"]
+
+    link("thing", kettle, "thing", lid, "has_component")
+    link("thing", lid, "thing", hinge, "has_component")
+    link("guide", guide, "thing", lid, "repairs")
+    response = test_client.post("/api/v1/relationships/batch", json=[{
+        "source_type": "thing",
+        "source_id": hinge,
+        "target_type": "thing",
+        "target_id": kettle,
+        "relationship_type": "fits",
+        "direction": "unidirectional"
+    }])
+    assert response.json()["created"] == 1
+
+    response = test_client.get(f"/api/v1/graph/thing/{kettle}", params={"depth": 1})
+    assert response.status_code == 200
+    graph = response.json()
+    assert graph["root"]["id"] == kettle
+    assert {(node["id"], node["depth"]) for node in graph["nodes"]} == {(kettle, 0), (lid, 1), (hinge, 1)}
+
+    graph = test_client.get(
+        f"/api/v1/graph/thing/{kettle}", params={"depth": 3, "direction": "outgoing", "types": "has_component"}
+    ).json()
+    assert {node["id"] for node in graph["nodes"]} == {kettle, lid, hinge}
+    assert len(graph["edges"]) == 2
+
+    graph = test_client.get(f"/api/v1/graph/thing/{kettle}", params={"depth": 3}).json()
+    nodes = {node["id"]: node for node in graph["nodes"]}
+    assert nodes[guide]["depth"] == 2
+    assert nodes[guide]["entity"]["content"]["title"]["default"] == "Replacing the lid"
+    assert len(graph["edges"]) == 4
+
+    assert test_client.get(f"/api/v1/graph/thing/{uuid.uuid4()}").status_code == 404
+
+def test_conditional_get(test_client, device_data):
+    """Test that entity GETs answer 304 to current validators and change when relationships do."""
+    kettle = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    lid = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+
+    response = test_client.get(f"/api/v1/things/{kettle}")
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert etag.startswith('"')
+
+    response = test_client.get(f"/api/v1/things/{kettle}", headers={"If-None-Match": f'"stale", W/{etag}'})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert test_client.get(
+        f"/api/v1/things/{kettle}", headers={"If-Modified-Since": last_modified}
+    ).status_code == 304
+    assert test_client.get(
+        f"/api/v1/things/{kettle}", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}
+    ).status_code == 200
+
+    relationship = test_client.post("/api/v1/relationships", json={
+        "source_type": "thing",
+        "source_id": kettle,
+        "target_type": "thing",
+        "target_id": lid,
+        "relationship_type": "has_component",
+        "direction": "unidirectional"
+    }).json()["id"]
+    response = test_client.get(f"/api/v1/things/{kettle}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [r["id"] for r in response.json()["relationships"]] == [relationship]
+
+    etag = test_client.get(f"/api/v1/relationships/{relationship}").headers["ETag"]
+    assert test_client.get(
+        f"/api/v1/relationships/{relationship}", headers={"If-None-Match": etag}
+    ).status_code == 304
+    assert test_client.get(
+        f"/api/v1/things/{uuid.uuid4()}", headers={"If-None-Match": "*"}
+    ).status_code == 404
+
+def test_conditional_get_ignores_stale_graph_index(test_client, device_data, monkeypatch):
+    """Test that a relationship the local graph index has not seen changes both the ETag and the body."""
+    cache = EntityCache(shared=InMemoryRedis())
+    monkeypatch.setattr(main, "entity_cache", cache)
+    monkeypatch.setattr(graph_index, "index", GraphIndex())
+    kettle = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    lid = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    etag = test_client.get(f"/api/v1/things/{kettle}").headers["ETag"]
+
+    # Written by another worker: the row and a cache invalidation, but no local index update
+    relationship = Relationship(**Relationship.values_from_create({
+        "source_type": "thing",
+        "source_id": kettle,
+        "target_type": "thing",
+        "target_id": lid,
+        "relationship_type": "has_component",
+        "direction": "unidirectional"
+    }))
+    with SessionLocal() as db:
+        db.add(relationship)
+        db.commit()
+        relationship_id = relationship.id
+    asyncio.run(cache.invalidate([("thing", kettle)]))
+
+    response = test_client.get(f"/api/v1/things/{kettle}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [r["id"] for r in response.json()["relationships"]] == [relationship_id]
+    cached = test_client.get(f"/api/v1/things/{kettle}")
+    assert cached.headers["ETag"] == response.headers["ETag"]
+    assert cached.json() == response.json()
+
+def test_entity_cache(test_client, device_data, monkeypatch):
+    """Test that entity GETs are served from the cache and relationship writes invalidate it."""
+    cache = EntityCache(shared=InMemoryRedis())
+    monkeypatch.setattr(main, "entity_cache", cache)
+    kettle = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    lid = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+
+    first = test_client.get(f"/api/v1/things/{kettle}")
+    second = test_client.get(f"/api/v1/things/{kettle}")
+    assert second.json() == first.json()
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert test_client.get(
+        f"/api/v1/things/{kettle}", headers={"If-None-Match": first.headers["ETag"]}
+    ).status_code == 304
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 2
+
+    response = test_client.post("/api/v1/relationships/batch", json=[{
+        "source_type": "thing",
+        "source_id": kettle,
+        "target_type": "thing",
+        "target_id": lid,
+        "relationship_type": "has_component",
+        "direction": "unidirectional"
+    }])
+    assert response.json()["created"] == 1
+    response = test_client.get(f"/api/v1/things/{kettle}")
+    assert len(response.json()["relationships"]) == 1
+    assert response.headers["ETag"] != first.headers["ETag"]
+    assert test_client.get(f"/api/v1/things/{uuid.uuid4()}").status_code == 404
+
+def test_fast_serialization_matches_validated_output(test_client, device_data, monkeypatch):
+    """Test that the fast serialization path returns the same documents and headers."""
+    kettle = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    lid = test_client.post("/api/v1/things", json=device_data()).json()["id"]
+    test_client.post("/api/v1/relationships", json={
+        "source_type": "thing",
+        "source_id": kettle,
+        "target_type": "thing",
+        "target_id": lid,
+        "relationship_type": "has_component",
+        "direction": "unidirectional"
+    })
+    # Returned without relationships, so the response model's default fills them in
+    story = test_client.post("/api/v1/stories", json={
+        "thing_id": kettle,
+        "type": "repair",
+        "procedure": [{"order": 1, "description": {"default": "Descale"}}]
+    }).json()["id"]
+    guide = test_client.post("/api/v1/guides", json={
+        "thing_id": kettle,
+        "type": {"primary": "manual"},
+        "content": {"title": {"default": "Descaling"}}
+    }).json()["id"]
+    for source_type, source_id in (("story", story), ("guide", guide)):
+        test_client.post("/api/v1/relationships", json={
+            "source_type": source_type,
+            "source_id": source_id,
+            "target_type": "thing",
+            "target_id": kettle,
+            "relationship_type": "describes",
+            "direction": "unidirectional",
+            "metadata": {"verified": True}
+        })
+    urls = [
+        f"/api/v1/things/{kettle}",
+        f"/api/v1/stories/{story}",
+        f"/api/v1/guides/{guide}",
+        "/api/v1/things?limit=1",
+        f"/api/v1/relationships?source_id={kettle}",
+        f"/api/v1/things/{kettle}/stories",
+    ]
+    validated = [test_client.get(url) for url in urls]
+    assert [len(response.json()["relationships"]) for response in validated[:3]] == [3, 1, 1]
+    assert validated[-1].json()[0]["relationships"] is None
+
+    monkeypatch.setattr(get_settings(), "FAST_SERIALIZATION", True)
+    for url, expected in zip(urls, validated):
+        response = test_client.get(url)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == expected.json()
+        for header in ("ETag", "X-Next-Cursor", "Link"):
+            assert response.headers.get(header) == expected.headers.get(header)
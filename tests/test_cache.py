@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app import cache as cache_module
+from app.cache import EntityCache, InMemoryRedis, LRUCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for TTL checks."""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_lru_evicts_least_recently_used():
+    """The oldest untouched entry goes first once the cache is full."""
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c"), len(cache)) == (1, 3, 2)
+
+def test_lru_expires_entries(clock):
+    """Entries are dropped once their TTL has passed."""
+    cache = LRUCache(max_entries=10, ttl=5)
+    cache.set("a", 1)
+    clock[0] += 4
+    assert cache.get("a") == 1
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+def test_shared_store_invalidates_across_processes(clock):
+    """A write in one process removes the entry another process would read from the shared store."""
+    shared = InMemoryRedis()
+    first = EntityCache(ttl=60, shared=shared, local_ttl=5)
+    second = EntityCache(ttl=60, shared=shared, local_ttl=5)
+
+    async def scenario():
+        await first.set("thing", "kettle", {"data": {"id": "kettle"}}, first.generation("thing", "kettle"))
+        assert await second.get("thing", "kettle") == {"data": {"id": "kettle"}}
+        assert second.stats() == {"hits": 1, "shared_hits": 1, "misses": 0, "entries": 1}
+
+        await first.invalidate([("thing", "kettle")])
+        assert await first.get("thing", "kettle") is None
+        # The second process still has its local copy until the local TTL runs out
+        assert await second.get("thing", "kettle") is not None
+        clock[0] += 6
+        assert await second.get("thing", "kettle") is None
+        assert second.stats()["misses"] == 1
+
+    asyncio.run(scenario())
+
+def test_set_skips_entries_invalidated_during_the_read():
+    """A response read before a concurrent write is not cached."""
+    cache = EntityCache()
+
+    async def scenario():
+        token = cache.generation("thing", "kettle")
+        await cache.invalidate([("thing", "kettle")])
+        await cache.set("thing", "kettle", {"data": "stale"}, token)
+        assert await cache.get("thing", "kettle") is None
+
+        token = cache.generation("thing", "kettle")
+        await cache.clear()
+        await cache.set("thing", "kettle", {"data": "stale"}, token)
+        assert await cache.get("thing", "kettle") is None
+
+    asyncio.run(scenario())
+
+def test_invalidation_tracking_is_bounded():
+    """Only the most recent invalidations are kept; reads older than a forgotten one are not cached."""
+    cache = EntityCache(max_entries=3)
+
+    async def scenario():
+        early = cache.generation("thing", "kettle")
+        await cache.invalidate([("thing", f"thing-{n}") for n in range(10)])
+        assert len(cache._invalidated) == 0
+        await cache.set("thing", "kettle", {"data": "unknown"}, early)
+        assert await cache.get("thing", "kettle") is None
+
+        token = cache.generation("thing", "kettle")
+        for n in range(5):
+            await cache.invalidate([("thing", f"lid-{n}")])
+        assert list(cache._invalidated) == [cache._key("thing", f"lid-{n}") for n in (2, 3, 4)]
+        await cache.set("thing", "kettle", {"data": "kettle"}, token)
+        assert await cache.get("thing", "kettle") is None
+
+        token = cache.generation("thing", "kettle")
+        await cache.invalidate([("thing", "lid-0")])
+        await cache.set("thing", "kettle", {"data": "kettle"}, token)
+        assert await cache.get("thing", "kettle") == {"data": "kettle"}
+
+    asyncio.run(scenario())
+
+def test_clear_empties_both_tiers():
+    """Clearing drops every entry, locally and in the shared store."""
+    shared = InMemoryRedis()
+    cache = EntityCache(shared=shared)
+
+    async def scenario():
+        for entity_id in ("kettle", "lid"):
+            await cache.set("thing", entity_id, {"data": entity_id}, cache.generation("thing", entity_id))
+        await shared.set("other:key", "kept")
+        await cache.clear()
+        assert await cache.get("thing", "kettle") is None
+        assert [key async for key in shared.scan_iter()] == ["other:key"]
+
+    asyncio.run(scenario())
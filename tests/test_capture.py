@@ -0,0 +1,65 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.capture import RequestCaptureMiddleware, body_shape, query_shape
+
+def test_body_shape_blanks_free_text():
+    """Types, ids and numbers survive; names, emails and other strings are reduced to their length."""
+    body = {
+        "type": "device",
+        "thing_id": "abc",
+        "name": {"default": "Kettle", "translations": {"de": "Wasserkocher"}},
+        "manufacturer": {"name": "Acme", "contact": "help@acme.example"},
+        "properties": {"dimensions": {"width": 20}, "materials": ["steel"]},
+    }
+    assert body_shape(body) == {
+        "type": "device",
+        "thing_id": "abc",
+        "name": {"default": "<str:6>", "translations": {"de": "<str:12>"}},
+        "manufacturer": {"name": "<str:4>", "contact": "<email>"},
+        "properties": {"dimensions": {"width": 20}, "materials": ["<str:5>"]},
+    }
+
+def test_query_shape_blanks_free_text():
+    """Parameter names, selectors and integers survive; search text and other values are reduced to their length."""
+    query = "q=espresso%20m%C3%A1quina&lang=es&types=thing,story&limit=20&category=kitchen&cursor=WyIy&contact=a@b.example"
+    assert query_shape(query) == (
+        "q=<str:16>&lang=es&types=thing,story&limit=20&category=<str:7>&cursor=<str:4>&contact=<email>"
+    )
+    assert query_shape("") == ""
+
+def make_client(sample_rate: float, records: list) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/api/v1/things")
+    async def create(body: dict):
+        return {"id": "1"}
+
+    @app.get("/health")
+    async def health():
+        return {}
+
+    app.add_middleware(RequestCaptureMiddleware, sample_rate=sample_rate, sink=records.append)
+    return TestClient(app)
+
+def test_sampled_api_requests_are_recorded():
+    records = []
+    client = make_client(1.0, records)
+    assert client.post("/api/v1/things?dry_run=1", json={"type": "tool", "name": "Drill"}).status_code == 200
+    client.get("/health")
+
+    [record] = records
+    assert record["method"] == "POST" and record["path"] == "/api/v1/things"
+    assert record["query"] == "dry_run=1" and record["status"] == 200
+    assert record["body"] == {"type": "tool", "name": "<str:5>"}
+
+def test_recorded_query_has_no_free_text():
+    records = []
+    make_client(1.0, records).post("/api/v1/things?dry_run=1&note=secret%20plan", json={})
+    [record] = records
+    assert record["query"] == "dry_run=1&note=<str:11>"
+
+def test_unsampled_requests_are_not_recorded():
+    records = []
+    make_client(0.0, records).post("/api/v1/things", json={})
+    assert records == []
@@ -0,0 +1,189 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from aiohttp import web
+
+from app.config import get_settings
+from app.federation import BATCH_ENVELOPE_BYTES, FederationManager, encode_event
+from app.schemas import ComponentStatus
+
+async def health(request):
+    return web.json_response({"status": "ok"})
+
+async def start_peer(app=None):
+    """Local peer serving app (health checks by default), returned with its base URL."""
+    if app is None:
+        app = web.Application()
+        app.router.add_get("/health", health)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_client_is_shared_and_closed_on_shutdown():
+    """Every call gets the same session until shutdown closes it."""
+    async def scenario():
+        manager = FederationManager()
+        session = manager._client()
+        assert manager._client() is session
+        await manager.shutdown()
+        assert session.closed
+        assert manager.session is None
+
+    asyncio.run(scenario())
+
+def test_requests_reuse_peer_connections():
+    """Repeated requests to a peer go over one kept-alive connection."""
+    async def scenario():
+        runner, base_url = await start_peer()
+        manager = FederationManager()
+        manager.known_instances[base_url] = SimpleNamespace(uri=base_url, endpoints={"health": f"{base_url}/health"})
+        try:
+            session = manager._client()
+            assert await manager.check_health() == ComponentStatus.HEALTHY
+            assert await manager.check_health() == ComponentStatus.HEALTHY
+            assert manager._client() is session
+            assert manager.connections == {("127.0.0.1", "created"): 1, ("127.0.0.1", "reused"): 1}
+        finally:
+            await manager.shutdown()
+            await runner.cleanup()
+        assert session.closed
+
+    asyncio.run(scenario())
+
+def event(uri, version=1, type="thing"):
+    return {"type": type, "uri": uri, "version": version}
+
+def queue_of(*events):
+    queue = asyncio.Queue()
+    for item in events:
+        queue.put_nowait(item)
+    return queue
+
+def test_batch_closes_at_count_limit(monkeypatch):
+    """A batch holds at most FEDERATION_BATCH_SIZE events; the rest wait for the next one."""
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_SIZE", 3)
+    async def scenario():
+        manager = FederationManager()
+        queue = queue_of(*(event(f"urn:thing:{n}") for n in range(5)))
+        first = await manager._next_batch("peer", queue)
+        second = await manager._next_batch("peer", queue)
+        return [item["uri"] for item in first], [item["uri"] for item in second]
+
+    first, second = asyncio.run(scenario())
+    assert first == ["urn:thing:0", "urn:thing:1", "urn:thing:2"]
+    assert second == ["urn:thing:3", "urn:thing:4"]
+
+def test_batch_closes_before_byte_limit(monkeypatch):
+    """An event that would take the body over FEDERATION_BATCH_BYTES starts the next batch."""
+    size = len(encode_event(event("urn:thing:0")))
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_BYTES", BATCH_ENVELOPE_BYTES + 2 * size + 1)
+    async def scenario():
+        manager = FederationManager()
+        queue = queue_of(*(event(f"urn:thing:{n}") for n in range(3)))
+        first = await manager._next_batch("peer", queue)
+        second = await manager._next_batch("peer", queue)
+        return [item["uri"] for item in first], [item["uri"] for item in second]
+
+    first, second = asyncio.run(scenario())
+    assert first == ["urn:thing:0", "urn:thing:1"]
+    assert second == ["urn:thing:2"]
+
+def test_batch_bytes_count_encoded_characters(monkeypatch):
+    """Multi-byte names count with their UTF-8 length, and sent bodies stay within the limit."""
+    named = [{**event(f"urn:thing:{n}"), "name": "Wasserkocher für Tee 水壶" * 5} for n in range(5)]
+    size = len(encode_event(named[0]))
+    assert size > len(json.dumps(named[0], ensure_ascii=False))
+    limit = BATCH_ENVELOPE_BYTES + 2 * size + 1
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_BYTES", limit)
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_LINGER_SECONDS", 0)
+    bodies = []
+
+    async def receive_batch(request):
+        bodies.append(await request.read())
+        return web.json_response({"received": len(json.loads(bodies[-1])["events"])})
+
+    async def no_auth(instance):
+        return {}
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_post("/batch", receive_batch)
+        runner, base_url = await start_peer(app)
+        manager = FederationManager()
+        manager.known_instances["peer"] = SimpleNamespace(uri="peer", endpoints={"batch": f"{base_url}/batch"})
+        monkeypatch.setattr(manager, "_prepare_auth_headers", no_auth)
+        queue = queue_of(*named)
+        try:
+            while queue.qsize() or manager.held_events:
+                await manager._send_batch("peer", await manager._next_batch("peer", queue))
+        finally:
+            await manager.shutdown()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+    assert [len(json.loads(body)["events"]) for body in bodies] == [2, 2, 1]
+    assert all(len(body) <= limit for body in bodies)
+    assert len(bodies[0]) == limit
+    assert json.loads(bodies[0])["events"][0] == named[0]
+
+def test_batch_lingers_for_late_events(monkeypatch):
+    """Events arriving within the linger time join the batch, which then closes."""
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_LINGER_SECONDS", 0.1)
+    async def scenario():
+        manager = FederationManager()
+        loop = asyncio.get_running_loop()
+        queue = queue_of(event("urn:thing:0"))
+        loop.call_later(0.02, queue.put_nowait, event("urn:thing:1"))
+        started = loop.time()
+        batch = await manager._next_batch("peer", queue)
+        return batch, loop.time() - started
+
+    batch, elapsed = asyncio.run(scenario())
+    assert [item["uri"] for item in batch] == ["urn:thing:0", "urn:thing:1"]
+    assert 0.1 <= elapsed < 1
+
+def test_batch_coalesces_events_for_the_same_entity(monkeypatch):
+    """Only the latest event per (type, uri) is kept, moved to the end of the batch."""
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_LINGER_SECONDS", 0)
+    unaddressed = [{"type": "ping"}, {"type": "ping"}]
+    async def scenario():
+        manager = FederationManager()
+        queue = queue_of(
+            event("urn:a", 1), event("urn:b"), event("urn:a", 2), event("urn:a", type="story"), *unaddressed
+        )
+        return await manager._next_batch("peer", queue), manager.event_counts
+
+    batch, counts = asyncio.run(scenario())
+    assert batch == [event("urn:b"), event("urn:a", 2), event("urn:a", type="story"), *unaddressed]
+    assert counts == {("peer", "coalesced"): 1}
+
+def test_retry_skips_delivered_events(monkeypatch):
+    """After a failure part way through a batch, only the undelivered events are sent again."""
+    monkeypatch.setattr(get_settings(), "FEDERATION_BATCH_LINGER_SECONDS", 0)
+    delivered, failures = [], [event("urn:thing:2")]
+    async def process(item):
+        if item in failures:
+            failures.remove(item)
+            raise Exception("peer unavailable")
+        delivered.append(item["uri"])
+
+    async def scenario():
+        manager = FederationManager()
+        manager.retry_delays = [0, 0]
+        manager.known_instances["peer"] = SimpleNamespace(uri="peer", endpoints={})
+        manager.sync_queues["peer"] = queue_of(*(event(f"urn:thing:{n}") for n in range(4)))
+        monkeypatch.setattr(manager, "_process_federation_event", process)
+        worker = asyncio.create_task(manager._sync_worker("peer"))
+        while len(delivered) < 4:
+            await asyncio.sleep(0.01)
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return manager.event_counts
+
+    counts = asyncio.run(scenario())
+    assert delivered == [f"urn:thing:{n}" for n in range(4)]
+    assert counts[("peer", "sent")] == 4
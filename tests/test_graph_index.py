@@ -0,0 +1,154 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.config import get_settings
+from app.database import get_async_database_url
+from app.graph_index import GraphIndex, GraphIndexManager, REFRESH_OVERLAP
+
+START = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+def edge(source, target, relationship_type="has_component", direction="unidirectional", edge_id=None):
+    """Edge row between two (entity type, id) pairs."""
+    return (edge_id or str(uuid.uuid4()), *source, *target, relationship_type, direction)
+
+@pytest.fixture
+def nodes():
+    """A handful of things and a guide, with UUID ids."""
+    return {name: ("thing", str(uuid.uuid4())) for name in ("kettle", "lid", "hinge", "base")} | {
+        "guide": ("guide", str(uuid.uuid4()))
+    }
+
+@pytest.fixture
+def index(nodes):
+    """kettle -> lid -> hinge -> kettle, guide -> lid, and a bidirectional kettle <-> base."""
+    index = GraphIndex()
+    rows = [
+        edge(nodes["kettle"], nodes["lid"]),
+        edge(nodes["lid"], nodes["hinge"]),
+        edge(nodes["hinge"], nodes["kettle"], "fits"),
+        edge(nodes["guide"], nodes["lid"], "repairs"),
+        edge(nodes["base"], nodes["kettle"], "pairs_with", "bidirectional"),
+    ]
+    index.load((row, START + timedelta(seconds=n)) for n, row in enumerate(rows))
+    return index
+
+def reached(result):
+    depths, _, _ = result
+    return {key[1]: depth for key, depth in depths.items()}
+
+def test_traverse_by_direction(index, nodes):
+    """Outgoing and incoming walks follow bidirectional relationships both ways."""
+    kettle, lid, hinge, base, guide = (nodes[name][1] for name in ("kettle", "lid", "hinge", "base", "guide"))
+    assert reached(index.traverse(*nodes["kettle"], 1)) == {kettle: 0, lid: 1, hinge: 1, base: 1}
+    assert reached(index.traverse(*nodes["kettle"], 3, "outgoing")) == {kettle: 0, lid: 1, base: 1, hinge: 2}
+    assert reached(index.traverse(*nodes["lid"], 1, "incoming")) == {lid: 0, kettle: 1, guide: 1}
+    assert reached(index.traverse(*nodes["kettle"], 3, types=["has_component"])) == {kettle: 0, lid: 1, hinge: 2}
+
+def test_traverse_reports_edges_and_limits(index, nodes):
+    """Edges closing a cycle are reported and the node limit marks the result truncated."""
+    depths, edge_ids, truncated = index.traverse(*nodes["kettle"], 3, "outgoing", types=["has_component", "fits"])
+    assert len(depths) == 3 and len(edge_ids) == 3 and not truncated
+
+    depths, _, truncated = index.traverse(*nodes["kettle"], 2, max_nodes=2)
+    assert len(depths) == 2 and truncated
+    assert reached(index.traverse("thing", "unknown", 2)) == {"unknown": 0}
+
+def test_overlay_and_compaction(index, nodes):
+    """Added relationships are visible before and after compaction, and while it runs."""
+    lid_id = nodes["lid"][1]
+    row = edge(nodes["hinge"], nodes["lid"], "fits", edge_id="not-a-uuid")
+    assert index.add(row, START + timedelta(minutes=1))
+    assert not index.add(row, START + timedelta(minutes=1))
+    drawer = ("thing", str(uuid.uuid4()))
+    index.add(edge(nodes["guide"], drawer, "repairs"), START + timedelta(minutes=2))
+
+    def check():
+        assert "not-a-uuid" in index.relationship_ids(*nodes["lid"], "incoming")
+        assert len(index.relationship_ids(*nodes["guide"])) == 2
+        assert index.has_relationships(*nodes["hinge"], "outgoing")
+        assert lid_id in reached(index.traverse(*nodes["hinge"], 1, "outgoing"))
+        assert drawer[1] in reached(index.traverse(*nodes["guide"], 1))
+
+    async def compact_while_adding():
+        compaction = asyncio.create_task(index.compact())
+        # Let the compaction start its build, then write a relationship to a new entity
+        await asyncio.sleep(0)
+        index.add(edge(drawer, ("thing", "handle-1")), START + timedelta(minutes=3))
+        await compaction
+
+    check()
+    assert len(index) == 7
+    asyncio.run(compact_while_adding())
+    check()
+    assert len(index) == 8
+    assert index.node_count == 7
+    assert reached(index.traverse(*drawer, 1, "outgoing")) == {drawer[1]: 0, "handle-1": 1}
+    assert index.nbytes() > 0
+
+def test_raw_entity_ids(index):
+    """Entity ids that are not UUIDs are indexed verbatim."""
+    index.add(edge(("story", "story-1"), ("thing", "thing-1")), START + timedelta(minutes=1))
+    assert reached(index.traverse("thing", "thing-1", 1)) == {"thing-1": 0, "story-1": 1}
+    assert not index.has_relationships("thing", "thing-2")
+
+def test_refresh_window_forgets_old_ids(index, nodes):
+    """Relationships older than the refresh overlap are no longer checked for duplicates."""
+    later = START + REFRESH_OVERLAP + timedelta(minutes=1)
+    index.add(edge(nodes["kettle"], nodes["guide"]), later)
+    assert index.watermark == later
+    assert len(index._recent) == 1
+
+def test_manager_records_while_building(index, nodes):
+    """Relationships written during a rebuild are served by the current index meanwhile."""
+    manager = GraphIndexManager()
+    manager.index = index
+    manager._building = True
+    row = edge(nodes["base"], nodes["guide"], "stores")
+    manager.record(row, START + timedelta(minutes=1))
+    assert row[0] in manager.get().relationship_ids(*nodes["guide"])
+    assert manager._pending == [(row, START + timedelta(minutes=1))]
+
+def test_manager_builds_and_refreshes(migrated_database, truncate_tables):
+    """The manager loads the table, then picks up rows written by other processes."""
+    insert = text("""
+        INSERT INTO relationships (id, source_type, source_id, target_type, target_id,
+                                   relationship_type, direction, created_at)
+        VALUES (:id, 'thing', :source, 'thing', :target, 'has_component', 'unidirectional', :created_at)
+    """)
+    with migrated_database.begin() as connection:
+        connection.execute(insert, [
+            {"id": f"rel-{n}", "source": f"thing-{n}", "target": f"thing-{n + 1}",
+             "created_at": START + timedelta(seconds=n)}
+            for n in range(3)
+        ])
+
+    async def build_and_refresh():
+        engine = create_async_engine(get_async_database_url(get_settings().DATABASE_URL))
+        sessions = async_sessionmaker(engine)
+        manager = GraphIndexManager()
+        try:
+            index = await manager.build(sessions)
+            with migrated_database.begin() as connection:
+                connection.execute(insert, {
+                    "id": "rel-late", "source": "thing-9", "target": "thing-0",
+                    "created_at": START - timedelta(seconds=1)
+                })
+            await manager.refresh(sessions)
+            return index
+        finally:
+            await engine.dispose()
+
+    try:
+        index = asyncio.run(build_and_refresh())
+        assert len(index) == 4
+        assert reached(index.traverse("thing", "thing-0", 3, "outgoing")) == {
+            "thing-0": 0, "thing-1": 1, "thing-2": 2, "thing-3": 3
+        }
+        assert index.relationship_ids("thing", "thing-9") == ["rel-late"]
+    finally:
+        truncate_tables()
@@ -0,0 +1,50 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app import instrumentation
+from app.config import get_settings
+from app.database import engine
+from app.instrumentation import InstrumentationMiddleware, RepeatedQueryError, redact, statement_shape
+
+def test_statement_shape_ignores_values():
+    """Queries differing only in literals or IN list lengths share a shape."""
+    first = "SELECT id FROM things WHERE type = 'device' AND id IN ($1, $2)"
+    second = "SELECT id FROM things WHERE type = 'tool' AND id IN ($1,$2,$3)"
+    assert statement_shape(first) == statement_shape(second) == "SELECT id FROM things WHERE type = '?' AND id IN (?)"
+    assert redact("SELECT 'secret'\n  FROM  t") == "SELECT '?' FROM t"
+
+def make_client(queries: int) -> TestClient:
+    """Client for an application whose endpoint runs the same query several times."""
+    app = FastAPI()
+
+    @app.get("/rows")
+    def rows():
+        with engine.connect() as connection:
+            for n in range(queries):
+                connection.execute(text("SELECT :n"), {"n": n})
+        return {}
+
+    app.add_middleware(InstrumentationMiddleware)
+    return TestClient(app)
+
+def test_server_timing_counts_queries():
+    response = make_client(3).get("/rows")
+    assert response.status_code == 200
+    assert response.headers["server-timing"].endswith('desc="3 queries"')
+
+def test_repeated_queries_fail_in_raise_mode(monkeypatch):
+    monkeypatch.setattr(get_settings(), "REPEATED_QUERY_MODE", "raise")
+    monkeypatch.setattr(get_settings(), "REPEATED_QUERY_THRESHOLD", 2)
+    assert make_client(2).get("/rows").status_code == 200
+    with pytest.raises(RepeatedQueryError):
+        make_client(3).get("/rows")
+
+def test_repeated_queries_are_logged_in_warn_mode(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(instrumentation.logger, "warning", lambda message, *args: warnings.append(message % args))
+    monkeypatch.setattr(get_settings(), "REPEATED_QUERY_MODE", "warn")
+    monkeypatch.setattr(get_settings(), "REPEATED_QUERY_THRESHOLD", 2)
+    assert make_client(3).get("/rows").status_code == 200
+    assert len(warnings) == 1 and "ran the same statement 3 times" in warnings[0]
@@ -0,0 +1,61 @@
+import json
+import logging
+import sys
+from logging.handlers import QueueHandler
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import logger as logger_module
+from app.logger import CorrelationIdMiddleware, correlation_id, setup_logger
+
+def test_setup_logger_is_idempotent():
+    """Setting up a logger twice does not duplicate its output."""
+    first = setup_logger("tests.idempotent")
+    second = setup_logger("tests.idempotent", "DEBUG")
+    assert first is second
+    assert len(first.handlers) == 1
+    assert isinstance(first.handlers[0], QueueHandler)
+    assert first.level == logging.DEBUG
+
+def test_records_are_structured_with_correlation_id():
+    """Queued records carry the rendered message, the traceback and the request's correlation id."""
+    handler = setup_logger("tests.structured").handlers[0]
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = logging.getLogger("tests.structured").makeRecord(
+            "tests.structured", logging.ERROR, __file__, 1, "Failed to create %s", ("thing",), None
+        )
+        record.exc_info = sys.exc_info()
+    token = correlation_id.set("req-1")
+    try:
+        prepared = handler.prepare(record)
+    finally:
+        correlation_id.reset(token)
+
+    output = json.loads(logger_module._formatter("json").format(prepared))
+    assert output["message"] == "Failed to create thing"
+    assert output["correlation_id"] == "req-1"
+    assert output["level"] == "ERROR"
+    assert "ValueError: broken" in output["exc_info"]
+
+def test_middleware_assigns_correlation_ids():
+    """Well-formed request ids are kept, others are replaced, and the id is visible while handling."""
+    app = FastAPI()
+
+    @app.get("/id")
+    async def current_id():
+        return {"id": correlation_id.get()}
+
+    app.add_middleware(CorrelationIdMiddleware)
+    client = TestClient(app)
+
+    response = client.get("/id", headers={"X-Request-ID": "abc-123"})
+    assert response.json() == {"id": "abc-123"}
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = client.get("/id", headers={"X-Request-ID": "not valid!" * 10})
+    generated = response.headers["X-Request-ID"]
+    assert len(generated) == 32 and response.json() == {"id": generated}
+    assert correlation_id.get() is None
@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+import threading
+
+from fastapi import FastAPI
+
+from app.database import TimedQueuePool
+from app.metrics import Histogram, MetricsMiddleware, RequestMetrics, histogram_lines, pool_checkout, sample_lines
+
+def test_histogram_exposition_is_cumulative():
+    """Bucket counts are cumulative and a value on a bound falls in that bucket."""
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram_lines("latency", "Latency", ("route",), {("/a",): histogram})[2:] == [
+        'latency_bucket{route="/a",le="0.1"} 2',
+        'latency_bucket{route="/a",le="1.0"} 3',
+        'latency_bucket{route="/a",le="+Inf"} 4',
+        'latency_sum{route="/a"} 3.65',
+        'latency_count{route="/a"} 4',
+    ]
+
+def test_label_values_are_escaped():
+    assert sample_lines("peers", "Peers", "gauge", ("peer",), {('say "hi"\n',): 1})[-1] == (
+        'peers{peer="say \\"hi\\"\\n"} 1'
+    )
+
+def test_middleware_labels_requests_by_route_template():
+    """Requests are counted under their route template; unknown paths share one label."""
+    app = FastAPI()
+
+    @app.get("/things/{thing_id}")
+    async def get_thing(thing_id: str):
+        return {"id": thing_id}
+
+    metrics = RequestMetrics()
+    wrapped = MetricsMiddleware(app, metrics)
+
+    async def request(path):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+            "root_path": "", "server": ("test", 80), "client": ("test", 1234), "headers": [],
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            pass
+
+        await wrapped(scope, receive, send)
+
+    async def scenario():
+        for path in ("/things/a", "/things/b", "/nowhere"):
+            await request(path)
+
+    asyncio.run(scenario())
+    assert metrics.requests == {("GET", "/things/{thing_id}", 200): 2, ("GET", "unmatched", 404): 1}
+    assert sum(metrics.latency[("GET", "/things/{thing_id}")].counts) == 2
+    assert metrics.in_flight == 0
+
+def test_pool_checkout_wait_is_observed():
+    """Every checkout is timed, including the wait for a connection held by someone else."""
+    pool = TimedQueuePool(lambda: sqlite3.connect(":memory:", check_same_thread=False), pool_size=1, max_overflow=0)
+    pool.connect().close()
+    histogram = pool_checkout["sync"]
+    count, total = sum(histogram.counts), histogram.sum
+
+    held = pool.connect()
+    threading.Timer(0.1, held.close).start()
+    pool.connect().close()
+    assert sum(histogram.counts) == count + 2
+    assert histogram.sum - total >= 0.1
+    pool.dispose()
@@ -0,0 +1,152 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.config import get_settings
+from app.database import Base
+from app.migrations import Operations, status, upgrade
+
+MODEL_SCHEMA = "model_schema"
+LEGACY_SCHEMA = "legacy_schema"
+
+def schema_snapshot(connection, schema):
+    """Columns, indexes and constraints of the model tables in a schema, without schema names."""
+    tables = [table.name for table in Base.metadata.sorted_tables]
+    params = {"schema": schema, "tables": tables}
+    columns = connection.execute(text("""
+        SELECT c.relname, a.attname, format_type(a.atttypid, a.atttypmod), a.attnotnull,
+               pg_get_expr(d.adbin, d.adrelid)
+        FROM pg_attribute a
+        JOIN pg_class c ON c.oid = a.attrelid
+        LEFT JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE c.relnamespace = CAST(:schema AS regnamespace) AND c.relname = ANY(:tables)
+          AND a.attnum > 0 AND NOT a.attisdropped
+    """), params).all()
+    indexes = connection.execute(text(
+        "SELECT tablename, indexname, indexdef FROM pg_indexes "
+        "WHERE schemaname = :schema AND tablename = ANY(:tables)"
+    ), params).all()
+    constraints = connection.execute(text("""
+        SELECT c.relname, con.conname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con JOIN pg_class c ON c.oid = con.conrelid
+        WHERE c.relnamespace = CAST(:schema AS regnamespace) AND c.relname = ANY(:tables)
+    """), params).all()
+    return {
+        tuple(str(value).replace(f"{schema}.", "") for value in row)
+        for row in [*columns, *indexes, *constraints]
+    }
+
+@pytest.fixture
+def schema_engine():
+    """Create an engine whose connections work in a separate schema."""
+    engines = []
+
+    def make(schema):
+        schema_engine = create_engine(
+            get_settings().DATABASE_URL, connect_args={"options": f"-csearch_path={schema}"}
+        )
+        engines.append(schema_engine)
+        return schema_engine
+
+    yield make
+    for schema_engine in engines:
+        schema_engine.dispose()
+
+def test_upgrade_applies_every_migration_once(migrated_database):
+    """A migrated database has every migration recorded and nothing left to apply."""
+    assert all(applied_at is not None for _, applied_at in status(migrated_database))
+    assert upgrade(migrated_database) == []
+
+def test_models_match_migrations(migrated_database):
+    """The schema built by the migrations is the one declared by the models."""
+    with migrated_database.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {MODEL_SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {MODEL_SCHEMA}"))
+        Base.metadata.create_all(connection.execution_options(schema_translate_map={None: MODEL_SCHEMA}))
+    try:
+        with migrated_database.connect() as connection:
+            migrated = schema_snapshot(connection, "public")
+            declared = schema_snapshot(connection, MODEL_SCHEMA)
+        assert sorted(migrated - declared) == [] and sorted(declared - migrated) == []
+    finally:
+        with migrated_database.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {MODEL_SCHEMA} CASCADE"))
+
+def test_upgrade_aligns_create_all_schema(migrated_database, schema_engine):
+    """A database created by create_all before migrations existed is brought in line."""
+    with migrated_database.begin() as connection:
+        connection.execute(text(f"DROP SCHEMA IF EXISTS {LEGACY_SCHEMA} CASCADE"))
+        connection.execute(text(f"CREATE SCHEMA {LEGACY_SCHEMA}"))
+        connection.execute(text(f"""
+            CREATE TABLE {LEGACY_SCHEMA}.things (
+                id VARCHAR PRIMARY KEY, uri VARCHAR UNIQUE NOT NULL, type VARCHAR NOT NULL,
+                name JSONB NOT NULL, manufacturer JSONB, properties JSONB,
+                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, updated_at TIMESTAMP WITHOUT TIME ZONE
+            )
+        """))
+        connection.execute(text(f"""
+            INSERT INTO {LEGACY_SCHEMA}.things (id, uri, type, name, manufacturer, created_at)
+            VALUES ('legacy', 'thing:device/Acme/Kettle', 'device',
+                    '{{"default": "Kettle"}}', '{{"name": "Acme"}}', '2024-06-01 12:00:00')
+        """))
+
+    legacy_engine = schema_engine(LEGACY_SCHEMA)
+    try:
+        upgrade(legacy_engine)
+        with legacy_engine.connect() as connection:
+            connection.execute(text("SET TIME ZONE 'UTC'"))
+            row = connection.execute(text(
+                "SELECT created_at::text, search_simple::text, pg_typeof(id)::text FROM things"
+            )).one()
+            assert row == ("2024-06-01 12:00:00+00", "'acme':2B 'kettle':1A", "text")
+            assert status(legacy_engine)[-1][1] is not None
+    finally:
+        with migrated_database.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA {LEGACY_SCHEMA} CASCADE"))
+
+def test_create_index_concurrently_rebuilds_invalid_index(migrated_database, truncate_tables):
+    """An index left invalid by a failed concurrent build is dropped and rebuilt."""
+    with migrated_database.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO relationships (id, source_type, source_id, target_type, target_id,
+                                       relationship_type, direction)
+            VALUES ('a', 'thing', 'x', 'thing', 'y', 'same', 'unidirectional'),
+                   ('b', 'thing', 'y', 'thing', 'x', 'same', 'unidirectional')
+        """))
+
+    with migrated_database.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        op = Operations(connection, transactional=False)
+        with pytest.raises(Exception):
+            op.create_index_concurrently("idx_test_rebuild", "relationships", "(relationship_type)", unique=True)
+        assert op.index_valid("idx_test_rebuild") is False
+
+        try:
+            op.create_index_concurrently("idx_test_rebuild", "relationships", "(relationship_type)")
+            assert op.index_valid("idx_test_rebuild") is True
+        finally:
+            op.drop_index_concurrently("idx_test_rebuild")
+    truncate_tables()
+
+def test_backfill_updates_in_batches(migrated_database, truncate_tables):
+    """Batched backfills touch every matching row and stop once none is left."""
+    with migrated_database.begin() as connection:
+        connection.execute(text("""
+            INSERT INTO relationships (id, source_type, source_id, target_type, target_id,
+                                       relationship_type, direction)
+            SELECT 'rel-' || n, 'thing', 'x' || n, 'thing', 'y', 'old', 'unidirectional'
+            FROM generate_series(1, 25) AS n
+        """))
+
+    with migrated_database.connect() as connection:
+        op = Operations(connection.execution_options(isolation_level="AUTOCOMMIT"), transactional=False)
+        assert op.backfill("relationships", "relationship_type = 'new'", "relationship_type = 'old'",
+                           batch_size=10) == 25
+        assert op.scalar("SELECT count(*) FROM relationships WHERE relationship_type = 'new'") == 25
+    truncate_tables()
+
+def test_online_helpers_require_non_transactional_migration(migrated_database):
+    """CONCURRENTLY and backfills cannot run inside a transactional migration."""
+    with migrated_database.begin() as connection:
+        op = Operations(connection, transactional=True)
+        with pytest.raises(RuntimeError):
+            op.create_index_concurrently("idx_never_built", "things", "(uri)")
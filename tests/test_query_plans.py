@@ -0,0 +1,111 @@
+import pytest
+from sqlalchemy import select, text
+
+from app.conditional import version_query
+from app.filters import thing_filters, story_filters, guide_filters, relationship_filters
+from app.models import Thing, Story, Guide, Relationship
+from app.pagination import page_query
+
+SEED_ROWS = 50000
+
+SEED_SQL = [
+    f"""
+    INSERT INTO things (id, uri, type, name, manufacturer, properties, created_at)
+    SELECT 'thing-' || n, 'thing:device/Acme/' || n,
+           CASE WHEN n % 100 = 0 THEN 'vehicle' ELSE (ARRAY['device', 'tool', 'furniture'])[n % 3 + 1] END,
+           jsonb_build_object('default', 'Thing ' || n), '{{"name": "Acme"}}', '{{}}',
+           now() - n * interval '1 second'
+    FROM generate_series(1, {SEED_ROWS}) AS n
+    """,
+    f"""
+    INSERT INTO stories (id, thing_id, thing_category, version, type, procedure, created_at)
+    SELECT 'story-' || n, 'thing-' || (n * 7 % {SEED_ROWS} + 1), jsonb_build_object('category', 'category-' || n % 500),
+           '{{"number": "1.0.0"}}', 'repair', '[]', now() - n * interval '1 second'
+    FROM generate_series(1, {SEED_ROWS}) AS n
+    """,
+    f"""
+    INSERT INTO guides (id, thing_id, thing_category, type, content, created_at)
+    SELECT 'guide-' || n, 'thing-' || (n * 13 % {SEED_ROWS} + 1), jsonb_build_object('category', 'category-' || n % 500),
+           jsonb_build_object('primary', 'type-' || n % 200), '{{}}', now() - n * interval '1 second'
+    FROM generate_series(1, {SEED_ROWS}) AS n
+    """,
+    f"""
+    INSERT INTO relationships (id, source_type, source_id, target_type, target_id,
+                               relationship_type, direction, created_at)
+    SELECT 'rel-' || n, source_type, source_type || '-' || n, target_type, target_type || '-' || (n * 7 % {SEED_ROWS} + 1),
+           'relationship-' || n % 500, 'unidirectional', now() - n * interval '1 second'
+    FROM generate_series(1, {SEED_ROWS}) AS n,
+         LATERAL (SELECT CASE WHEN n % 50 = 0 THEN 'guide' ELSE 'thing' END AS source_type,
+                         CASE WHEN n % 40 = 0 THEN 'guide' ELSE 'story' END AS target_type) AS types
+    """,
+]
+
+@pytest.fixture(scope="module")
+def seeded_engine(migrated_database, truncate_tables):
+    """Large tables with fresh statistics, so the planner behaves as in production."""
+    with migrated_database.begin() as connection:
+        for statement in SEED_SQL:
+            connection.execute(text(statement))
+        for table in ("things", "stories", "guides", "relationships"):
+            connection.execute(text(f"ANALYZE {table}"))
+    yield migrated_database
+    truncate_tables()
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN (FORMAT JSON) plan tree."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+def explain(seeded_engine, query):
+    """The root node of the query's EXPLAIN (FORMAT JSON) plan."""
+    compiled = query.compile(seeded_engine, compile_kwargs={"render_postcompile": True})
+    with seeded_engine.connect() as connection:
+        [[explain]] = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).all()
+    return explain[0]["Plan"]
+
+def assert_no_seq_scan(seeded_engine, query):
+    plan = explain(seeded_engine, query)
+    scans = [node for node in plan_nodes(plan) if node["Node Type"] == "Seq Scan"]
+    assert not scans, f"Sequential scan on {scans[0]['Relation Name']}: {plan}"
+
+# Filter values match few seeded rows, so the filter's own index beats walking the keyset index
+@pytest.mark.parametrize("model, conditions, index", [
+    (Thing, [], "idx_things_keyset"),
+    (Thing, thing_filters(type="vehicle"), "idx_things_type"),
+    (Story, story_filters(thing_id="thing-42"), "idx_stories_thing_id"),
+    (Story, story_filters(category="category-42"), "idx_stories_category_key"),
+    (Guide, guide_filters(thing_id="thing-42"), "idx_guides_thing_id"),
+    (Guide, guide_filters(category="category-42"), "idx_guides_category_key"),
+    (Guide, guide_filters(type="type-42"), "idx_guides_type_primary"),
+    (Guide, guide_filters(category="category-42", type="type-42"), "idx_guides_category_key"),
+    (Relationship, relationship_filters(source_id="thing-42"), "idx_relationships_source_id"),
+    (Relationship, relationship_filters(source_type="thing", source_id="thing-42"), "idx_relationships_source_id"),
+    (Relationship, relationship_filters(source_type="guide"), "idx_relationships_source_type_keyset"),
+    (Relationship, relationship_filters(target_id="story-42"), "idx_relationships_target_id"),
+    (Relationship, relationship_filters(target_type="story", target_id="story-42"), "idx_relationships_target_id"),
+    (Relationship, relationship_filters(target_type="guide"), "idx_relationships_target_type_keyset"),
+    (Relationship, relationship_filters(relationship_type="relationship-42"), "idx_relationships_type"),
+])
+def test_list_filters_use_indexes(seeded_engine, model, conditions, index):
+    """Every supported list filter is served by the index declared for it."""
+    plan = explain(seeded_engine, page_query(select(model).where(*conditions), model, 100))
+    used = {node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node}
+    assert index in used, f"{index} not used: {plan}"
+
+@pytest.mark.parametrize("model, entity_ids", [
+    (Thing, ["thing-1", "thing-2"]),
+    (Story, ["story-1", "story-2"]),
+])
+def test_relationship_lookup_uses_indexes(seeded_engine, model, entity_ids):
+    """Batch relationship loading is served by the source and target indexes."""
+    assert_no_seq_scan(seeded_engine, model.relationships_query(entity_ids))
+
+@pytest.mark.parametrize("model, entity_id", [
+    (Thing, "thing-42"),
+    (Guide, "guide-42"),
+    (Relationship, "rel-42"),
+])
+def test_version_lookup_uses_indexes(seeded_engine, model, entity_id):
+    """Conditional GETs revalidate without scanning the entity or relationship tables."""
+    assert_no_seq_scan(seeded_engine, version_query(model, entity_id, with_relationships=model is not Relationship))
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+
+from app.security import SecurityConfig, SecurityException, SecurityMiddleware
+
+def make_app():
+    """Application that echoes the size of the body it read, behind the middleware."""
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post(SecurityConfig.IMPORT_PATH_PREFIX + "things")
+    async def swallow(request: Request):
+        try:
+            async for _ in request.stream():
+                pass
+        except Exception:
+            raise RuntimeError("Import failed")
+        return {}
+
+    return SecurityMiddleware(app)
+
+def call(app, path="/echo", headers=None, chunks=(b"{}",), method="POST"):
+    """Send a request as separate body messages and return (status, JSON body, body messages read)."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "server": ("test", 80), "client": ("test", 1234),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    }
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    read = []
+    sent = []
+
+    async def receive():
+        if messages:
+            read.append(messages[0])
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    [start] = [message for message in sent if message["type"] == "http.response.start"]
+    body = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+    return start["status"], json.loads(body), len(read)
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(SecurityConfig, "MAX_REQUEST_SIZE", 100)
+    monkeypatch.setattr(SecurityConfig, "MAX_IMPORT_REQUEST_SIZE", 100)
+
+def test_passes_requests_within_limits(small_limit):
+    """Bodies under the limit reach the application, chunked or not."""
+    json_headers = {"content-type": "application/json"}
+    assert call(make_app(), headers={**json_headers, "content-length": "2"})[:2] == (200, {"size": 2})
+    assert call(make_app(), headers=json_headers, chunks=[b"x" * 50, b"x" * 50])[:2] == (200, {"size": 100})
+    assert call(make_app(), method="GET")[0] == 405
+
+def test_declared_length_checked_before_reading(small_limit):
+    """Oversized and malformed Content-Length headers are rejected without reading the body."""
+    headers = {"content-type": "application/json"}
+    assert call(make_app(), headers={**headers, "content-length": "101"}) == (413, {"error": "Request too large"}, 0)
+    assert call(make_app(), headers={**headers, "content-length": "ten"}) == (
+        400, {"error": "Invalid Content-Length header"}, 0
+    )
+
+def test_chunked_body_stops_at_limit(small_limit):
+    """A chunked body is cut off as soon as it crosses the limit, whatever the application does with the error."""
+    chunks = [b"x" * 60] * 10
+    assert call(make_app(), headers={"content-type": "application/json"}, chunks=chunks) == (
+        413, {"error": "Request too large"}, 2
+    )
+    assert call(
+        make_app(), SecurityConfig.IMPORT_PATH_PREFIX + "things", {"content-type": "text/csv"}, chunks
+    ) == (413, {"error": "Request too large"}, 2)
+
+def test_content_type_rules():
+    """Writes must be JSON, imports may also be NDJSON or CSV."""
+    assert call(make_app(), headers={"content-type": "text/plain"})[:2] == (
+        400, {"error": "Only application/json content type is allowed"}
+    )
+    assert call(make_app(), SecurityConfig.IMPORT_PATH_PREFIX + "things", {"content-type": "text/csv"})[0] == 200
+    assert call(make_app(), SecurityConfig.IMPORT_PATH_PREFIX + "things", {"content-type": "text/xml"})[0] == 400
+
+def test_application_errors_pass_through():
+    """Errors unrelated to the body limit are not masked."""
+    async def failing(scope, receive, send):
+        raise SecurityException(400, "Application error")
+
+    with pytest.raises(SecurityException):
+        call(SecurityMiddleware(failing), headers={"content-type": "application/json"})